@@ -2,10 +2,20 @@
 `include "common_defs.v"
 
 // Dispatches thread blocks to compute units
+// Each CU holds up to BLOCK_SLOTS blocks; every (CU, block slot) pair is dispatched to
+// like a CU of its own, index core * BLOCK_SLOTS + slot. Slot 0 of every CU is filled
+// before slot 1 of any, so blocks spread over the CUs first.
+// A block only joins a CU that already holds blocks if the waves of all of them fit
+// in the CU's CU_WAVE_SLOTS wave slots (occupancy limit); an empty CU takes any block.
+// A launch starts at reset; once kernel_done, kernel_start starts the next one on the
+// current num_threads/block_dim without a reset (every block slot is idle by then).
 // Assumes
-    // Each CU can only hold up to one block
+    // Blocks are handed out in block id order
 module BlockDispatch #(
-    parameter NUM_CORES = 4
+    parameter NUM_CORES = 4,
+    parameter BLOCK_SLOTS = 1, // resident blocks per CU
+    parameter CU_WAVE_SLOTS = 2, // resident waves per CU (NUM_SIMDS * WAVE_SLOTS)
+    parameter WAVE_SIZE = 32
 )
 (
     input wire clk,
@@ -15,18 +25,26 @@ module BlockDispatch #(
     // kernel metadata
     input wire [31:0] num_threads, // num of threads launched -- defined by kernel
     input wire [31:0] block_dim, // num of threads per block -- defined by kernel
+    input wire kernel_start, // start another launch (ignored until kernel_done)
 
-    // info for each compute unit
-    input wire [NUM_CORES-1:0] core_done, // given by compute unit
-    output reg [NUM_CORES-1:0] core_start, // core is working on a block
-    output reg [NUM_CORES-1:0] core_ready, // ready for a block
+    // info for each compute unit block slot
+    input wire [NUM_CORES*BLOCK_SLOTS-1:0] core_done, // given by compute unit
+    output reg [NUM_CORES*BLOCK_SLOTS-1:0] core_start, // core is working on a block
+    output reg [NUM_CORES*BLOCK_SLOTS-1:0] core_ready, // ready for a block
 
-    // block_id assigned to each compute unit
-    output reg signed [31:0] core_block_id [0:NUM_CORES-1],
+    // block_id assigned to each compute unit block slot
+    output reg signed [31:0] core_block_id [0:NUM_CORES*BLOCK_SLOTS-1],
+
+    // occupancy: wave slots holding a wave (CU c in bits [c*CU_WAVE_SLOTS +: CU_WAVE_SLOTS])
+    input wire [NUM_CORES*CU_WAVE_SLOTS-1:0] slot_working,
+    output reg [31:0] kernel_cycles, // cycles from reset (or kernel_start) to kernel_done
+    output reg [31:0] resident_wave_cycles, // sum over those cycles of the waves resident on every CU
 
     output reg kernel_done
 );
 
+localparam NUM_SLOTS = NUM_CORES * BLOCK_SLOTS;
+
 // blocks dispatched vs finished tracker
 reg [31:0] blocks_dispatched; // corresponds with block id
 reg [31:0] blocks_done; // number of blocks a core has finished processing
@@ -35,35 +53,80 @@ reg [31:0] blocks_done; // number of blocks a core has finished processing
 wire [31:0] num_blocks;
 assign num_blocks = (num_threads + block_dim - 1) / block_dim; 
 
+// waves of a block (the last block might be partially filled)
+wire [31:0] remainder;
+assign remainder = num_threads % block_dim;
+function [31:0] block_waves(input [31:0] block_id);
+    block_waves = ((block_id == num_blocks - 1 && remainder != 0 ? remainder : block_dim) + WAVE_SIZE - 1) / WAVE_SIZE;
+endfunction
+
+reg [31:0] core_waves [0:NUM_CORES-1]; // waves of the blocks resident on a CU
+reg [31:0] slot_waves [0:NUM_SLOTS-1]; // waves of the block in a block slot
+
+reg [$clog2(NUM_CORES*CU_WAVE_SLOTS+1)-1:0] num_resident;
+
 localparam signed [31:0] INVALID_BLOCK_ID = -32'd1;
 
-integer i;
+integer i, k;
+
+always @(*) begin
+    num_resident = 0;
+    for (i = 0; i < NUM_CORES * CU_WAVE_SLOTS; i = i + 1) begin
+        num_resident = num_resident + slot_working[i];
+    end
+end
+
 always @ (posedge(clk)) begin
     if (rst) begin
         blocks_dispatched <= 0;
         blocks_done <= 0;
         kernel_done <= 0;
+        kernel_cycles <= 0;
+        resident_wave_cycles <= 0;
 
         for (i = 0; i < NUM_CORES; i = i + 1) begin
+            core_waves[i] <= 0;
+        end
+
+        for (i = 0; i < NUM_SLOTS; i = i + 1) begin
             core_block_id[i] <= INVALID_BLOCK_ID;
             core_ready[i] <= 1;
             core_start[i] <= 0;      
+            slot_waves[i] <= 0;
         end        
     end
 
+    else if (enable && kernel_start && kernel_done) begin
+        // back-to-back launch: the counters start over, dispatch resumes on the next clock
+        blocks_dispatched <= 0;
+        blocks_done <= 0;
+        kernel_done <= 0;
+        kernel_cycles <= 0;
+        resident_wave_cycles <= 0;
+    end
+
     else if (enable) begin
         if (blocks_done == num_blocks) begin
             // all blocks have been processed by compute units
             kernel_done <= 1;
         end
 
-        for (i = 0; i < NUM_CORES; i = i + 1) begin
+        else begin
+            kernel_cycles <= kernel_cycles + 1;
+            resident_wave_cycles <= resident_wave_cycles + num_resident;
+        end
+
+        for (k = 0; k < NUM_SLOTS; k = k + 1) begin
+            i = (k % NUM_CORES) * BLOCK_SLOTS + k / NUM_CORES; // slot k / NUM_CORES of CU k % NUM_CORES
             if (core_ready[i] && !core_start[i]) begin
-                // check if there is a block that can be given
-                if (blocks_dispatched < num_blocks) begin
+                // check if there is a block that can be given (and that its waves fit next to the CU's other blocks)
+                if (blocks_dispatched < num_blocks &&
+                    (core_waves[i / BLOCK_SLOTS] == 0 || core_waves[i / BLOCK_SLOTS] + block_waves(blocks_dispatched) <= CU_WAVE_SLOTS)) begin
                     core_block_id[i] <= blocks_dispatched; // give a block to a core
                     core_start[i] <= 1;
                     core_ready[i] <= 0;
+                    slot_waves[i] <= block_waves(blocks_dispatched);
+                    core_waves[i / BLOCK_SLOTS] = core_waves[i / BLOCK_SLOTS] + block_waves(blocks_dispatched);
                     blocks_dispatched = blocks_dispatched + 1; 
                 end
             end
@@ -73,6 +136,7 @@ always @ (posedge(clk)) begin
                 core_start[i] <= 0;
                 core_ready[i] <= 1;
                 core_block_id[i] <= INVALID_BLOCK_ID;
+                core_waves[i / BLOCK_SLOTS] = core_waves[i / BLOCK_SLOTS] - slot_waves[i];
                 blocks_done = blocks_done + 1;
             end
         end
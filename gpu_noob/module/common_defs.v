@@ -22,6 +22,27 @@ Fetcher states
 `define FETCHER_FETCHING    2'b01
 `define FETCHER_FETCHED     2'b10
 
+/*
+Instruction cache fill states
+*/
+`define ICACHE_IDLE         2'b00
+`define ICACHE_FILLING      2'b01
+`define ICACHE_RELEASE      2'b10
+
+/*
+Memory controller states
+*/
+`define MC_IDLE             2'b00
+`define MC_BUSY             2'b01
+`define MC_RELEASE          2'b10
+
+/*
+Memory arbiter states
+*/
+`define ARB_IDLE            2'b00
+`define ARB_BUSY            2'b01
+`define ARB_RELEASE         2'b10
+
 /*
 LSU States
 */
@@ -61,4 +82,19 @@ REG_WRITE INPUT MUX
 `define REG_WRITE_ALU       2'b01
 `define REG_WRITE_IMM       2'b10
 
+/*
+PERF COUNTER ADDRESS MAP (see perf_counters.v)
+*/
+`define PERF_REGION_GENERAL     2'b00
+`define PERF_REGION_LANE_MEM    2'b01
+`define PERF_REGION_PC_CYCLES   2'b10
+`define PERF_REGION_PC_RETIRED  2'b11
+
+`define PERF_RETIRED            8
+`define PERF_STALL_CYCLES       9
+`define PERF_LANE_ACTIVE        10
+`define PERF_ICACHE_HITS        11
+`define PERF_ICACHE_MISSES      12
+`define PERF_WAVE_SWITCHES      13
+
 `endif
\ No newline at end of file
@@ -0,0 +1,251 @@
+`timescale 1ns/1ps
+`include "common_defs.v"
+
+/*
+--------------------------------------
+Compute Unit
+--------------------------------------
+- Runs up to BLOCK_SLOTS blocks assigned by BlockDispatch (core_start[b]
+  high, core_block_id[32*b +: 32]) on NUM_SIMDS SIMDs; core_done[b] is
+  raised once every wave of block slot b's block is done
+- WaveDispatch hands the resident blocks' waves to the SIMDs (and their wave
+  slots), oldest block first; a SIMD's slots may hold waves of different
+  blocks. A block slot's wave counters are cleared while it is empty, so
+  each block starts from wave 0
+- slot_working shows which wave slots hold a wave (occupancy)
+- The SIMDs' fetchers share an InstructionCache (ICACHE_LINES lines) in
+  front of the program memory port; invalidate drops its lines (a new
+  program was loaded for the next launch)
+- All SIMD lanes share one coalescing MemoryController: requests of both
+  SIMDs to the same line are served by one transaction on the data memory
+  port (LINE_WORDS-word lines, same handshake as memory_controller.v)
+- perf_data reads SIMD perf_simd's counters at perf_addr (see perf_counters.v)
+--------------------------------------
+*/
+module ComputeUnit # (
+    parameter NUM_SIMDS = 2,
+    parameter DATA_WIDTH = 64,
+    parameter INSTRUCTION_WIDTH = 32,
+    parameter PROGRAM_MEM_ADDR_WIDTH = 6,
+    parameter DATA_REG_ADDR_WIDTH = 7,
+    parameter DATA_MEM_ADDR_WIDTH = 7,
+    parameter LANE_WIDTH = 16,
+    parameter WAVE_SIZE = 32,
+    parameter PIPELINED = 0,
+    parameter WAVE_SLOTS = 1,
+    parameter BLOCK_SLOTS = 1, // resident blocks
+    parameter ICACHE_LINES = 16, // shared instruction cache lines
+    parameter LINE_WORDS = 4 // words per data memory transaction
+)
+(
+    input wire clk,
+    input wire rst,
+    input wire enable,
+
+    // kernel metadata
+    input wire [31:0] num_threads,
+    input wire [31:0] block_dim,
+    input wire invalidate, // program memory changed: drop the instruction cache's lines
+
+    // blocks from the block dispatcher (one entry per block slot, {slot N-1, ..., slot 0})
+    input wire [BLOCK_SLOTS-1:0] core_start, // block slot is working on its core_block_id
+    input wire [32*BLOCK_SLOTS-1:0] core_block_id,
+    output wire [BLOCK_SLOTS-1:0] core_done, // every wave of the block slot's block is done
+    output wire [NUM_SIMDS*WAVE_SLOTS-1:0] slot_working, // wave slot holds a wave (SIMD s in bits [s*WAVE_SLOTS +: WAVE_SLOTS])
+
+    // program memory
+    input wire prog_mem_read_ack,
+    input wire [INSTRUCTION_WIDTH-1:0] prog_mem_read_data,
+    output wire prog_mem_read_valid,
+    output wire [PROGRAM_MEM_ADDR_WIDTH-1:0] prog_mem_addr,
+
+    // data memory (line transactions)
+    input wire mem_read_ack,
+    input wire mem_write_ack,
+    input wire [DATA_WIDTH-1:0] mem_read_data [LINE_WORDS-1:0],
+    output wire mem_read_valid,
+    output wire mem_write_valid,
+    output wire [DATA_MEM_ADDR_WIDTH-1:0] mem_addr,
+    output wire [LINE_WORDS-1:0] mem_write_mask,
+    output wire [DATA_WIDTH-1:0] mem_write_data [LINE_WORDS-1:0],
+
+    // performance counters of one SIMD
+    input wire [$clog2(NUM_SIMDS > 1 ? NUM_SIMDS : 2)-1:0] perf_simd,
+    input wire [PROGRAM_MEM_ADDR_WIDTH+1:0] perf_addr,
+    output wire [31:0] perf_data
+);
+
+localparam NUM_SLOTS = NUM_SIMDS * WAVE_SLOTS;
+localparam NUM_LANES = NUM_SIMDS * LANE_WIDTH;
+
+// -- START Wave dispatch --
+wire [NUM_SLOTS-1:0] simd_done;
+wire [NUM_SLOTS-1:0] simd_working;
+wire [NUM_SLOTS-1:0] simd_ready;
+wire [NUM_SLOTS-1:0] simd_start;
+wire signed [31:0] simd_wave_id [0:NUM_SLOTS-1];
+wire signed [31:0] simd_block_id [0:NUM_SLOTS-1];
+wire [31:0] simd_block_threads [0:NUM_SLOTS-1];
+// -- END Wave dispatch --
+
+assign slot_working = simd_working;
+
+// -- START Fetch --
+wire [NUM_SIMDS-1:0] fetch_valid;
+wire [PROGRAM_MEM_ADDR_WIDTH-1:0] fetch_addr [NUM_SIMDS-1:0];
+wire [NUM_SIMDS-1:0] fetch_ack;
+wire [INSTRUCTION_WIDTH-1:0] fetch_data [NUM_SIMDS-1:0];
+// -- END Fetch --
+
+// -- START Lanes (SIMD s owns lanes s*LANE_WIDTH ...) --
+wire [NUM_LANES-1:0] lane_read_valid;
+wire [NUM_LANES-1:0] lane_write_valid;
+wire [DATA_MEM_ADDR_WIDTH-1:0] lane_addr [NUM_LANES-1:0];
+wire [DATA_WIDTH-1:0] lane_write_data [NUM_LANES-1:0];
+wire [NUM_LANES-1:0] lane_read_ack;
+wire [NUM_LANES-1:0] lane_write_ack;
+wire [DATA_WIDTH-1:0] lane_read_data [NUM_LANES-1:0];
+// -- END Lanes --
+
+wire [31:0] simd_perf_data [NUM_SIMDS-1:0];
+assign perf_data = simd_perf_data[perf_simd];
+
+WaveDispatch #(
+    .NUM_SIMDS(NUM_SIMDS),
+    .WAVE_SIZE(WAVE_SIZE),
+    .WAVE_SLOTS(WAVE_SLOTS),
+    .BLOCK_SLOTS(BLOCK_SLOTS)
+) waveDispatch (
+    .clk(clk),
+    .rst(rst),
+    .enable(enable),
+    .num_threads(num_threads),
+    .block_dim(block_dim),
+    .core_start(core_start),
+    .core_block_id(core_block_id),
+    .simd_done(simd_done),
+    .simd_working(simd_working),
+    .simd_ready(simd_ready),
+    .simd_start(simd_start),
+    .num_waves(),
+    .num_actual_block_threads(),
+    .simd_wave_id(simd_wave_id),
+    .simd_block_id(simd_block_id),
+    .simd_block_threads(simd_block_threads),
+    .block_done(core_done)
+);
+
+genvar s, w, l;
+generate
+    for (s = 0; s < NUM_SIMDS; s = s + 1) begin : simd_gen
+        wire [32*WAVE_SLOTS-1:0] wave_id;
+        wire [32*WAVE_SLOTS-1:0] block_id;
+        wire [32*WAVE_SLOTS-1:0] block_threads;
+        wire [DATA_MEM_ADDR_WIDTH-1:0] addr [LANE_WIDTH-1:0];
+        wire [DATA_WIDTH-1:0] write_data [LANE_WIDTH-1:0];
+        wire [DATA_WIDTH-1:0] read_data [LANE_WIDTH-1:0];
+
+        for (w = 0; w < WAVE_SLOTS; w = w + 1) begin : slot_gen
+            assign wave_id[32*w +: 32] = simd_wave_id[s*WAVE_SLOTS + w];
+            assign block_id[32*w +: 32] = simd_block_id[s*WAVE_SLOTS + w];
+            assign block_threads[32*w +: 32] = simd_block_threads[s*WAVE_SLOTS + w];
+        end
+
+        for (l = 0; l < LANE_WIDTH; l = l + 1) begin : lane_gen
+            assign lane_addr[s*LANE_WIDTH + l] = addr[l];
+            assign lane_write_data[s*LANE_WIDTH + l] = write_data[l];
+            assign read_data[l] = lane_read_data[s*LANE_WIDTH + l];
+        end
+
+        SIMD #(
+            .DATA_WIDTH(DATA_WIDTH),
+            .INSTRUCTION_WIDTH(INSTRUCTION_WIDTH),
+            .PROGRAM_MEM_ADDR_WIDTH(PROGRAM_MEM_ADDR_WIDTH),
+            .DATA_REG_ADDR_WIDTH(DATA_REG_ADDR_WIDTH),
+            .DATA_MEM_ADDR_WIDTH(DATA_MEM_ADDR_WIDTH),
+            .LANE_WIDTH(LANE_WIDTH),
+            .WAVE_SIZE(WAVE_SIZE),
+            .ICACHE_LINES(0), // fetches go through the shared cache
+            .PIPELINED(PIPELINED),
+            .WAVE_SLOTS(WAVE_SLOTS)
+        ) simd (
+            .clk(clk),
+            .rst(rst),
+            .enable(enable),
+            .num_threads(num_threads),
+            .block_dim(block_dim),
+            .block_id(block_id),
+            .wave_id(wave_id),
+            .num_block_threads(block_threads),
+            .simd_ready(simd_ready[s*WAVE_SLOTS +: WAVE_SLOTS]),
+            .simd_start(simd_start[s*WAVE_SLOTS +: WAVE_SLOTS]),
+            .simd_working(simd_working[s*WAVE_SLOTS +: WAVE_SLOTS]),
+            .simd_done(simd_done[s*WAVE_SLOTS +: WAVE_SLOTS]),
+            .data_mem_read_ack(lane_read_ack[s*LANE_WIDTH +: LANE_WIDTH]),
+            .data_mem_write_ack(lane_write_ack[s*LANE_WIDTH +: LANE_WIDTH]),
+            .mem_read_data(read_data),
+            .prog_mem_read_ack(fetch_ack[s]),
+            .prog_mem_read_data(fetch_data[s]),
+            .mem_read_valid(lane_read_valid[s*LANE_WIDTH +: LANE_WIDTH]),
+            .mem_write_valid(lane_write_valid[s*LANE_WIDTH +: LANE_WIDTH]),
+            .mem_addr(addr),
+            .mem_write_data(write_data),
+            .prog_mem_read_valid(fetch_valid[s]),
+            .prog_mem_addr(fetch_addr[s]),
+            .perf_addr(perf_addr),
+            .perf_data(simd_perf_data[s])
+        );
+    end
+endgenerate
+
+InstructionCache #(
+    .NUM_CLIENTS(NUM_SIMDS),
+    .PROGRAM_MEM_ADDR_WIDTH(PROGRAM_MEM_ADDR_WIDTH),
+    .INSTRUCTION_WIDTH(INSTRUCTION_WIDTH),
+    .NUM_LINES(ICACHE_LINES)
+) icache (
+    .clk(clk),
+    .rst(rst),
+    .enable(enable),
+    .invalidate(invalidate),
+    .read_valid(fetch_valid),
+    .read_addr(fetch_addr),
+    .read_ack(fetch_ack),
+    .read_data(fetch_data),
+    .prog_mem_read_ack(prog_mem_read_ack),
+    .prog_mem_read_data(prog_mem_read_data),
+    .prog_mem_read_valid(prog_mem_read_valid),
+    .prog_mem_addr(prog_mem_addr),
+    .hits(),
+    .misses()
+);
+
+MemoryController #(
+    .NUM_LANES(NUM_LANES),
+    .DATA_WIDTH(DATA_WIDTH),
+    .DATA_MEM_ADDR_WIDTH(DATA_MEM_ADDR_WIDTH),
+    .LINE_WORDS(LINE_WORDS)
+) memoryController (
+    .clk(clk),
+    .rst(rst),
+    .enable(enable),
+    .lane_read_valid(lane_read_valid),
+    .lane_write_valid(lane_write_valid),
+    .lane_addr(lane_addr),
+    .lane_write_data(lane_write_data),
+    .lane_read_ack(lane_read_ack),
+    .lane_write_ack(lane_write_ack),
+    .lane_read_data(lane_read_data),
+    .mem_read_ack(mem_read_ack),
+    .mem_write_ack(mem_write_ack),
+    .mem_read_data(mem_read_data),
+    .mem_read_valid(mem_read_valid),
+    .mem_write_valid(mem_write_valid),
+    .mem_addr(mem_addr),
+    .mem_write_mask(mem_write_mask),
+    .mem_write_data(mem_write_data),
+    .lane_requests(),
+    .mem_transactions()
+);
+
+endmodule
@@ -6,6 +6,9 @@
 Decoder
 --------------------------------
 - Decodes instructions and sets control signals
+- op_code/rd/rm/rn follow the fetched instruction; the control signals are
+  latched in SIMD_DECODE, or on issue from the prefetched instruction (the
+  instruction in UPDATE still sees its own signals on that clock)
 */
 module Decoder # (
     parameter INSTRUCTION_WIDTH = 32
@@ -18,6 +21,8 @@ module Decoder # (
     // States
     input wire [2:0] simd_state,
     input [INSTRUCTION_WIDTH-1:0] instruction,
+    input wire issue, // pipelined SIMD: decode next_instruction this clock
+    input [INSTRUCTION_WIDTH-1:0] next_instruction,
 
     // Signals
     output reg REG_WRITE,
@@ -36,6 +41,8 @@ module Decoder # (
 
 reg [4:0] other;
 
+wire [INSTRUCTION_WIDTH-1:0] decode_instruction = issue ? next_instruction : instruction;
+
 always @ (*) begin
     op_code <= instruction[31:26];
     rd <= instruction[25:19];
@@ -61,7 +68,7 @@ always @ (posedge(clk)) begin
     end
 
     else if (enable) begin        
-        if (simd_state == `SIMD_DECODE) begin
+        if (simd_state == `SIMD_DECODE || issue) begin
             REG_WRITE <= 0;
             MEM_READ <= 0;
             MEM_WRITE <= 0;
@@ -69,7 +76,7 @@ always @ (posedge(clk)) begin
             RET <= 0;
             alu_op <= 0;
 
-            case (op_code)
+            case (decode_instruction[31:26])
                 `OP_LOAD: begin
                     REG_WRITE <= 1;
                     MEM_READ <= 1;
@@ -119,7 +126,7 @@ always @ (posedge(clk)) begin
                 `OP_CONST: begin
                     REG_WRITE <= 1;
                     REG_WRITE_MUX <= `REG_WRITE_IMM;
-                    imm_19 <= {rm, rn, other};
+                    imm_19 <= decode_instruction[18:0]; // {rm, rn, other}
                 end
 
                 `OP_RET: begin
@@ -6,12 +6,18 @@
 Instruction Fetcher
 --------------------------------
 - Fetches instructions from program memory based on current PC
+- PIPELINED: while an instruction is in flight, prefetches the one after it
+  (PC + 1; programs are straight-line and nothing follows RET) into
+  next_instruction; the controller takes it with issue instead of going
+  through FETCH/DECODE
 --------------------------------
 */
 
 module Fetcher # (
     parameter PROGRAM_MEM_ADDR_WIDTH = 6,
-    parameter INSTRUCTION_WIDTH = 32
+    parameter INSTRUCTION_WIDTH = 32,
+    parameter PIPELINED = 0,
+    parameter WAVE_SLOTS = 1
 )
 (
     input wire clk,
@@ -21,6 +27,7 @@ module Fetcher # (
     // States
     input wire [2:0] simd_state,
     input wire [PROGRAM_MEM_ADDR_WIDTH-1:0] curr_pc,
+    input wire [$clog2(WAVE_SLOTS > 1 ? WAVE_SLOTS : 2)-1:0] curr_slot, // resident wave curr_pc belongs to
 
     // From program memory
     input wire prog_mem_read_ack,
@@ -30,23 +37,69 @@ module Fetcher # (
     output reg prog_mem_read_valid,
     output reg [PROGRAM_MEM_ADDR_WIDTH-1:0] prog_mem_addr,
     output reg [2:0] fetcher_state,
-    output reg [INSTRUCTION_WIDTH-1:0] instruction
+    output reg [INSTRUCTION_WIDTH-1:0] instruction,
+
+    // prefetch (PIPELINED)
+    input wire issue, // controller takes next_instruction this clock
+    output reg [INSTRUCTION_WIDTH-1:0] next_instruction,
+    output reg [PROGRAM_MEM_ADDR_WIDTH-1:0] next_pc,
+    output reg [$clog2(WAVE_SLOTS > 1 ? WAVE_SLOTS : 2)-1:0] next_slot, // wave next_pc belongs to
+    output reg next_ready
 );
 
+reg prefetching; // current fetch is for next_instruction
+
+// the instruction in `instruction` is being decoded/executed and its successor is not fetched yet
+wire prefetch = PIPELINED && !next_ready && instruction[31:26] != `OP_RET
+    && (simd_state == `SIMD_DECODE || simd_state == `SIMD_REQUEST
+        || simd_state == `SIMD_WAIT || simd_state == `SIMD_EXECUTE);
+
 always @ (posedge(clk)) begin
     if (rst) begin
         prog_mem_read_valid <= 0;
         prog_mem_addr <= 0;
         instruction <= 0;
         fetcher_state <= `FETCHER_IDLE;
+        next_instruction <= 0;
+        next_pc <= 0;
+        next_slot <= 0;
+        next_ready <= 0;
+        prefetching <= 0;
     end
 
     else if (enable) begin
+        if (issue) begin
+            instruction <= next_instruction;
+            next_ready <= 0;
+        end
+
         case (fetcher_state) 
             `FETCHER_IDLE: begin
-                if (simd_state == `SIMD_FETCH) begin
+                if (issue) begin
+                    // start on the instruction after the one just issued
+                    if (next_instruction[31:26] != `OP_RET) begin
+                        prog_mem_read_valid <= 1;
+                        prog_mem_addr <= next_pc + 1;
+                        next_pc <= next_pc + 1;
+                        prefetching <= 1;
+                        fetcher_state <= `FETCHER_FETCHING;
+                    end
+                end
+
+                else if (simd_state == `SIMD_FETCH) begin
                     prog_mem_read_valid <= 1;
                     prog_mem_addr <= curr_pc;
+                    prefetching <= 0;
+                    next_ready <= 0; // not for curr_pc/curr_slot (or the controller would have issued it)
+                    fetcher_state <= `FETCHER_FETCHING;
+                end
+
+                else if (prefetch) begin
+                    prog_mem_read_valid <= 1;
+                    prog_mem_addr <= curr_pc + 1;
+                    next_pc <= curr_pc + 1;
+                    next_slot <= curr_slot;
+                    prefetching <= 1;
                     fetcher_state <= `FETCHER_FETCHING;
                 end
             end
@@ -54,8 +107,15 @@ always @ (posedge(clk)) begin
             `FETCHER_FETCHING: begin
                 if (prog_mem_read_ack) begin
                     prog_mem_read_valid <= 0;
-                    instruction <= prog_mem_read_data;
-                    fetcher_state <= `FETCHER_FETCHED;
+                    if (prefetching) begin
+                        next_instruction <= prog_mem_read_data;
+                        next_ready <= 1;
+                        fetcher_state <= `FETCHER_IDLE;
+                    end
+                    else begin
+                        instruction <= prog_mem_read_data;
+                        fetcher_state <= `FETCHER_FETCHED;
+                    end
                 end
             end
 
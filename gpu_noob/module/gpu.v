@@ -0,0 +1,256 @@
+`timescale 1ns/1ps
+`include "common_defs.v"
+
+/*
+--------------------------------------
+GPU
+--------------------------------------
+- BlockDispatch hands the blocks of a launch (num_threads / block_dim) to
+  NUM_CORES ComputeUnits; kernel_done once every block is done
+- A ComputeUnit holds up to BLOCK_SLOTS blocks at once, as long as their
+  waves fit in its NUM_SIMDS * WAVE_SLOTS wave slots
+- kernel_cycles / resident_wave_cycles count the cycles until kernel_done
+  and the wave slots holding a wave over them: achieved occupancy is
+  resident_wave_cycles / (kernel_cycles * NUM_CORES * NUM_SIMDS * WAVE_SLOTS)
+- A launch runs from rst: load program and data memory, drop rst with
+  enable high, wait for kernel_done. Further launches need no reset: once
+  kernel_done, load the next program, set num_threads/block_dim and pulse
+  kernel_start (which also invalidates the instruction caches), then wait
+  for kernel_done again (see test/command_queue.py)
+- Program memory and data memory each sit behind a MemoryArbiter that
+  serves the compute units' instruction caches / memory controllers one
+  transaction at a time, round-robin
+- perf_data reads the counters of SIMD perf_simd (core perf_simd / NUM_SIMDS)
+  at perf_addr (see perf_counters.v)
+--------------------------------------
+*/
+module GPU # (
+    parameter NUM_CORES = 4,
+    parameter NUM_SIMDS = 2, // per compute unit
+    parameter DATA_WIDTH = 64,
+    parameter INSTRUCTION_WIDTH = 32,
+    parameter PROGRAM_MEM_ADDR_WIDTH = 6,
+    parameter DATA_REG_ADDR_WIDTH = 7,
+    parameter DATA_MEM_ADDR_WIDTH = 7,
+    parameter LANE_WIDTH = 16,
+    parameter WAVE_SIZE = 32,
+    parameter PIPELINED = 0,
+    parameter WAVE_SLOTS = 1,
+    parameter BLOCK_SLOTS = 1, // resident blocks per compute unit
+    parameter ICACHE_LINES = 16,
+    parameter LINE_WORDS = 4
+)
+(
+    input wire clk,
+    input wire rst,
+    input wire enable,
+
+    // kernel metadata
+    input wire [31:0] num_threads,
+    input wire [31:0] block_dim,
+    input wire kernel_start, // start the next launch after kernel_done
+    output wire kernel_done,
+
+    // occupancy counters
+    output wire [31:0] kernel_cycles,
+    output wire [31:0] resident_wave_cycles,
+
+    // program memory
+    input wire prog_mem_read_ack,
+    input wire [INSTRUCTION_WIDTH-1:0] prog_mem_read_data,
+    output wire prog_mem_read_valid,
+    output wire [PROGRAM_MEM_ADDR_WIDTH-1:0] prog_mem_addr,
+
+    // data memory (line transactions)
+    input wire mem_read_ack,
+    input wire mem_write_ack,
+    input wire [DATA_WIDTH-1:0] mem_read_data [LINE_WORDS-1:0],
+    output wire mem_read_valid,
+    output wire mem_write_valid,
+    output wire [DATA_MEM_ADDR_WIDTH-1:0] mem_addr,
+    output wire [LINE_WORDS-1:0] mem_write_mask,
+    output wire [DATA_WIDTH-1:0] mem_write_data [LINE_WORDS-1:0],
+
+    // performance counters of one SIMD
+    input wire [31:0] perf_simd,
+    input wire [PROGRAM_MEM_ADDR_WIDTH+1:0] perf_addr,
+    output wire [31:0] perf_data
+);
+
+localparam LINE_BITS = LINE_WORDS * DATA_WIDTH;
+localparam CU_WAVE_SLOTS = NUM_SIMDS * WAVE_SLOTS;
+
+// -- START Block dispatch (core c, block slot b at c*BLOCK_SLOTS + b) --
+wire [NUM_CORES*BLOCK_SLOTS-1:0] core_done;
+wire [NUM_CORES*BLOCK_SLOTS-1:0] core_start;
+wire [NUM_CORES*BLOCK_SLOTS-1:0] core_ready;
+wire signed [31:0] core_block_id [0:NUM_CORES*BLOCK_SLOTS-1];
+wire [NUM_CORES*CU_WAVE_SLOTS-1:0] slot_working;
+// -- END Block dispatch --
+
+// -- START Compute unit memory ports (core c in bits [c*W +: W]) --
+wire [NUM_CORES-1:0] fetch_valid;
+wire [NUM_CORES*PROGRAM_MEM_ADDR_WIDTH-1:0] fetch_addr;
+wire [NUM_CORES-1:0] fetch_ack;
+wire [INSTRUCTION_WIDTH-1:0] fetch_data;
+
+wire [NUM_CORES-1:0] core_read_valid;
+wire [NUM_CORES-1:0] core_write_valid;
+wire [NUM_CORES*DATA_MEM_ADDR_WIDTH-1:0] core_addr;
+wire [NUM_CORES*LINE_WORDS-1:0] core_write_mask;
+wire [NUM_CORES*LINE_BITS-1:0] core_write_data;
+wire [NUM_CORES-1:0] core_read_ack;
+wire [NUM_CORES-1:0] core_write_ack;
+wire [LINE_BITS-1:0] core_read_data;
+// -- END Compute unit memory ports --
+
+wire [LINE_BITS-1:0] line_read_data;
+wire [LINE_BITS-1:0] line_write_data;
+
+wire [31:0] core_perf_data [NUM_CORES-1:0];
+assign perf_data = core_perf_data[perf_simd / NUM_SIMDS];
+
+BlockDispatch #(
+    .NUM_CORES(NUM_CORES),
+    .BLOCK_SLOTS(BLOCK_SLOTS),
+    .CU_WAVE_SLOTS(CU_WAVE_SLOTS),
+    .WAVE_SIZE(WAVE_SIZE)
+) blockDispatch (
+    .clk(clk),
+    .rst(rst),
+    .enable(enable),
+    .num_threads(num_threads),
+    .block_dim(block_dim),
+    .kernel_start(kernel_start),
+    .core_done(core_done),
+    .core_start(core_start),
+    .core_ready(core_ready),
+    .core_block_id(core_block_id),
+    .slot_working(slot_working),
+    .kernel_cycles(kernel_cycles),
+    .resident_wave_cycles(resident_wave_cycles),
+    .kernel_done(kernel_done)
+);
+
+genvar c, w, b;
+generate
+    for (c = 0; c < NUM_CORES; c = c + 1) begin : core_gen
+        wire [DATA_WIDTH-1:0] read_data [LINE_WORDS-1:0];
+        wire [DATA_WIDTH-1:0] write_data [LINE_WORDS-1:0];
+        wire [32*BLOCK_SLOTS-1:0] block_id;
+
+        for (b = 0; b < BLOCK_SLOTS; b = b + 1) begin : block_gen
+            assign block_id[32*b +: 32] = core_block_id[c*BLOCK_SLOTS + b];
+        end
+
+        for (w = 0; w < LINE_WORDS; w = w + 1) begin : word_gen
+            assign read_data[w] = core_read_data[w*DATA_WIDTH +: DATA_WIDTH];
+            assign core_write_data[(c*LINE_WORDS + w)*DATA_WIDTH +: DATA_WIDTH] = write_data[w];
+        end
+
+        ComputeUnit #(
+            .NUM_SIMDS(NUM_SIMDS),
+            .DATA_WIDTH(DATA_WIDTH),
+            .INSTRUCTION_WIDTH(INSTRUCTION_WIDTH),
+            .PROGRAM_MEM_ADDR_WIDTH(PROGRAM_MEM_ADDR_WIDTH),
+            .DATA_REG_ADDR_WIDTH(DATA_REG_ADDR_WIDTH),
+            .DATA_MEM_ADDR_WIDTH(DATA_MEM_ADDR_WIDTH),
+            .LANE_WIDTH(LANE_WIDTH),
+            .WAVE_SIZE(WAVE_SIZE),
+            .PIPELINED(PIPELINED),
+            .WAVE_SLOTS(WAVE_SLOTS),
+            .BLOCK_SLOTS(BLOCK_SLOTS),
+            .ICACHE_LINES(ICACHE_LINES),
+            .LINE_WORDS(LINE_WORDS)
+        ) computeUnit (
+            .clk(clk),
+            .rst(rst),
+            .enable(enable),
+            .num_threads(num_threads),
+            .block_dim(block_dim),
+            .invalidate(kernel_start && kernel_done),
+            .core_start(core_start[c*BLOCK_SLOTS +: BLOCK_SLOTS]),
+            .core_block_id(block_id),
+            .core_done(core_done[c*BLOCK_SLOTS +: BLOCK_SLOTS]),
+            .slot_working(slot_working[c*CU_WAVE_SLOTS +: CU_WAVE_SLOTS]),
+            .prog_mem_read_ack(fetch_ack[c]),
+            .prog_mem_read_data(fetch_data),
+            .prog_mem_read_valid(fetch_valid[c]),
+            .prog_mem_addr(fetch_addr[c*PROGRAM_MEM_ADDR_WIDTH +: PROGRAM_MEM_ADDR_WIDTH]),
+            .mem_read_ack(core_read_ack[c]),
+            .mem_write_ack(core_write_ack[c]),
+            .mem_read_data(read_data),
+            .mem_read_valid(core_read_valid[c]),
+            .mem_write_valid(core_write_valid[c]),
+            .mem_addr(core_addr[c*DATA_MEM_ADDR_WIDTH +: DATA_MEM_ADDR_WIDTH]),
+            .mem_write_mask(core_write_mask[c*LINE_WORDS +: LINE_WORDS]),
+            .mem_write_data(write_data),
+            .perf_simd(perf_simd % NUM_SIMDS),
+            .perf_addr(perf_addr),
+            .perf_data(core_perf_data[c])
+        );
+    end
+
+    for (w = 0; w < LINE_WORDS; w = w + 1) begin : line_gen
+        assign line_read_data[w*DATA_WIDTH +: DATA_WIDTH] = mem_read_data[w];
+        assign mem_write_data[w] = line_write_data[w*DATA_WIDTH +: DATA_WIDTH];
+    end
+endgenerate
+
+MemoryArbiter #(
+    .NUM_CLIENTS(NUM_CORES),
+    .DATA_WIDTH(INSTRUCTION_WIDTH),
+    .ADDR_WIDTH(PROGRAM_MEM_ADDR_WIDTH),
+    .LINE_WORDS(1)
+) progArbiter (
+    .clk(clk),
+    .rst(rst),
+    .enable(enable),
+    .client_read_valid(fetch_valid),
+    .client_write_valid({NUM_CORES{1'b0}}),
+    .client_addr(fetch_addr),
+    .client_write_mask({NUM_CORES{1'b0}}),
+    .client_write_data({NUM_CORES*INSTRUCTION_WIDTH{1'b0}}),
+    .client_read_ack(fetch_ack),
+    .client_write_ack(),
+    .client_read_data(fetch_data),
+    .mem_read_ack(prog_mem_read_ack),
+    .mem_write_ack(1'b0),
+    .mem_read_data(prog_mem_read_data),
+    .mem_read_valid(prog_mem_read_valid),
+    .mem_write_valid(),
+    .mem_addr(prog_mem_addr),
+    .mem_write_mask(),
+    .mem_write_data(),
+    .grants()
+);
+
+MemoryArbiter #(
+    .NUM_CLIENTS(NUM_CORES),
+    .DATA_WIDTH(DATA_WIDTH),
+    .ADDR_WIDTH(DATA_MEM_ADDR_WIDTH),
+    .LINE_WORDS(LINE_WORDS)
+) dataArbiter (
+    .clk(clk),
+    .rst(rst),
+    .enable(enable),
+    .client_read_valid(core_read_valid),
+    .client_write_valid(core_write_valid),
+    .client_addr(core_addr),
+    .client_write_mask(core_write_mask),
+    .client_write_data(core_write_data),
+    .client_read_ack(core_read_ack),
+    .client_write_ack(core_write_ack),
+    .client_read_data(core_read_data),
+    .mem_read_ack(mem_read_ack),
+    .mem_write_ack(mem_write_ack),
+    .mem_read_data(line_read_data),
+    .mem_read_valid(mem_read_valid),
+    .mem_write_valid(mem_write_valid),
+    .mem_addr(mem_addr),
+    .mem_write_mask(mem_write_mask),
+    .mem_write_data(line_write_data),
+    .grants()
+);
+
+endmodule
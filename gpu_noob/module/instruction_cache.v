@@ -0,0 +1,176 @@
+`timescale 1ns/1ps
+`include "common_defs.v"
+
+/*
+--------------------------------------
+Instruction Cache
+--------------------------------------
+- Sits between the Fetchers of a compute unit and program memory
+- Direct-mapped, one instruction per line, full address kept as the tag
+- Each client (Fetcher) uses the same valid/ack handshake as program memory:
+  hold read_valid until read_ack, ack stays high while valid is high
+- Hits are acked on the next clock; misses are filled one at a time
+  (round-robin over the waiting clients) and every client waiting on the
+  filled address is acked on the same clock
+- hits/misses count requests (a request that missed is not counted again
+  when its fill arrives); cleared on rst
+- invalidate drops every line (e.g. before a new program is loaded)
+--------------------------------------
+*/
+module InstructionCache # (
+    parameter NUM_CLIENTS = 2, // fetchers sharing the cache (SIMDs in a CU)
+    parameter PROGRAM_MEM_ADDR_WIDTH = 6,
+    parameter INSTRUCTION_WIDTH = 32,
+    parameter NUM_LINES = 16
+)
+(
+    input wire clk,
+    input wire rst,
+    input wire enable,
+    input wire invalidate,
+
+    // from fetchers
+    input wire [NUM_CLIENTS-1:0] read_valid,
+    input wire [PROGRAM_MEM_ADDR_WIDTH-1:0] read_addr [NUM_CLIENTS-1:0],
+    output reg [NUM_CLIENTS-1:0] read_ack,
+    output reg [INSTRUCTION_WIDTH-1:0] read_data [NUM_CLIENTS-1:0],
+
+    // to program memory
+    input wire prog_mem_read_ack,
+    input wire [INSTRUCTION_WIDTH-1:0] prog_mem_read_data,
+    output reg prog_mem_read_valid,
+    output reg [PROGRAM_MEM_ADDR_WIDTH-1:0] prog_mem_addr,
+
+    // counters
+    output reg [31:0] hits,
+    output reg [31:0] misses
+);
+
+localparam CLIENT_WIDTH = NUM_CLIENTS > 1 ? $clog2(NUM_CLIENTS) : 1;
+
+reg line_valid [NUM_LINES-1:0];
+reg [PROGRAM_MEM_ADDR_WIDTH-1:0] line_addr [NUM_LINES-1:0];
+reg [INSTRUCTION_WIDTH-1:0] line_data [NUM_LINES-1:0];
+
+reg [NUM_CLIENTS-1:0] missed; // current request was already counted as a miss
+reg [1:0] fill_state;
+reg [CLIENT_WIDTH-1:0] next_client; // round-robin: first client considered for the next fill
+
+// lookup
+reg [NUM_CLIENTS-1:0] hit;
+reg [NUM_CLIENTS-1:0] waiting; // valid request not acked yet
+reg [$clog2(NUM_CLIENTS+1)-1:0] new_hits;
+reg [$clog2(NUM_CLIENTS+1)-1:0] new_misses;
+reg fill_found;
+reg [CLIENT_WIDTH-1:0] fill_client;
+
+integer c, k;
+
+always @(*) begin
+    new_hits = 0;
+    new_misses = 0;
+    for (c = 0; c < NUM_CLIENTS; c = c + 1) begin
+        hit[c] = line_valid[read_addr[c] % NUM_LINES] && line_addr[read_addr[c] % NUM_LINES] == read_addr[c];
+        waiting[c] = read_valid[c] && !read_ack[c];
+        if (waiting[c] && !missed[c]) begin
+            if (hit[c]) new_hits = new_hits + 1;
+            else new_misses = new_misses + 1;
+        end
+    end
+
+    // next miss to fill, starting from next_client
+    fill_found = 0;
+    fill_client = 0;
+    for (k = 0; k < NUM_CLIENTS; k = k + 1) begin
+        c = (next_client + k) % NUM_CLIENTS;
+        if (!fill_found && waiting[c] && !hit[c]) begin
+            fill_found = 1;
+            fill_client = c[CLIENT_WIDTH-1:0];
+        end
+    end
+end
+
+always @ (posedge(clk)) begin
+    if (rst) begin
+        for (k = 0; k < NUM_LINES; k = k + 1) begin
+            line_valid[k] <= 0;
+        end
+        for (c = 0; c < NUM_CLIENTS; c = c + 1) begin
+            read_data[c] <= 0;
+        end
+        read_ack <= 0;
+        missed <= 0;
+        prog_mem_read_valid <= 0;
+        prog_mem_addr <= 0;
+        fill_state <= `ICACHE_IDLE;
+        next_client <= 0;
+        hits <= 0;
+        misses <= 0;
+    end
+
+    else if (enable) begin
+        hits <= hits + new_hits;
+        misses <= misses + new_misses;
+
+        for (c = 0; c < NUM_CLIENTS; c = c + 1) begin
+            if (!read_valid[c]) begin
+                read_ack[c] <= 0;
+                missed[c] <= 0;
+            end
+            else if (waiting[c]) begin
+                if (hit[c]) begin
+                    read_ack[c] <= 1;
+                    read_data[c] <= line_data[read_addr[c] % NUM_LINES];
+                end
+                else begin
+                    missed[c] <= 1;
+                end
+            end
+        end
+
+        case (fill_state)
+            `ICACHE_IDLE: begin
+                if (fill_found) begin
+                    prog_mem_read_valid <= 1;
+                    prog_mem_addr <= read_addr[fill_client];
+                    next_client <= fill_client == NUM_CLIENTS - 1 ? 0 : fill_client + 1;
+                    fill_state <= `ICACHE_FILLING;
+                end
+            end
+
+            `ICACHE_FILLING: begin
+                if (prog_mem_read_ack) begin
+                    prog_mem_read_valid <= 0;
+                    line_valid[prog_mem_addr % NUM_LINES] <= 1;
+                    line_addr[prog_mem_addr % NUM_LINES] <= prog_mem_addr;
+                    line_data[prog_mem_addr % NUM_LINES] <= prog_mem_read_data;
+                    // forward to everyone waiting on this address
+                    for (c = 0; c < NUM_CLIENTS; c = c + 1) begin
+                        if (waiting[c] && read_addr[c] == prog_mem_addr) begin
+                            read_ack[c] <= 1;
+                            read_data[c] <= prog_mem_read_data;
+                        end
+                    end
+                    fill_state <= `ICACHE_RELEASE;
+                end
+            end
+
+            `ICACHE_RELEASE: begin
+                // program memory holds ack while valid was high; wait for it to drop
+                if (!prog_mem_read_ack) begin
+                    fill_state <= `ICACHE_IDLE;
+                end
+            end
+
+            default: fill_state <= `ICACHE_IDLE;
+        endcase
+
+        if (invalidate) begin
+            for (k = 0; k < NUM_LINES; k = k + 1) begin
+                line_valid[k] <= 0;
+            end
+        end
+    end
+end
+
+endmodule
@@ -11,7 +11,7 @@ Load/Store Unit
 
 module LSU # (
     DATA_WIDTH = 64,
-    DATA_REG_ADDR_WIDTH = 7
+    DATA_MEM_ADDR_WIDTH = 7 // word address width, up to DATA_WIDTH
 )
 (
     /*INPUTS START*/
@@ -30,6 +30,7 @@ module LSU # (
     // enable signals -- which op to perform_data
     input wire MEM_READ,
     input wire MEM_WRITE,
+    input wire lsu_release, // SIMD wrote a switched-out wave's load back (DONE -> IDLE without its UPDATE)
 
     // from data memory inputs
     input wire mem_read_ack,
@@ -41,7 +42,7 @@ module LSU # (
     // data memory outputs
     output reg mem_read_valid, // initiate mem_read signal
     output reg mem_write_valid, // initiate mem_write signal
-    output reg [DATA_REG_ADDR_WIDTH-1:0] mem_addr,
+    output reg [DATA_MEM_ADDR_WIDTH-1:0] mem_addr,
     output reg [DATA_WIDTH-1:0] mem_write_data, 
 
     // outputs
@@ -50,10 +51,13 @@ module LSU # (
     /*OUTPUTS END*/
 );
 
+reg store; // kind of the request in flight -- the SIMD may decode other waves' instructions meanwhile
+
 always @ (posedge(clk)) begin
     if (rst) begin
         lsu_state <= `LSU_IDLE;
         lsu_read_out <= 0;
+        store <= 0;
         // data mem outputs
         mem_read_valid <= 0;
         mem_write_valid <= 0;
@@ -62,76 +66,46 @@ always @ (posedge(clk)) begin
     end
 
     else if (enable) begin
-        if (MEM_READ) begin
-            case (lsu_state) 
-                `LSU_IDLE: begin
-                    if (simd_state == `SIMD_REQUEST) begin
-                        // SIMD is making request to LSU
-                        lsu_state <= `LSU_REQUESTING;
-                    end
-                end
-
-                `LSU_REQUESTING: begin
-                    // give signal/data to memory
-                    mem_read_valid <= 1;
-                    mem_addr <= rm_data;
-                    lsu_state <= `LSU_WAITING;
-                end
-
-                `LSU_WAITING: begin
-                    if (mem_read_ack) begin
-                        // mem_read done/acked
-                        mem_read_valid <= 0;
-                        lsu_read_out <= mem_read_data;
-                        lsu_state <= `LSU_DONE;
-                    end
-                end
-
-                `LSU_DONE: begin
-                    if (simd_state == `SIMD_UPDATE) begin
-                        // simd state == UPDATE
-                        lsu_state <= `LSU_IDLE;
-                    end
+        case (lsu_state) 
+            `LSU_IDLE: begin
+                if (simd_state == `SIMD_REQUEST && (MEM_READ || MEM_WRITE)) begin
+                    // SIMD is making request to LSU
+                    store <= MEM_WRITE;
+                    lsu_state <= `LSU_REQUESTING;
                 end
-            endcase
-        end
-
-        else if (MEM_WRITE) begin
-            case(lsu_state)
-                `LSU_IDLE: begin
-                    // SIMD state == REQUEST
-                    if (simd_state == `SIMD_REQUEST) begin
-                        lsu_state <= `LSU_REQUESTING;
-                    end
-                end
-
-                `LSU_REQUESTING: begin
-                    // give signal/data to memory
-                    mem_write_valid <= 1;
-                    mem_addr <= rm_data;
+            end
+
+            `LSU_REQUESTING: begin
+                // give signal/data to memory
+                mem_read_valid <= !store;
+                mem_write_valid <= store;
+                mem_addr <= rm_data[DATA_MEM_ADDR_WIDTH-1:0];
+                if (store) begin
                     mem_write_data <= rn_data;
-                    lsu_state <= `LSU_WAITING;
                 end
-
-                `LSU_WAITING: begin
-                    if (mem_write_ack) begin
-                        // mem_write done/acked
-                        mem_write_valid <= 1;
-                        lsu_state <= `LSU_DONE;
+                lsu_state <= `LSU_WAITING;
+            end
+
+            `LSU_WAITING: begin
+                if (store ? mem_write_ack : mem_read_ack) begin
+                    // mem_read/mem_write done/acked
+                    mem_read_valid <= 0;
+                    mem_write_valid <= 0;
+                    if (!store) begin
+                        lsu_read_out <= mem_read_data;
                     end
+                    lsu_state <= `LSU_DONE;
                 end
+            end
 
-                `LSU_DONE: begin
-                    if (simd_state == `SIMD_UPDATE) begin
-                        // simd state == UPDATE
-                        lsu_state <= `LSU_IDLE;
-                    end
+            `LSU_DONE: begin
+                // the load/store that made the request writes back (other waves' UPDATEs are not loads/stores)
+                if ((simd_state == `SIMD_UPDATE && (MEM_READ || MEM_WRITE)) || lsu_release) begin
+                    lsu_state <= `LSU_IDLE;
                 end
-            endcase
-        end
+            end
+        endcase
     end
 end
 
-
-
 endmodule
\ No newline at end of file
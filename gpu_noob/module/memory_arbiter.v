@@ -0,0 +1,149 @@
+`timescale 1ns/1ps
+`include "common_defs.v"
+
+/*
+--------------------------------------
+Memory Arbiter
+--------------------------------------
+- Shares one memory port between NUM_CLIENTS ports that use the same
+  valid/ack handshake (compute units' instruction caches or memory
+  controllers): hold valid until ack, ack stays high while valid is high
+- One transaction at a time, granted round-robin from the client after the
+  last one served; the granted client's request is forwarded unchanged
+- Requests move LINE_WORDS words (1 for program memory); writes carry a word
+  mask. Client ports are packed, client c in bits [c*W +: W]
+- read_data is shared by every client and only meaningful with the
+  client's read_ack
+- grants counts transactions forwarded to memory; cleared on rst
+--------------------------------------
+*/
+module MemoryArbiter # (
+    parameter NUM_CLIENTS = 4,
+    parameter DATA_WIDTH = 64,
+    parameter ADDR_WIDTH = 7,
+    parameter LINE_WORDS = 4
+)
+(
+    input wire clk,
+    input wire rst,
+    input wire enable,
+
+    // from clients
+    input wire [NUM_CLIENTS-1:0] client_read_valid,
+    input wire [NUM_CLIENTS-1:0] client_write_valid,
+    input wire [NUM_CLIENTS*ADDR_WIDTH-1:0] client_addr,
+    input wire [NUM_CLIENTS*LINE_WORDS-1:0] client_write_mask,
+    input wire [NUM_CLIENTS*LINE_WORDS*DATA_WIDTH-1:0] client_write_data,
+    output reg [NUM_CLIENTS-1:0] client_read_ack,
+    output reg [NUM_CLIENTS-1:0] client_write_ack,
+    output reg [LINE_WORDS*DATA_WIDTH-1:0] client_read_data,
+
+    // to memory
+    input wire mem_read_ack,
+    input wire mem_write_ack,
+    input wire [LINE_WORDS*DATA_WIDTH-1:0] mem_read_data,
+    output reg mem_read_valid,
+    output reg mem_write_valid,
+    output reg [ADDR_WIDTH-1:0] mem_addr,
+    output reg [LINE_WORDS-1:0] mem_write_mask,
+    output reg [LINE_WORDS*DATA_WIDTH-1:0] mem_write_data,
+
+    // counters
+    output reg [31:0] grants
+);
+
+localparam CLIENT_WIDTH = NUM_CLIENTS > 1 ? $clog2(NUM_CLIENTS) : 1;
+
+reg [1:0] arb_state;
+reg [CLIENT_WIDTH-1:0] granted;
+reg granted_write;
+reg [CLIENT_WIDTH-1:0] next_client; // round-robin: first client considered for the next grant
+
+// next request to forward, starting from next_client
+reg [NUM_CLIENTS-1:0] waiting;
+reg grant_found;
+reg [CLIENT_WIDTH-1:0] grant_client;
+
+integer c, k;
+
+always @(*) begin
+    waiting = (client_read_valid & ~client_read_ack) | (client_write_valid & ~client_write_ack);
+
+    grant_found = 0;
+    grant_client = 0;
+    for (k = 0; k < NUM_CLIENTS; k = k + 1) begin
+        c = (next_client + k) % NUM_CLIENTS;
+        if (!grant_found && waiting[c]) begin
+            grant_found = 1;
+            grant_client = c[CLIENT_WIDTH-1:0];
+        end
+    end
+end
+
+always @ (posedge(clk)) begin
+    if (rst) begin
+        client_read_ack <= 0;
+        client_write_ack <= 0;
+        client_read_data <= 0;
+        mem_read_valid <= 0;
+        mem_write_valid <= 0;
+        mem_addr <= 0;
+        mem_write_mask <= 0;
+        mem_write_data <= 0;
+        granted <= 0;
+        granted_write <= 0;
+        next_client <= 0;
+        grants <= 0;
+        arb_state <= `ARB_IDLE;
+    end
+
+    else if (enable) begin
+        // clients that dropped valid are done with their request
+        client_read_ack <= client_read_ack & client_read_valid;
+        client_write_ack <= client_write_ack & client_write_valid;
+
+        case (arb_state)
+            `ARB_IDLE: begin
+                if (grant_found) begin
+                    // writes win if a client raises both (they never do)
+                    mem_read_valid <= !client_write_valid[grant_client];
+                    mem_write_valid <= client_write_valid[grant_client];
+                    mem_addr <= client_addr[grant_client*ADDR_WIDTH +: ADDR_WIDTH];
+                    mem_write_mask <= client_write_mask[grant_client*LINE_WORDS +: LINE_WORDS];
+                    mem_write_data <= client_write_data[grant_client*LINE_WORDS*DATA_WIDTH +: LINE_WORDS*DATA_WIDTH];
+                    granted <= grant_client;
+                    granted_write <= client_write_valid[grant_client];
+                    next_client <= grant_client == NUM_CLIENTS - 1 ? 0 : grant_client + 1;
+                    grants <= grants + 1;
+                    arb_state <= `ARB_BUSY;
+                end
+            end
+
+            `ARB_BUSY: begin
+                if (granted_write ? mem_write_ack : mem_read_ack) begin
+                    mem_read_valid <= 0;
+                    mem_write_valid <= 0;
+                    if (granted_write) begin
+                        client_write_ack[granted] <= 1;
+                    end
+                    else begin
+                        client_read_ack[granted] <= 1;
+                        client_read_data <= mem_read_data;
+                    end
+                    arb_state <= `ARB_RELEASE;
+                end
+            end
+
+            `ARB_RELEASE: begin
+                // memory holds ack while valid was high; wait for it to drop
+                if (!mem_read_ack && !mem_write_ack) begin
+                    arb_state <= `ARB_IDLE;
+                end
+            end
+
+            default: arb_state <= `ARB_IDLE;
+        endcase
+    end
+end
+
+endmodule
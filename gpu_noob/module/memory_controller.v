@@ -0,0 +1,183 @@
+`timescale 1ns/1ps
+`include "common_defs.v"
+
+/*
+--------------------------------------
+Coalescing Memory Controller
+--------------------------------------
+- Sits between the per-lane LSU requests of a SIMD and data memory
+- Lane side: the LSU handshake (hold valid until ack, ack stays high while
+  valid is high), one word per lane
+- Memory side: one line transaction at a time, LINE_WORDS words starting at a
+  line-aligned address, same valid/ack handshake; writes carry a word mask
+- Coalescing: the lowest waiting lane picks the line and the kind (read or
+  write); every waiting lane of that kind in the same line joins its
+  transaction (contiguous addresses, repeated addresses, any order). Reads
+  are fanned back to each lane from its word of the line; when several lanes
+  write one word the highest lane wins
+- lane_requests / mem_transactions count requests before / after coalescing
+--------------------------------------
+*/
+module MemoryController # (
+    parameter NUM_LANES = 16,
+    parameter DATA_WIDTH = 64,
+    parameter DATA_MEM_ADDR_WIDTH = 7,
+    parameter LINE_WORDS = 4 // words per transaction, power of 2
+)
+(
+    input wire clk,
+    input wire rst,
+    input wire enable,
+
+    // from LSUs
+    input wire [NUM_LANES-1:0] lane_read_valid,
+    input wire [NUM_LANES-1:0] lane_write_valid,
+    input wire [DATA_MEM_ADDR_WIDTH-1:0] lane_addr [NUM_LANES-1:0],
+    input wire [DATA_WIDTH-1:0] lane_write_data [NUM_LANES-1:0],
+    output reg [NUM_LANES-1:0] lane_read_ack,
+    output reg [NUM_LANES-1:0] lane_write_ack,
+    output reg [DATA_WIDTH-1:0] lane_read_data [NUM_LANES-1:0],
+
+    // to data memory
+    input wire mem_read_ack,
+    input wire mem_write_ack,
+    input wire [DATA_WIDTH-1:0] mem_read_data [LINE_WORDS-1:0],
+    output reg mem_read_valid,
+    output reg mem_write_valid,
+    output reg [DATA_MEM_ADDR_WIDTH-1:0] mem_addr, // first word of the line
+    output reg [LINE_WORDS-1:0] mem_write_mask,
+    output reg [DATA_WIDTH-1:0] mem_write_data [LINE_WORDS-1:0],
+
+    // counters
+    output reg [31:0] lane_requests,
+    output reg [31:0] mem_transactions
+);
+
+localparam LANE_INDEX_WIDTH = NUM_LANES > 1 ? $clog2(NUM_LANES) : 1;
+
+reg [1:0] mc_state;
+reg [NUM_LANES-1:0] in_flight; // lanes served by the current transaction
+reg in_flight_write;
+
+// coalescing
+reg [NUM_LANES-1:0] waiting_read;
+reg [NUM_LANES-1:0] waiting_write;
+reg leader_found;
+reg [LANE_INDEX_WIDTH-1:0] leader;
+reg leader_write;
+reg [DATA_MEM_ADDR_WIDTH-1:0] leader_line;
+reg [NUM_LANES-1:0] group;
+reg [$clog2(NUM_LANES+1)-1:0] group_size;
+reg [LINE_WORDS-1:0] group_mask;
+reg [DATA_WIDTH-1:0] group_data [LINE_WORDS-1:0];
+
+integer l, w;
+
+always @(*) begin
+    waiting_read = lane_read_valid & ~lane_read_ack;
+    waiting_write = lane_write_valid & ~lane_write_ack;
+
+    leader_found = 0;
+    leader = 0;
+    for (l = NUM_LANES - 1; l >= 0; l = l - 1) begin
+        if (waiting_read[l] || waiting_write[l]) begin
+            leader_found = 1;
+            leader = l[LANE_INDEX_WIDTH-1:0];
+        end
+    end
+    leader_write = waiting_write[leader];
+    leader_line = lane_addr[leader] - lane_addr[leader] % LINE_WORDS;
+
+    group_size = 0;
+    for (l = 0; l < NUM_LANES; l = l + 1) begin
+        group[l] = (leader_write ? waiting_write[l] : waiting_read[l])
+            && lane_addr[l] - lane_addr[l] % LINE_WORDS == leader_line;
+        group_size = group_size + group[l];
+    end
+
+    // write line: later lanes overwrite earlier ones
+    for (w = 0; w < LINE_WORDS; w = w + 1) begin
+        group_mask[w] = 0;
+        group_data[w] = 0;
+        for (l = 0; l < NUM_LANES; l = l + 1) begin
+            if (group[l] && lane_addr[l] % LINE_WORDS == w) begin
+                group_mask[w] = 1;
+                group_data[w] = lane_write_data[l];
+            end
+        end
+    end
+end
+
+always @ (posedge(clk)) begin
+    if (rst) begin
+        lane_read_ack <= 0;
+        lane_write_ack <= 0;
+        for (l = 0; l < NUM_LANES; l = l + 1) begin
+            lane_read_data[l] <= 0;
+        end
+        mem_read_valid <= 0;
+        mem_write_valid <= 0;
+        mem_addr <= 0;
+        mem_write_mask <= 0;
+        for (w = 0; w < LINE_WORDS; w = w + 1) begin
+            mem_write_data[w] <= 0;
+        end
+        in_flight <= 0;
+        in_flight_write <= 0;
+        lane_requests <= 0;
+        mem_transactions <= 0;
+        mc_state <= `MC_IDLE;
+    end
+
+    else if (enable) begin
+        // lanes that dropped valid are done with their request
+        lane_read_ack <= lane_read_ack & lane_read_valid;
+        lane_write_ack <= lane_write_ack & lane_write_valid;
+
+        case (mc_state)
+            `MC_IDLE, `MC_RELEASE: begin
+                // after a transaction, memory holds ack until it sees valid drop
+                if (mc_state == `MC_IDLE || (!mem_read_ack && !mem_write_ack)) begin
+                    mc_state <= `MC_IDLE;
+                    if (leader_found) begin
+                        mem_addr <= leader_line;
+                        mem_read_valid <= !leader_write;
+                        mem_write_valid <= leader_write;
+                        mem_write_mask <= leader_write ? group_mask : 0;
+                        for (w = 0; w < LINE_WORDS; w = w + 1) begin
+                            mem_write_data[w] <= group_data[w];
+                        end
+                        in_flight <= group;
+                        in_flight_write <= leader_write;
+                        lane_requests <= lane_requests + group_size;
+                        mem_transactions <= mem_transactions + 1;
+                        mc_state <= `MC_BUSY;
+                    end
+                end
+            end
+
+            `MC_BUSY: begin
+                if (in_flight_write ? mem_write_ack : mem_read_ack) begin
+                    mem_read_valid <= 0;
+                    mem_write_valid <= 0;
+                    for (l = 0; l < NUM_LANES; l = l + 1) begin
+                        if (in_flight[l]) begin
+                            if (in_flight_write) begin
+                                lane_write_ack[l] <= 1;
+                            end
+                            else begin
+                                lane_read_ack[l] <= 1;
+                                lane_read_data[l] <= mem_read_data[lane_addr[l] % LINE_WORDS];
+                            end
+                        end
+                    end
+                    mc_state <= `MC_RELEASE;
+                end
+            end
+
+            default: mc_state <= `MC_IDLE;
+        endcase
+    end
+end
+
+endmodule
@@ -0,0 +1,176 @@
+`timescale 1ns/1ps
+`include "common_defs.v"
+
+/*
+--------------------------------------
+Performance Counters
+--------------------------------------
+- Counts where a SIMD spends its cycles while running waves
+- All counters are 32b, cleared on rst, and only count while enable is high
+- Read through perf_addr/perf_data (combinational read port)
+--------------------------------------
+Address map (perf_addr = {region, index})
+--------------------------------------
+GENERAL (2'b00):
+    0-7: cycles spent in each SIMD state (index = SIMD_State)
+    8:   instructions retired (one per wave cycle per instruction, counted in SIMD_UPDATE,
+         or on release for a load/store finished after its wave was switched out)
+    9:   stall cycles (SIMD_WAIT while a lane is still waiting on memory)
+    10:  active lane-instructions (active lanes summed over retired instructions)
+    11:  instruction buffer hits (0 without one, see SIMD ICACHE_LINES)
+    12:  instruction buffer misses
+    13:  wave switches (resident waves swapped on a stall, see SIMD WAVE_SLOTS)
+LANE_MEM (2'b01):    memory requests issued by lane [index]
+PC_CYCLES (2'b10):   cycles spent on PC [index] (every state except IDLE/DONE)
+PC_RETIRED (2'b11):  instructions retired at PC [index]
+--------------------------------------
+*/
+module PerfCounters # (
+    parameter PROGRAM_MEM_ADDR_WIDTH = 6,
+    parameter LANE_WIDTH = 16
+)
+(
+    input wire clk,
+    input wire rst,
+    input wire enable,
+
+    // observed state
+    input wire [2:0] simd_state,
+    input wire [PROGRAM_MEM_ADDR_WIDTH-1:0] curr_pc,
+    input wire lane_waiting, // some lane is still requesting/waiting on data memory
+    input wire wave_switch, // controller switched resident waves
+    input wire lsu_release, // a switched-out wave's load/store retired in the background
+    input wire [PROGRAM_MEM_ADDR_WIDTH-1:0] lsu_pc, // PC of that load/store
+    input wire [LANE_WIDTH-1:0] lsu_done, // lanes that served it
+    input wire [LANE_WIDTH-1:0] lane_active, // lanes doing useful work this wave cycle
+    input wire [LANE_WIDTH-1:0] mem_read_valid,
+    input wire [LANE_WIDTH-1:0] mem_write_valid,
+    input wire [31:0] icache_hits, // counted by the InstructionCache itself
+    input wire [31:0] icache_misses,
+
+    // read port
+    input wire [PROGRAM_MEM_ADDR_WIDTH+1:0] perf_addr,
+    output reg [31:0] perf_data
+);
+
+localparam PC_COUNT = 2**PROGRAM_MEM_ADDR_WIDTH;
+
+reg [31:0] state_cycles [7:0];
+reg [31:0] retired;
+reg [31:0] stall_cycles;
+reg [31:0] lane_active_count;
+reg [31:0] wave_switches;
+reg [31:0] mem_requests [LANE_WIDTH-1:0];
+reg [31:0] pc_cycles [PC_COUNT-1:0];
+reg [31:0] pc_retired [PC_COUNT-1:0];
+
+reg [LANE_WIDTH-1:0] prev_mem_valid; // mem valids last cycle -- a request starts on a rising valid
+reg [$clog2(LANE_WIDTH+1)-1:0] num_active;
+reg [$clog2(LANE_WIDTH+1)-1:0] num_released;
+
+integer i;
+
+always @(*) begin
+    num_active = 0;
+    num_released = 0;
+    for (i = 0; i < LANE_WIDTH; i = i + 1) begin
+        num_active = num_active + lane_active[i];
+        num_released = num_released + lsu_done[i];
+    end
+end
+
+always @ (posedge(clk)) begin
+    if (rst) begin
+        for (i = 0; i < 8; i = i + 1) begin
+            state_cycles[i] <= 0;
+        end
+        retired <= 0;
+        stall_cycles <= 0;
+        lane_active_count <= 0;
+        wave_switches <= 0;
+        for (i = 0; i < LANE_WIDTH; i = i + 1) begin
+            mem_requests[i] <= 0;
+        end
+        for (i = 0; i < PC_COUNT; i = i + 1) begin
+            pc_cycles[i] <= 0;
+            pc_retired[i] <= 0;
+        end
+        prev_mem_valid <= 0;
+    end
+
+    else if (enable) begin
+        state_cycles[simd_state] <= state_cycles[simd_state] + 1;
+
+        if (simd_state != `SIMD_IDLE && simd_state != `SIMD_DONE) begin
+            pc_cycles[curr_pc] <= pc_cycles[curr_pc] + 1;
+        end
+
+        if (simd_state == `SIMD_WAIT && lane_waiting) begin
+            stall_cycles <= stall_cycles + 1;
+        end
+
+        if (wave_switch) begin
+            wave_switches <= wave_switches + 1;
+        end
+
+        if (simd_state == `SIMD_UPDATE) begin
+            retired <= retired + 1;
+            pc_retired[curr_pc] <= pc_retired[curr_pc] + 1;
+            lane_active_count <= lane_active_count + num_active;
+        end
+
+        else if (lsu_release) begin
+            retired <= retired + 1;
+            pc_retired[lsu_pc] <= pc_retired[lsu_pc] + 1;
+            lane_active_count <= lane_active_count + num_released;
+        end
+
+        for (i = 0; i < LANE_WIDTH; i = i + 1) begin
+            if ((mem_read_valid[i] || mem_write_valid[i]) && !prev_mem_valid[i]) begin
+                mem_requests[i] <= mem_requests[i] + 1;
+            end
+        end
+        prev_mem_valid <= mem_read_valid | mem_write_valid;
+    end
+end
+
+// read port
+always @(*) begin
+    perf_data = 0;
+    case (perf_addr[PROGRAM_MEM_ADDR_WIDTH+1:PROGRAM_MEM_ADDR_WIDTH])
+        `PERF_REGION_GENERAL: begin
+            if (perf_addr[PROGRAM_MEM_ADDR_WIDTH-1:0] < 8) begin
+                perf_data = state_cycles[perf_addr[2:0]];
+            end
+            else if (perf_addr[PROGRAM_MEM_ADDR_WIDTH-1:0] == `PERF_RETIRED) begin
+                perf_data = retired;
+            end
+            else if (perf_addr[PROGRAM_MEM_ADDR_WIDTH-1:0] == `PERF_STALL_CYCLES) begin
+                perf_data = stall_cycles;
+            end
+            else if (perf_addr[PROGRAM_MEM_ADDR_WIDTH-1:0] == `PERF_LANE_ACTIVE) begin
+                perf_data = lane_active_count;
+            end
+            else if (perf_addr[PROGRAM_MEM_ADDR_WIDTH-1:0] == `PERF_ICACHE_HITS) begin
+                perf_data = icache_hits;
+            end
+            else if (perf_addr[PROGRAM_MEM_ADDR_WIDTH-1:0] == `PERF_ICACHE_MISSES) begin
+                perf_data = icache_misses;
+            end
+            else if (perf_addr[PROGRAM_MEM_ADDR_WIDTH-1:0] == `PERF_WAVE_SWITCHES) begin
+                perf_data = wave_switches;
+            end
+        end
+
+        `PERF_REGION_LANE_MEM: begin
+            if (perf_addr[PROGRAM_MEM_ADDR_WIDTH-1:0] < LANE_WIDTH) begin
+                perf_data = mem_requests[perf_addr[PROGRAM_MEM_ADDR_WIDTH-1:0]];
+            end
+        end
+
+        `PERF_REGION_PC_CYCLES: perf_data = pc_cycles[perf_addr[PROGRAM_MEM_ADDR_WIDTH-1:0]];
+        `PERF_REGION_PC_RETIRED: perf_data = pc_retired[perf_addr[PROGRAM_MEM_ADDR_WIDTH-1:0]];
+    endcase
+end
+
+endmodule
@@ -15,6 +15,9 @@ R31: zero
 WRITABLE:
 R4-R31: general purpose
 --------------------------------------
+WAVE_SLOTS > 1: one set of 32 registers per resident wave, selected by slot
+(R28-R30 of a slot follow block_id/wave_id/curr_wave_cycle while it runs)
+--------------------------------------
 blockIdx: block's ID within a block grid
 blockDim: number of threads per block
 threadIdx: thread's ID within a block
@@ -24,7 +27,8 @@ module RegisterFile # (
     parameter DATA_WIDTH = 64,
     parameter NUM_REGISTERS = 32,
     parameter WAVE_SIZE = 32,
-    parameter LANE_WIDTH = 16
+    parameter LANE_WIDTH = 16,
+    parameter WAVE_SLOTS = 1
 )
 (
     input wire clk,
@@ -36,8 +40,9 @@ module RegisterFile # (
     input wire  signed [31:0] wave_id,
     input wire [31:0] block_dim,
 
-    input wire [$clog2((WAVE_SIZE + LANE_WIDTH - 1) / LANE_WIDTH)] curr_wave_cycle,
+    input wire [$clog2((WAVE_SIZE + LANE_WIDTH - 1) / LANE_WIDTH)-1:0] curr_wave_cycle,
     input wire [$clog2(LANE_WIDTH-1):0] lane_id, // corresponding SIMD lane the reg_file is associated with
+    input wire [$clog2(WAVE_SLOTS > 1 ? WAVE_SLOTS : 2)-1:0] slot, // resident wave whose registers are accessed
 
     // signals
     input wire REG_WRITE,
@@ -48,9 +53,21 @@ module RegisterFile # (
     input wire [DATA_REG_ADDR_WIDTH-1:0] rn,
     input wire [DATA_REG_ADDR_WIDTH-1:0] rd,
 
+    // pipelined SIMD: read operand_rm/operand_rn now (DECODE, or issue while
+    // the previous instruction writes rd -- that write is forwarded)
+    input wire operand_read,
+    input wire [DATA_REG_ADDR_WIDTH-1:0] operand_rm,
+    input wire [DATA_REG_ADDR_WIDTH-1:0] operand_rn,
+
     // write data -- from ALU or memory
     input wire [DATA_WIDTH-1:0] reg_write_data, 
 
+    // background write of a switched-out wave's load (WAVE_SLOTS > 1, never on an UPDATE clock)
+    input wire bg_write,
+    input wire [$clog2(WAVE_SLOTS > 1 ? WAVE_SLOTS : 2)-1:0] bg_slot,
+    input wire [DATA_REG_ADDR_WIDTH-1:0] bg_rd,
+    input wire [DATA_WIDTH-1:0] bg_data,
+
     output wire [$clog2(LANE_WIDTH-1):0] out_lane_id,
     output wire  [DATA_WIDTH-1:0] out_thread_id_x,
 
@@ -59,7 +76,10 @@ module RegisterFile # (
     output reg [DATA_WIDTH-1:0] rn_data
 );
 
-reg [DATA_WIDTH-1:0] reg_file [NUM_REGISTERS-1:0];
+reg [DATA_WIDTH-1:0] reg_file [NUM_REGISTERS*WAVE_SLOTS-1:0];
+wire [$clog2(NUM_REGISTERS*WAVE_SLOTS)-1:0] base = slot * NUM_REGISTERS; // slot's R0
+
+wire writing = REG_WRITE && simd_state == `SIMD_UPDATE && rd < 28;
 
 wire [DATA_WIDTH-1:0] thread_id_x;
 assign thread_id_x = wave_id * WAVE_SIZE + (curr_wave_cycle * LANE_WIDTH) + lane_id;
@@ -67,24 +87,25 @@ assign thread_id_x = wave_id * WAVE_SIZE + (curr_wave_cycle * LANE_WIDTH) + lane
 assign out_lane_id = lane_id;
 assign out_thread_id_x = thread_id_x;
 
-always @ (block_id, block_dim, thread_id_x) begin
-    reg_file[28] <= block_id;
-    reg_file[29] <= block_dim;
-    reg_file[30] <= thread_id_x;
+always @ (block_id, block_dim, thread_id_x, base) begin
+    reg_file[base + 28] <= block_id;
+    reg_file[base + 29] <= block_dim;
+    reg_file[base + 30] <= thread_id_x;
 end
 
 integer i;
 always @ (posedge(clk)) begin
     if (rst) begin
         // initialize read-only registers
-        reg_file[28] <= block_id;
-        reg_file[29] <= block_dim;
-        reg_file[30] <= thread_id_x;
-        reg_file[31] <= 0;
-        
-        for (i = 0; i < 28; i = i + 1) begin
-            // initialize general purpose registers
-            reg_file[i] <= 0;
+        reg_file[base + 28] <= block_id;
+        reg_file[base + 29] <= block_dim;
+        reg_file[base + 30] <= thread_id_x;
+
+        for (i = 0; i < NUM_REGISTERS * WAVE_SLOTS; i = i + 1) begin
+            // initialize general purpose and zero registers of every slot
+            if (i % NUM_REGISTERS < 28 || i % NUM_REGISTERS == 31) begin
+                reg_file[i] <= 0;
+            end
         end
         
         // clear output data
@@ -96,14 +117,23 @@ always @ (posedge(clk)) begin
         if (enable) begin
             // if SIMD state == REQUEST
             if (simd_state == `SIMD_REQUEST) begin
-                rm_data <= reg_file[rm];
-                rn_data <= reg_file[rn];
+                rm_data <= reg_file[base + rm];
+                rn_data <= reg_file[base + rn];
+            end
+
+            else if (operand_read) begin
+                rm_data <= writing && operand_rm == rd ? reg_write_data : reg_file[base + operand_rm];
+                rn_data <= writing && operand_rn == rd ? reg_write_data : reg_file[base + operand_rn];
             end
 
             // if REG_WRITE enabled and SIMD state == UPDATE
             // writing only allowed to general purpose registers
-            if (REG_WRITE && simd_state == `SIMD_UPDATE && rd < 28) begin
-                reg_file[rd] = reg_write_data;
+            if (writing) begin
+                reg_file[base + rd] = reg_write_data;
+            end
+
+            else if (bg_write && bg_rd < 28) begin
+                reg_file[bg_slot * NUM_REGISTERS + bg_rd] = bg_data;
             end
 
         end
@@ -5,7 +5,8 @@
 --------------------------------
 SIMD Unit
 --------------------------------
-- Holds up to one wavefront
+- Holds up to WAVE_SLOTS wavefronts (one by default), switching between
+  them when the running one stalls on memory (see simd_controller.v)
 - Program Counter for wavefront
 - 16-Lane ALU, LOAD/STORE
 - Register File for each lane to store data for wavefront
@@ -21,8 +22,12 @@ module SIMD #(
     parameter INSTRUCTION_WIDTH = 32,
     parameter PROGRAM_MEM_ADDR_WIDTH = 6,
     parameter DATA_REG_ADDR_WIDTH = 7,
+    parameter DATA_MEM_ADDR_WIDTH = 7, // data memory word address width (up to DATA_WIDTH)
     parameter LANE_WIDTH = 16,
-    parameter WAVE_SIZE = 32
+    parameter WAVE_SIZE = 32,
+    parameter ICACHE_LINES = 0, // private instruction buffer in front of program memory (0 = fetch directly)
+    parameter PIPELINED = 0, // overlap the next fetch/decode with execute (see simd_controller.v)
+    parameter WAVE_SLOTS = 1 // resident waves, each with its own PC, wave cycle and registers
 )
 (
     input wire clk,
@@ -34,15 +39,15 @@ module SIMD #(
     input wire [31:0] block_dim, // num of threads per block -- defined by kernel 
 
     // block and wave info
-    input wire signed [31:0] block_id, // assigned block_id from block dispatcher
-    input wire signed [31:0] wave_id, // assigned wave_id from wave dispatcher
-    input wire [31:0] num_waves_in_block, // num of waves in current block of CU -- calculated by wave dispatcher
+    input wire [32*WAVE_SLOTS-1:0] block_id, // block_id of each slot's wave ({slot N-1, ..., slot 0}; slots may hold waves of different blocks)
+    input wire [32*WAVE_SLOTS-1:0] wave_id, // assigned wave_id per slot from wave dispatcher ({slot N-1, ..., slot 0})
+    input wire [32*WAVE_SLOTS-1:0] num_block_threads, // num of threads in each slot's block -- calculated by wave dispatcher
 
-    // simd wave dispatch states
-    input wire simd_ready, 
-    input wire simd_start, 
-    input wire simd_working, 
-    output reg simd_done,
+    // simd wave dispatch states (one bit per slot)
+    input wire [WAVE_SLOTS-1:0] simd_ready, 
+    input wire [WAVE_SLOTS-1:0] simd_start, 
+    input wire [WAVE_SLOTS-1:0] simd_working, 
+    output wire [WAVE_SLOTS-1:0] simd_done,
 
     // data memory feedback
     input wire [LANE_WIDTH-1:0] data_mem_read_ack,
@@ -56,12 +61,16 @@ module SIMD #(
     // data memory outputs
     output reg [LANE_WIDTH-1:0] mem_read_valid,
     output reg [LANE_WIDTH-1:0] mem_write_valid,
-    output reg [DATA_REG_ADDR_WIDTH-1:0] mem_addr [LANE_WIDTH-1:0],
+    output reg [DATA_MEM_ADDR_WIDTH-1:0] mem_addr [LANE_WIDTH-1:0],
     output reg [DATA_WIDTH-1:0] mem_write_data [LANE_WIDTH-1:0],
 
     // program memory outputs
-    output reg prog_mem_read_valid,
-    output reg [PROGRAM_MEM_ADDR_WIDTH-1:0] prog_mem_addr
+    output wire prog_mem_read_valid,
+    output wire [PROGRAM_MEM_ADDR_WIDTH-1:0] prog_mem_addr,
+
+    // performance counters -- see perf_counters.v for the address map
+    input wire [PROGRAM_MEM_ADDR_WIDTH+1:0] perf_addr,
+    output wire [31:0] perf_data
 );
 
 // -- START Shared States -- 
@@ -71,8 +80,21 @@ wire [2:0] fetcher_state;
 localparam TOTAL_WAVE_CYCLES = (WAVE_SIZE + LANE_WIDTH - 1) / LANE_WIDTH;
 wire [$clog2(TOTAL_WAVE_CYCLES)-1:0] curr_wave_cycle;
 wire [INSTRUCTION_WIDTH-1:0] instruction;
+/* RESIDENT WAVES */
+wire [$clog2(WAVE_SLOTS > 1 ? WAVE_SLOTS : 2)-1:0] curr_slot; // wave being run
+wire signed [31:0] curr_wave_id = wave_id[32*curr_slot +: 32];
+wire signed [31:0] curr_block_id = block_id[32*curr_slot +: 32];
+wire [31:0] curr_block_threads = num_block_threads[32*curr_slot +: 32];
+wire wave_switch;
+// background writeback of a switched-out wave's load/store
+wire lsu_release;
+wire [$clog2(WAVE_SLOTS > 1 ? WAVE_SLOTS : 2)-1:0] lsu_owner;
+wire [DATA_REG_ADDR_WIDTH-1:0] lsu_rd;
+wire lsu_load;
+wire [PROGRAM_MEM_ADDR_WIDTH-1:0] lsu_pc;
 // -- END Shared States --
 
+
 // -- START Registers --
 // inputs -- come from instruction; same for each lane
 wire [DATA_REG_ADDR_WIDTH-1:0] rd;
@@ -114,6 +136,41 @@ wire [PROGRAM_MEM_ADDR_WIDTH-1:0] curr_pc; // current pc
 wire [PROGRAM_MEM_ADDR_WIDTH-1:0] pc_out; // calculated next pc
 // -- END PC --
 
+// -- START Prefetch (PIPELINED) --
+wire [INSTRUCTION_WIDTH-1:0] next_instruction;
+wire [PROGRAM_MEM_ADDR_WIDTH-1:0] next_pc;
+wire [$clog2(WAVE_SLOTS > 1 ? WAVE_SLOTS : 2)-1:0] next_slot;
+wire next_ready;
+wire issue; // next_instruction is decoded and its operands read this clock
+// operands are read in DECODE, or on issue for the prefetched instruction
+wire operand_read = PIPELINED && (simd_state == `SIMD_DECODE || issue);
+wire [DATA_REG_ADDR_WIDTH-1:0] operand_rm = issue ? next_instruction[18:12] : rm;
+wire [DATA_REG_ADDR_WIDTH-1:0] operand_rn = issue ? next_instruction[11:5] : rn;
+// -- END Prefetch --
+
+// -- START Fetch path (fetcher <-> instruction buffer or program memory) --
+wire fetch_valid;
+wire [PROGRAM_MEM_ADDR_WIDTH-1:0] fetch_addr;
+wire fetch_ack;
+wire [INSTRUCTION_WIDTH-1:0] fetch_data;
+wire [31:0] icache_hits;
+wire [31:0] icache_misses;
+// -- END Fetch path --
+
+// -- START Execution mask --
+// lane i runs thread wave_id * WAVE_SIZE + curr_wave_cycle * LANE_WIDTH + i (see register.v);
+// lanes past the block's last thread are masked: no register writes, no memory requests
+wire [31:0] wave_first_thread = curr_wave_id * WAVE_SIZE;
+wire [31:0] wave_threads = curr_block_threads - wave_first_thread < WAVE_SIZE ? curr_block_threads - wave_first_thread : WAVE_SIZE;
+wire [$clog2(TOTAL_WAVE_CYCLES)-1:0] last_wave_cycle = wave_threads == 0 ? 0 : (wave_threads - 1) / LANE_WIDTH; // later wave cycles are skipped
+wire [LANE_WIDTH-1:0] lane_active;
+wire [LANE_WIDTH-1:0] lsu_done; // lanes whose load/store is complete (LSU_DONE)
+// -- END Execution mask --
+
+// -- START Perf --
+wire lane_waiting;
+// -- END Perf --
+
 PC#(.PROGRAM_MEM_ADDR_WIDTH(PROGRAM_MEM_ADDR_WIDTH)) pc (
     .clk(clk),
     .rst(rst),
@@ -124,19 +181,30 @@ PC#(.PROGRAM_MEM_ADDR_WIDTH(PROGRAM_MEM_ADDR_WIDTH)) pc (
     .pc_out(pc_out)
 );
 
-Fetcher fetcher (
+Fetcher # (
+    .PROGRAM_MEM_ADDR_WIDTH(PROGRAM_MEM_ADDR_WIDTH),
+    .INSTRUCTION_WIDTH(INSTRUCTION_WIDTH),
+    .PIPELINED(PIPELINED),
+    .WAVE_SLOTS(WAVE_SLOTS))
+    fetcher (
     .clk(clk),
     .rst(rst),
     .enable(enable),
     .simd_state(simd_state),
     .curr_pc(curr_pc),
-    .prog_mem_read_ack(prog_mem_read_ack),
-    .prog_mem_read_data(prog_mem_read_data),
+    .curr_slot(curr_slot),
+    .prog_mem_read_ack(fetch_ack),
+    .prog_mem_read_data(fetch_data),
 
-    .prog_mem_read_valid(prog_mem_read_valid),
-    .prog_mem_addr(prog_mem_addr),
+    .prog_mem_read_valid(fetch_valid),
+    .prog_mem_addr(fetch_addr),
     .fetcher_state(fetcher_state),
-    .instruction(instruction)    
+    .instruction(instruction),
+    .issue(issue),
+    .next_instruction(next_instruction),
+    .next_pc(next_pc),
+    .next_slot(next_slot),
+    .next_ready(next_ready)
 );
 
 Decoder decoder (
@@ -145,6 +213,8 @@ Decoder decoder (
     .enable(enable),
     .simd_state(simd_state),
     .instruction(instruction),
+    .issue(issue),
+    .next_instruction(next_instruction),
 
     .REG_WRITE(REG_WRITE),
     .MEM_READ(MEM_READ),
@@ -159,21 +229,68 @@ Decoder decoder (
     .imm_19(imm_19)
 );
 
-SimdController # (.TOTAL_WAVE_CYCLES(TOTAL_WAVE_CYCLES))
+SimdController # (
+    .PROGRAM_MEM_ADDR_WIDTH(PROGRAM_MEM_ADDR_WIDTH),
+    .LANE_WIDTH(LANE_WIDTH),
+    .TOTAL_WAVE_CYCLES(TOTAL_WAVE_CYCLES),
+    .PIPELINED(PIPELINED),
+    .WAVE_SLOTS(WAVE_SLOTS))
     simdController (
         .clk(clk),
         .rst(rst),
         .enable(enable),
         .simd_start(simd_start),
+        .last_wave_cycle(last_wave_cycle),
         .RET(RET),
+        .mem_op(MEM_READ || MEM_WRITE),
+        .mem_load(MEM_READ),
+        .rd(rd),
         .fetcher_state(fetcher_state),
         .lsu_state(lsu_state),
         .pc_out(pc_out),
+        .op_code(op_code),
+        .next_ready(next_ready),
+        .next_pc(next_pc),
+        .next_slot(next_slot),
+        .next_op_code(next_instruction[31:26]),
 
         .curr_pc(curr_pc),
         .curr_wave_cycle(curr_wave_cycle),
+        .curr_slot(curr_slot),
         .simd_state(simd_state),
-        .simd_done(simd_done)
+        .simd_done(simd_done),
+        .lane_waiting(lane_waiting),
+        .issue(issue),
+        .wave_switch(wave_switch),
+        .lsu_release(lsu_release),
+        .lsu_owner(lsu_owner),
+        .lsu_rd(lsu_rd),
+        .lsu_load(lsu_load),
+        .lsu_pc(lsu_pc)
+);
+
+PerfCounters # (
+    .PROGRAM_MEM_ADDR_WIDTH(PROGRAM_MEM_ADDR_WIDTH),
+    .LANE_WIDTH(LANE_WIDTH))
+    perfCounters (
+        .clk(clk),
+        .rst(rst),
+        .enable(enable),
+        .simd_state(simd_state),
+        .curr_pc(curr_pc),
+        .lane_waiting(lane_waiting),
+        .wave_switch(wave_switch),
+        .lsu_release(lsu_release),
+        .lsu_pc(lsu_pc),
+        .lsu_done(lsu_done),
+        .lane_active(lane_active),
+        .mem_read_valid(mem_read_valid),
+        .mem_write_valid(mem_write_valid),
+        .icache_hits(icache_hits),
+        .icache_misses(icache_misses),
+        .perf_addr(perf_addr),
+
+        .perf_data(perf_data)
 );
 
 // reg_write_data depends on REG_WRITE_MUX
@@ -191,21 +308,37 @@ end
 genvar i;
 generate 
     for (i = 0; i < LANE_WIDTH; i = i + 1) begin
-        RegisterFile rf (
+        assign lane_active[i] = curr_wave_cycle * LANE_WIDTH + i < wave_threads;
+        assign lsu_done[i] = lsu_state[i] == `LSU_DONE;
+
+        RegisterFile # (
+            .DATA_WIDTH(DATA_WIDTH),
+            .WAVE_SIZE(WAVE_SIZE),
+            .LANE_WIDTH(LANE_WIDTH),
+            .WAVE_SLOTS(WAVE_SLOTS))
+            rf (
             .clk(clk),
             .rst(rst),
             .enable(enable),
-            .block_id(block_id),
-            .wave_id(wave_id),
+            .block_id(curr_block_id),
+            .wave_id(curr_wave_id),
             .block_dim(block_dim),
             .curr_wave_cycle(curr_wave_cycle),
-            .lane_id($unsigned(i[4:0])),
-            .REG_WRITE(REG_WRITE),
+            .lane_id($unsigned(i[$clog2(LANE_WIDTH-1):0])),
+            .slot(curr_slot),
+            .REG_WRITE(REG_WRITE && lane_active[i]),
             .simd_state(simd_state),
             .rm(rm),
             .rn(rn),
             .rd(rd),
+            .operand_read(operand_read),
+            .operand_rm(operand_rm),
+            .operand_rn(operand_rn),
             .reg_write_data(reg_write_data[i]),
+            .bg_write(lsu_release && lsu_load && lsu_done[i]),
+            .bg_slot(lsu_owner),
+            .bg_rd(lsu_rd),
+            .bg_data(lsu_read_out[i]),
 
             .out_lane_id(lane_id[i]),
             .out_thread_id_x(out_thread_id_x[i]),
@@ -213,7 +346,8 @@ generate
             .rn_data(rn_data[i])
         );
 
-        ALU alu (
+        ALU # (.DATA_WIDTH(DATA_WIDTH))
+            alu (
             .clk(clk),
             .rst(rst),
             .enable(enable),
@@ -225,15 +359,19 @@ generate
             .alu_out(alu_out[i])
         );
 
-        LSU lsu (
+        LSU # (
+            .DATA_WIDTH(DATA_WIDTH),
+            .DATA_MEM_ADDR_WIDTH(DATA_MEM_ADDR_WIDTH))
+            lsu (
             .clk(clk),
             .rst(rst),
             .enable(enable),
             .simd_state(simd_state),
             .rm_data(rm_data[i]),
             .rn_data(rn_data[i]),
-            .MEM_READ(MEM_READ),
-            .MEM_WRITE(MEM_WRITE),
+            .MEM_READ(MEM_READ && lane_active[i]),
+            .MEM_WRITE(MEM_WRITE && lane_active[i]),
+            .lsu_release(lsu_release),
             .mem_read_ack(data_mem_read_ack[i]),
             .mem_write_ack(data_mem_write_ack[i]),
             .mem_read_data(mem_read_data[i]),
@@ -248,4 +386,44 @@ generate
     end
 endgenerate
 
+// instruction buffer: a one-client InstructionCache (a ComputeUnit shares one across its SIMDs instead)
+generate
+    if (ICACHE_LINES > 0) begin
+        wire [PROGRAM_MEM_ADDR_WIDTH-1:0] icache_read_addr [0:0];
+        wire [INSTRUCTION_WIDTH-1:0] icache_read_data [0:0];
+        assign icache_read_addr[0] = fetch_addr;
+        assign fetch_data = icache_read_data[0];
+
+        InstructionCache # (
+            .NUM_CLIENTS(1),
+            .PROGRAM_MEM_ADDR_WIDTH(PROGRAM_MEM_ADDR_WIDTH),
+            .INSTRUCTION_WIDTH(INSTRUCTION_WIDTH),
+            .NUM_LINES(ICACHE_LINES))
+            icache (
+            .clk(clk),
+            .rst(rst),
+            .enable(enable),
+            .invalidate(1'b0),
+            .read_valid(fetch_valid),
+            .read_addr(icache_read_addr),
+            .read_ack(fetch_ack),
+            .read_data(icache_read_data),
+            .prog_mem_read_ack(prog_mem_read_ack),
+            .prog_mem_read_data(prog_mem_read_data),
+            .prog_mem_read_valid(prog_mem_read_valid),
+            .prog_mem_addr(prog_mem_addr),
+            .hits(icache_hits),
+            .misses(icache_misses)
+        );
+    end
+    else begin
+        assign prog_mem_read_valid = fetch_valid;
+        assign prog_mem_addr = fetch_addr;
+        assign fetch_ack = prog_mem_read_ack;
+        assign fetch_data = prog_mem_read_data;
+        assign icache_hits = 0;
+        assign icache_misses = 0;
+    end
+endgenerate
+
 endmodule
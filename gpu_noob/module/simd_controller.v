@@ -6,34 +6,91 @@
 SIMD Controller
 --------------------------------------
 // Manages control flow of a SIMD processing a wavefront
+// PIPELINED: non-memory instructions go DECODE -> EXECUTE (no REQUEST/WAIT),
+// and an instruction the Fetcher prefetched during the previous one is
+// issued straight from UPDATE (or FETCH, once it arrives): decoded and its
+// operands read on that clock, skipping FETCH/DECODE
+// WAVE_SLOTS > 1: up to WAVE_SLOTS resident waves, each with its own PC,
+// wave cycle and registers (curr_slot selects the running one). When the
+// running wave stalls in WAIT and another wave is ready, the load/store is
+// left in the LSUs and the other wave runs (switch on stall). The parked
+// wave's load is written back to its registers in the background once the
+// LSUs finish (release), and it becomes ready again at the next PC. A wave
+// reaching a load/store while the LSUs hold another wave's waits in REQUEST,
+// or is switched out (blocked) if some other wave is ready; its other
+// instructions don't wait on that load/store at all.
 --------------------------------------
 
 */
 module SimdController # (
     parameter PROGRAM_MEM_ADDR_WIDTH = 6,
     parameter LANE_WIDTH = 16,
-    parameter TOTAL_WAVE_CYCLES = 2
+    parameter TOTAL_WAVE_CYCLES = 2,
+    parameter PIPELINED = 0,
+    parameter WAVE_SLOTS = 1
 )
 (
     input wire clk,
     input wire rst,
     input wire enable,
 
-    input wire simd_start,
+    input wire [WAVE_SLOTS-1:0] simd_start, // slot was just assigned a new wave
+    input wire [$clog2(TOTAL_WAVE_CYCLES)-1:0] last_wave_cycle, // last wave cycle of the running wave with active lanes
     input wire RET,
+    input wire mem_op, // decoded instruction is a load/store
+    input wire mem_load, // ... a load (MEM_READ)
+    input wire [6:0] rd,
 
     input wire [2:0] fetcher_state,
     input wire [1:0] lsu_state [LANE_WIDTH-1:0],
     input wire [PROGRAM_MEM_ADDR_WIDTH-1:0] pc_out, // calculated by PC during SIMD_EXECUTE state
+    input wire [5:0] op_code, // instruction being decoded
+
+    // prefetched instruction (PIPELINED)
+    input wire next_ready,
+    input wire [PROGRAM_MEM_ADDR_WIDTH-1:0] next_pc,
+    input wire [$clog2(WAVE_SLOTS > 1 ? WAVE_SLOTS : 2)-1:0] next_slot,
+    input wire [5:0] next_op_code,
         
     output reg [PROGRAM_MEM_ADDR_WIDTH-1:0] curr_pc,
     output reg [$clog2(TOTAL_WAVE_CYCLES)-1:0] curr_wave_cycle, // current cycle when processing a wave (starting at 0)
+    output reg [$clog2(WAVE_SLOTS > 1 ? WAVE_SLOTS : 2)-1:0] curr_slot, // resident wave being run
     output reg  [2:0] simd_state,
-    output reg simd_done // wave for simd has completed
+    output reg [WAVE_SLOTS-1:0] simd_done, // wave in the slot has completed
+    output reg lane_waiting, // some lane is still requesting/waiting on data memory
+    output reg issue, // take the prefetched instruction this clock
+    output reg wave_switch, // switched to another resident wave on the last clock
+
+    // background writeback of a parked wave's load/store (WAVE_SLOTS > 1)
+    output reg lsu_release, // LSUs done: write lsu_rd of lsu_owner (loads) and free the LSUs this clock
+    output reg [$clog2(WAVE_SLOTS > 1 ? WAVE_SLOTS : 2)-1:0] lsu_owner,
+    output reg [6:0] lsu_rd,
+    output reg lsu_load,
+    output reg [PROGRAM_MEM_ADDR_WIDTH-1:0] lsu_pc
 );
 
-integer i;
-reg lane_waiting;
+localparam SLOT_WIDTH = WAVE_SLOTS > 1 ? $clog2(WAVE_SLOTS) : 1;
+
+// resident waves (curr_pc/curr_wave_cycle belong to curr_slot while it runs)
+reg [WAVE_SLOTS-1:0] slot_active; // holds a wave that has not completed
+reg [WAVE_SLOTS-1:0] slot_parked; // switched out with its load/store in the LSUs
+reg [WAVE_SLOTS-1:0] slot_blocked; // next instruction is a load/store, LSUs busy with another wave
+reg [PROGRAM_MEM_ADDR_WIDTH-1:0] slot_pc [WAVE_SLOTS-1:0];
+reg [$clog2(TOTAL_WAVE_CYCLES)-1:0] slot_wave_cycle [WAVE_SLOTS-1:0];
+reg lsu_owned; // a load/store is in the LSUs until its UPDATE (or release)
+
+// scheduling
+reg ready_found; // another wave can run
+reg [SLOT_WIDTH-1:0] ready_slot;
+reg idle_found; // a wave to start from SIMD_IDLE
+reg [SLOT_WIDTH-1:0] idle_slot;
+reg switching;
+reg [SLOT_WIDTH-1:0] target;
+
+integer i, k, s;
+
+wire is_mem = op_code == `OP_LOAD || op_code == `OP_STORE;
+wire next_is_mem = next_op_code == `OP_LOAD || next_op_code == `OP_STORE;
 
 always @(*) begin
     lane_waiting = 0;
@@ -44,44 +101,133 @@ always @(*) begin
     end
 end
 
+always @(*) begin
+    issue = 0;
+    if (PIPELINED && next_ready && next_slot == curr_slot) begin
+        if (simd_state == `SIMD_UPDATE) begin
+            issue = !RET && next_pc == pc_out;
+        end
+        else if (simd_state == `SIMD_FETCH) begin
+            issue = next_pc == curr_pc;
+        end
+    end
+end
+
+always @(*) begin
+    // never on an UPDATE clock: the register write port belongs to the running wave
+    lsu_release = lsu_owned && slot_parked[lsu_owner] && !lane_waiting && simd_state != `SIMD_UPDATE;
+end
+
+always @(*) begin
+    // round-robin from the slot after the running one
+    ready_found = 0;
+    ready_slot = 0;
+    for (k = 1; k < WAVE_SLOTS; k = k + 1) begin
+        s = (curr_slot + k) % WAVE_SLOTS;
+        if (!ready_found && slot_active[s] && !slot_parked[s] && !slot_blocked[s]) begin
+            ready_found = 1;
+            ready_slot = s[SLOT_WIDTH-1:0];
+        end
+    end
+
+    // lowest slot with a new or ready wave
+    idle_found = 0;
+    idle_slot = 0;
+    for (k = WAVE_SLOTS - 1; k >= 0; k = k - 1) begin
+        if (simd_start[k] || (slot_active[k] && !slot_parked[k])) begin
+            idle_found = 1;
+            idle_slot = k[SLOT_WIDTH-1:0];
+        end
+    end
+end
+
 always @ (posedge(clk)) begin
     if (rst) begin
         simd_state <= `SIMD_IDLE;
         curr_wave_cycle <= 0;
         curr_pc <= 0;
+        curr_slot <= 0;
         simd_done <= 0;
+        wave_switch <= 0;
+        slot_active <= 0;
+        slot_parked <= 0;
+        slot_blocked <= 0;
+        lsu_owned <= 0;
+        lsu_owner <= 0;
+        lsu_rd <= 0;
+        lsu_load <= 0;
+        lsu_pc <= 0;
+        for (k = 0; k < WAVE_SLOTS; k = k + 1) begin
+            slot_pc[k] <= 0;
+            slot_wave_cycle[k] <= 0;
+        end
     end
 
     else if (enable) begin
+        switching = 0;
+        target = 0;
+        wave_switch <= 0;
+
         case (simd_state) 
             `SIMD_IDLE: begin
-                if (simd_start) begin
-                    // assigned new wave
-                    simd_done <= 0;
+                if (idle_found) begin
+                    // assigned new wave -- start from the first wave cycle and instruction
+                    curr_slot <= idle_slot;
+                    curr_wave_cycle <= simd_start[idle_slot] ? 0 : slot_wave_cycle[idle_slot];
+                    curr_pc <= simd_start[idle_slot] ? 0 : slot_pc[idle_slot];
                     simd_state <= `SIMD_FETCH;
                 end
             end
 
             `SIMD_FETCH: begin
-                if (fetcher_state == `FETCHER_FETCHED) begin
+                if (issue) begin
+                    simd_state <= next_is_mem ? `SIMD_REQUEST : `SIMD_EXECUTE;
+                end
+                else if (fetcher_state == `FETCHER_FETCHED) begin
                     simd_state <= `SIMD_DECODE;
                 end
             end
 
             `SIMD_DECODE: begin
-                simd_state <= `SIMD_REQUEST;
+                // pipelined: operands are read here, only memory instructions need REQUEST/WAIT
+                simd_state <= PIPELINED && !is_mem ? `SIMD_EXECUTE : `SIMD_REQUEST;
             end
 
             `SIMD_REQUEST: begin
-                simd_state <= `SIMD_WAIT;
+                if (mem_op && lsu_owned && lsu_owner != curr_slot) begin
+                    // LSUs still hold another wave's load/store
+                    if (ready_found && !lsu_release) begin
+                        // run something else, fetch this instruction again later
+                        slot_blocked[curr_slot] <= 1;
+                        switching = 1;
+                        target = ready_slot;
+                    end
+                end
+                else begin
+                    if (mem_op) begin
+                        lsu_owned <= 1;
+                        lsu_owner <= curr_slot;
+                        lsu_rd <= rd;
+                        lsu_load <= mem_load;
+                        lsu_pc <= curr_pc;
+                    end
+                    simd_state <= `SIMD_WAIT;
+                end
             end
 
             `SIMD_WAIT: begin
-                // start executing only once all lanes are NOT waiting
-                if (!lane_waiting) begin
+                // start executing only once all lanes are NOT waiting on this wave's load/store
+                // (the LSUs may still hold another wave's, which is written back on its own)
+                if (!lane_waiting || !(lsu_owned && lsu_owner == curr_slot)) begin
                     simd_state <= `SIMD_EXECUTE;
                 end
 
+                else if (ready_found) begin
+                    // switch on stall -- the load/store finishes in the background (release), resume after it
+                    slot_parked[curr_slot] <= 1;
+                    switching = 1;
+                    target = ready_slot;
+                end
             end
 
             `SIMD_EXECUTE: begin
@@ -89,10 +235,24 @@ always @ (posedge(clk)) begin
             end
 
             `SIMD_UPDATE: begin
-                if (RET && (curr_wave_cycle == TOTAL_WAVE_CYCLES - 1)) begin
+                if (mem_op) begin
+                    // LSUs are free again
+                    lsu_owned <= 0;
+                    slot_blocked <= 0;
+                end
+
+                if (RET && (curr_wave_cycle == last_wave_cycle)) begin
+                    // (wave cycles after it have no active lanes and are skipped)
                     // current wave is done executing kernel
-                    simd_state <= `SIMD_DONE;
-                    simd_done <= 1;
+                    simd_done[curr_slot] <= 1;
+                    slot_active[curr_slot] <= 0;
+                    if (ready_found) begin
+                        switching = 1;
+                        target = ready_slot;
+                    end
+                    else begin
+                        simd_state <= `SIMD_DONE;
+                    end
                 end
 
                 else if (RET) begin
@@ -105,7 +265,12 @@ always @ (posedge(clk)) begin
                 else begin
                     // move on to next instruction
                     curr_pc <= pc_out;
-                    simd_state <= `SIMD_FETCH;
+                    if (issue) begin
+                        simd_state <= next_is_mem ? `SIMD_REQUEST : `SIMD_EXECUTE;
+                    end
+                    else begin
+                        simd_state <= `SIMD_FETCH;
+                    end
                 end
             end
 
@@ -114,7 +279,35 @@ always @ (posedge(clk)) begin
             end
 
         endcase
+
+        if (lsu_release) begin
+            // parked wave's load/store is complete: it resumes after it
+            lsu_owned <= 0;
+            slot_parked[lsu_owner] <= 0;
+            slot_blocked <= 0;
+        end
+
+        if (switching) begin
+            // save the running wave (a parked one resumes after its load/store, a blocked one retries it)
+            slot_pc[curr_slot] <= simd_state == `SIMD_WAIT ? curr_pc + 1 : curr_pc;
+            slot_wave_cycle[curr_slot] <= curr_wave_cycle;
+            curr_slot <= target;
+            curr_pc <= slot_pc[target];
+            curr_wave_cycle <= slot_wave_cycle[target];
+            simd_state <= `SIMD_FETCH;
+            wave_switch <= 1;
+        end
+
+        for (k = 0; k < WAVE_SLOTS; k = k + 1) begin
+            if (simd_start[k]) begin
+                // slot was assigned a new wave
+                simd_done[k] <= 0;
+                slot_active[k] <= 1;
+                slot_pc[k] <= 0;
+                slot_wave_cycle[k] <= 0;
+            end
+        end
     end
 end
 
-endmodule
\ No newline at end of file
+endmodule
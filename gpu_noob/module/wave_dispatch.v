@@ -1,18 +1,26 @@
 `timescale 1ns/1ps
 `include "common_defs.v"
 
-// Wavedispatcher --> 2 SIMDs (wavedispatcher holds up to one block)
+// Wavedispatcher --> 2 SIMDs (wavedispatcher holds up to BLOCK_SLOTS blocks)
 // Dispatches waves to SIMDs in a compute unit
     // Track which SIMDs are ready to accept a new wavefront
     // Dispatch a new wave to a SIMD when it is available
     // Signals SIMDs to start execution on their waves
-    // Track completions of waves and of its current block
+    // Track completions of waves and of its current blocks
+// Each SIMD holds up to WAVE_SLOTS waves; every (SIMD, slot) pair is dispatched to
+// like a SIMD of its own, index simd * WAVE_SLOTS + slot. Slot 0 of every SIMD
+// is filled before slot 1 of any, so waves spread over the SIMDs first.
+// Block slot b holds block core_block_id[32*b +: 32] while core_start[b] is high
+// (its wave counters are cleared while it is low). A free SIMD slot takes the next
+// wave of the resident block with the lowest block id that still has waves left,
+// and simd_block_id/simd_block_threads tell the SIMD which block the wave is from.
 // Assumes:
-    // Our SIMD units can only hold up to one wave
     // All blocks are full, except for possibility of the last block in a block grid to be partially filled
 module WaveDispatch #(
     parameter NUM_SIMDS = 2,
-    parameter WAVE_SIZE = 32
+    parameter WAVE_SIZE = 32,
+    parameter WAVE_SLOTS = 1, // resident waves per SIMD
+    parameter BLOCK_SLOTS = 1 // resident blocks
 )
 (
     input wire clk,
@@ -23,48 +31,67 @@ module WaveDispatch #(
     input wire [31:0] num_threads, // num of total threads -- defined by kernel
     input wire [31:0] block_dim, // num of threads per block -- defined by kernel 
     
-    input wire signed [31:0] core_block_id, // assigned block_id for corresponding CU
+    // blocks from the block dispatcher (one entry per block slot, {slot N-1, ..., slot 0})
+    input wire [BLOCK_SLOTS-1:0] core_start, // block slot holds a block
+    input wire [32*BLOCK_SLOTS-1:0] core_block_id, // assigned block_id for corresponding CU block slot
     
     // -- SIMD wave dispatch states -- START
-    input wire [NUM_SIMDS-1:0] simd_done, // SIMD signals for SIMD completing a wave
+    // (one entry per SIMD slot)
+    input wire [NUM_SIMDS*WAVE_SLOTS-1:0] simd_done, // SIMD signals for SIMD completing a wave
 
-    output reg [NUM_SIMDS-1:0] simd_working, // high for when SIMD has started executing on wave
-    output reg [NUM_SIMDS-1:0] simd_ready, // high for when SIMD can take a new wave
-    output reg [NUM_SIMDS-1:0] simd_start, // SIMD signals for when a new wave was just assigned to it
+    output reg [NUM_SIMDS*WAVE_SLOTS-1:0] simd_working, // high for when SIMD has started executing on wave
+    output reg [NUM_SIMDS*WAVE_SLOTS-1:0] simd_ready, // high for when SIMD can take a new wave
+    output reg [NUM_SIMDS*WAVE_SLOTS-1:0] simd_start, // SIMD signals for when a new wave was just assigned to it
     // -- SIMD wave dispatch states -- END
 
-    output wire [31:0] num_waves, // num of waves in current block
-    output reg signed [31:0] simd_wave_id [0:NUM_SIMDS-1], // wave_id for a SIMD
+    output wire [32*BLOCK_SLOTS-1:0] num_waves, // num of waves in each block slot's block
+    output reg [32*BLOCK_SLOTS-1:0] num_actual_block_threads, // num of threads in each block slot's block (SIMDs mask lanes past it)
+    output reg signed [31:0] simd_wave_id [0:NUM_SIMDS*WAVE_SLOTS-1], // wave_id for a SIMD slot
+    output reg signed [31:0] simd_block_id [0:NUM_SIMDS*WAVE_SLOTS-1], // block_id of that wave
+    output reg [31:0] simd_block_threads [0:NUM_SIMDS*WAVE_SLOTS-1], // num of threads in that wave's block
 
-    output reg block_done // signal for when all warps are processed (current block is done)
+    output reg [BLOCK_SLOTS-1:0] block_done // signal for when all warps of a block slot's block are processed (block is done)
 );
 
 localparam signed [31:0] INVALID_WAVE_ID = -32'd1;
+localparam signed [31:0] INVALID_BLOCK_ID = -32'd1;
+localparam NUM_SLOTS = NUM_SIMDS * WAVE_SLOTS;
 
-// internal states
-reg [31:0] waves_dispatched; 
-reg [31:0] waves_done;
-reg [31:0] num_actual_block_threads; // num of threads in current block
+// internal states (per block slot, {slot N-1, ..., slot 0})
+reg [32*BLOCK_SLOTS-1:0] waves_dispatched; 
+reg [32*BLOCK_SLOTS-1:0] waves_done;
+reg [$clog2(BLOCK_SLOTS > 1 ? BLOCK_SLOTS : 2)-1:0] simd_block [0:NUM_SLOTS-1]; // block slot of a SIMD slot's wave
 
 wire [31:0] num_blocks;
 assign num_blocks = (num_threads + block_dim - 1) / block_dim;
-assign num_waves = (num_actual_block_threads + WAVE_SIZE - 1) / WAVE_SIZE; // how many waves in the current block -- depends on number of actual threads on the current block
 
-// calculate actual number of threads for the current block
+// calculate actual number of threads for each resident block
     // (last block might be partially filled)
 wire [31:0] remainder;
 assign remainder = num_threads % block_dim;
+
+integer b;
 always @ (*) begin
-    if (core_block_id == (num_blocks - 1)) begin
-        num_actual_block_threads = (remainder == 0) ? block_dim : (block_dim - remainder);
-    end
+    for (b = 0; b < BLOCK_SLOTS; b = b + 1) begin
+        if (core_block_id[32*b +: 32] == (num_blocks - 1)) begin
+            num_actual_block_threads[32*b +: 32] = (remainder == 0) ? block_dim : remainder;
+        end
 
-    else begin
-        num_actual_block_threads = block_dim;
+        else begin
+            num_actual_block_threads[32*b +: 32] = block_dim;
+        end
     end
 end
 
-integer i;
+genvar g;
+generate
+    for (g = 0; g < BLOCK_SLOTS; g = g + 1) begin
+        // how many waves in a block -- depends on number of actual threads in the block
+        assign num_waves[32*g +: 32] = (num_actual_block_threads[32*g +: 32] + WAVE_SIZE - 1) / WAVE_SIZE;
+    end
+endgenerate
+
+integer i, k, next;
 always @ (posedge(clk)) begin
     // rst = HIGH
     if (rst) begin
@@ -72,8 +99,11 @@ always @ (posedge(clk)) begin
         waves_done <= 0;
         block_done <= 0;
 
-        for (i = 0; i < NUM_SIMDS; i = i + 1) begin
+        for (i = 0; i < NUM_SLOTS; i = i + 1) begin
             simd_wave_id[i] <= INVALID_WAVE_ID;
+            simd_block_id[i] <= INVALID_BLOCK_ID;
+            simd_block_threads[i] <= 0;
+            simd_block[i] <= 0;
             simd_ready[i] <= 1;
             simd_start[i] <= 0;
             simd_working[i] <= 0;
@@ -81,36 +111,59 @@ always @ (posedge(clk)) begin
     end
 
     else if (enable) begin
-        // check if current block is done (all waves are done)
-        if (waves_done == num_waves) begin
-            block_done <= 1; 
+        for (b = 0; b < BLOCK_SLOTS; b = b + 1) begin
+            if (!core_start[b]) begin
+                // block slot is empty: next block starts from wave 0
+                waves_dispatched[32*b +: 32] = 0;
+                waves_done[32*b +: 32] = 0;
+                block_done[b] <= 0;
+            end
+
+            else if (waves_done[32*b +: 32] == num_waves[32*b +: 32]) begin
+                // check if the block is done (all waves are done)
+                block_done[b] <= 1; 
+            end
         end
 
-        else begin
-            for (i = 0; i < NUM_SIMDS; i = i + 1) begin
-                // check if SIMD unit can be given a wave
-                if ((waves_dispatched < num_waves) && simd_ready[i] && !simd_working[i]) begin
-                    simd_wave_id[i] <= waves_dispatched;
-                    simd_start[i] <= 1;
-                    simd_working[i] <= 1;
-                    simd_ready[i] <= 0;
-                    waves_dispatched = waves_dispatched + 1;                               
-                end
-                
-                else begin
-                    // SIMD not assigned a new wave
-                    simd_start[i] <= 0;
-                end
+        for (k = 0; k < NUM_SLOTS; k = k + 1) begin
+            i = (k % NUM_SIMDS) * WAVE_SLOTS + k / NUM_SIMDS; // slot k / NUM_SIMDS of SIMD k % NUM_SIMDS
 
-                if (simd_done[i] && simd_working[i]) begin  
-                    // check if a simd finished processing its wave and set it back to ready
-                    simd_working[i] <= 0;
-                    simd_start[i] <= 0;
-                    simd_ready[i] <= 1;
-                    simd_wave_id[i] <= INVALID_WAVE_ID;
-                    waves_done = waves_done + 1;
+            // oldest resident block with waves left to dispatch
+            next = -1;
+            for (b = 0; b < BLOCK_SLOTS; b = b + 1) begin
+                if (core_start[b] && !block_done[b] && waves_dispatched[32*b +: 32] < num_waves[32*b +: 32] &&
+                    (next < 0 || $signed(core_block_id[32*b +: 32]) < $signed(core_block_id[32*next +: 32]))) begin
+                    next = b;
                 end
             end
+
+            // check if SIMD unit can be given a wave
+            if ((next >= 0) && simd_ready[i] && !simd_working[i]) begin
+                simd_wave_id[i] <= waves_dispatched[32*next +: 32];
+                simd_block_id[i] <= core_block_id[32*next +: 32];
+                simd_block_threads[i] <= num_actual_block_threads[32*next +: 32];
+                simd_block[i] <= next;
+                simd_start[i] <= 1;
+                simd_working[i] <= 1;
+                simd_ready[i] <= 0;
+                waves_dispatched[32*next +: 32] = waves_dispatched[32*next +: 32] + 1;                               
+            end
+            
+            else begin
+                // SIMD not assigned a new wave
+                simd_start[i] <= 0;
+            end
+
+            if (simd_done[i] && simd_working[i] && !simd_start[i]) begin  
+                // check if a simd finished processing its wave and set it back to ready
+                // (a SIMD holds simd_done until its next start, so not on the start clock)
+                simd_working[i] <= 0;
+                simd_start[i] <= 0;
+                simd_ready[i] <= 1;
+                simd_wave_id[i] <= INVALID_WAVE_ID;
+                simd_block_id[i] <= INVALID_BLOCK_ID;
+                waves_done[32*simd_block[i] +: 32] = waves_done[32*simd_block[i] +: 32] + 1;
+            end
         end
     end
 end
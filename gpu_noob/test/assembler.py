@@ -0,0 +1,257 @@
+import hashlib
+import os
+import re
+import sys
+import numpy as np
+from common import OpCode, decode_fields
+
+'''
+Assembler/disassembler for the noob ISA.
+
+Instruction format: | opcode: 6b | Rd: 7b | Rm: 7b | Rn: 7b | Other: 5b |
+
+    LDUR rd, rm         Rd = global_mem[Rm]
+    STUR rn, rm         global_mem[Rm] = Rn
+    ADD  rd, rm, rn     (also SUB, MUL, DIV, AND, ORR)
+    CONST rd, #imm_19   imm_19 = {Rm, Rn, Other}
+    RET
+
+Registers are R0-R31, with %blockIdx/%blockDim/%threadIdx/%zero for R28-R31.
+LDR/STR are accepted for LDUR/STUR (as in the README kernel).
+`;` starts a comment and immediates may be written as #N.
+
+Directives:
+    .threads N          number of threads the kernel is meant to be launched with
+    .data v0 v1 ...     initial data memory, appended from address 0
+    .word 0x...         raw instruction word
+'''
+
+# bump when the encoding changes so cached images are rebuilt
+ASM_VERSION = 1
+
+KERNEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kernels")
+CACHE_DIR = os.environ.get("NOOB_ASM_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "asm"))
+
+NUM_REGISTERS = 32
+FIRST_READ_ONLY_REG = 28
+IMM_MIN = -(1 << 18)
+IMM_MAX = (1 << 18) - 1
+
+REG_ALIASES = {
+    "%blockidx": 28,
+    "%blockdim": 29,
+    "%threadidx": 30,
+    "%zero": 31,
+}
+ALIAS_NAMES = {28: "%blockIdx", 29: "%blockDim", 30: "%threadIdx", 31: "%zero"}
+
+MNEMONICS = {
+    "LDUR": OpCode.LOAD,
+    "LDR": OpCode.LOAD,
+    "STUR": OpCode.STORE,
+    "STR": OpCode.STORE,
+    "ADD": OpCode.ADD,
+    "SUB": OpCode.SUB,
+    "MUL": OpCode.MUL,
+    "DIV": OpCode.DIV,
+    "AND": OpCode.AND,
+    "ORR": OpCode.ORR,
+    "CONST": OpCode.CONST,
+    "RET": OpCode.RET,
+}
+DISASM_NAMES = {
+    OpCode.LOAD: "LDUR",
+    OpCode.STORE: "STUR",
+    OpCode.ADD: "ADD",
+    OpCode.SUB: "SUB",
+    OpCode.MUL: "MUL",
+    OpCode.DIV: "DIV",
+    OpCode.AND: "AND",
+    OpCode.ORR: "ORR",
+    OpCode.CONST: "CONST",
+    OpCode.RET: "RET",
+}
+
+class AsmError(Exception):
+    def __init__(self, lineno, msg):
+        super().__init__(f"line {lineno}: {msg}")
+        self.lineno = lineno
+
+class Program:
+    """An assembled kernel: instruction words plus the optional .threads/.data metadata."""
+    def __init__(self, words, threads=None, data=None):
+        self.words = [int(w) for w in words]
+        self.threads = threads
+        self.data = [int(d) & (2**64 - 1) for d in data] if data is not None else []
+
+    def __len__(self):
+        return len(self.words)
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __getitem__(self, i):
+        return self.words[i]
+
+def encode(op_code, rd=0, rm=0, rn=0, other=0):
+    return (op_code << 26) | (rd << 19) | (rm << 12) | (rn << 5) | other
+
+def parse_reg(tok, lineno, write=False):
+    t = tok.strip().lower()
+    if t in REG_ALIASES:
+        r = REG_ALIASES[t]
+    elif re.fullmatch(r"[rx]\d+", t):
+        r = int(t[1:])
+    else:
+        raise AsmError(lineno, f"expected a register, got '{tok}'")
+
+    if r >= NUM_REGISTERS:
+        raise AsmError(lineno, f"R{r} does not exist (R0-R{NUM_REGISTERS - 1})")
+    if write and r >= FIRST_READ_ONLY_REG:
+        raise AsmError(lineno, f"{tok} is read-only")
+    return r
+
+def parse_int(tok, lineno):
+    t = tok.strip()
+    if t.startswith("#"):
+        t = t[1:]
+    try:
+        return int(t, 0)
+    except ValueError:
+        raise AsmError(lineno, f"expected a number, got '{tok}'")
+
+def assemble(text):
+    """Assemble kernel source text into a Program."""
+    words = []
+    data = []
+    threads = None
+
+    for lineno, line in enumerate(text.splitlines(), start=1):
+        line = line.split(";", 1)[0].strip()
+        if not line:
+            continue
+
+        parts = line.split(None, 1)
+        mnemonic = parts[0].upper()
+        operands = [o for o in re.split(r"[,\s]+", parts[1].strip()) if o] if len(parts) > 1 else []
+
+        # directives
+        if mnemonic == ".THREADS":
+            if len(operands) != 1:
+                raise AsmError(lineno, ".threads takes one value")
+            threads = parse_int(operands[0], lineno)
+            continue
+        if mnemonic == ".DATA":
+            data.extend(parse_int(o, lineno) for o in operands)
+            continue
+        if mnemonic == ".WORD":
+            words.extend(parse_int(o, lineno) & 0xFFFFFFFF for o in operands)
+            continue
+
+        if mnemonic not in MNEMONICS:
+            raise AsmError(lineno, f"unknown mnemonic '{parts[0]}'")
+        op = MNEMONICS[mnemonic]
+
+        expected = {OpCode.LOAD: 2, OpCode.STORE: 2, OpCode.CONST: 2, OpCode.RET: 0}.get(op, 3)
+        if len(operands) != expected:
+            raise AsmError(lineno, f"{mnemonic} takes {expected} operands, got {len(operands)}")
+
+        if op == OpCode.LOAD:
+            words.append(encode(op.value, rd=parse_reg(operands[0], lineno, write=True), rm=parse_reg(operands[1], lineno)))
+        elif op == OpCode.STORE:
+            words.append(encode(op.value, rn=parse_reg(operands[0], lineno), rm=parse_reg(operands[1], lineno)))
+        elif op == OpCode.CONST:
+            imm = parse_int(operands[1], lineno)
+            if not IMM_MIN <= imm <= IMM_MAX:
+                raise AsmError(lineno, f"immediate {imm} does not fit in 19 signed bits")
+            words.append(encode(op.value, rd=parse_reg(operands[0], lineno, write=True)) | (imm & 0x7FFFF))
+        elif op == OpCode.RET:
+            words.append(encode(op.value))
+        else:
+            rd = parse_reg(operands[0], lineno, write=True)
+            words.append(encode(op.value, rd=rd, rm=parse_reg(operands[1], lineno), rn=parse_reg(operands[2], lineno)))
+
+    return Program(words, threads, data)
+
+def reg_name(r):
+    return ALIAS_NAMES.get(r, f"R{r}")
+
+def disassemble_word(instr):
+    op_code, rd, rm, rn, imm_19 = decode_fields(instr)
+    try:
+        op = OpCode(op_code)
+    except ValueError:
+        return f".word {instr:#010x}"
+
+    if op == OpCode.LOAD:
+        text = f"LDUR {reg_name(rd)}, {reg_name(rm)}"
+    elif op == OpCode.STORE:
+        text = f"STUR {reg_name(rn)}, {reg_name(rm)}"
+    elif op == OpCode.CONST:
+        text = f"CONST {reg_name(rd)}, #{imm_19}"
+    elif op == OpCode.RET:
+        text = "RET"
+    else:
+        text = f"{DISASM_NAMES[op]} {reg_name(rd)}, {reg_name(rm)}, {reg_name(rn)}"
+
+    # keep words the mnemonic can't express (stray bits, R32+, writes to R28-R31) byte-exact
+    try:
+        if assemble(text).words == [instr]:
+            return text
+    except AsmError:
+        pass
+    return f".word {instr:#010x}"
+
+def disassemble(words):
+    """Disassemble instruction words into source text (round-trips through assemble)."""
+    return "\n".join(disassemble_word(w) for w in words)
+
+def source_key(text):
+    return hashlib.sha256(f"noob-asm-v{ASM_VERSION}\n{text}".encode()).hexdigest()
+
+def assemble_file(path, cache_dir=CACHE_DIR):
+    """Assemble a .s file, reusing the cached image when the source hasn't changed."""
+    with open(path) as f:
+        text = f.read()
+
+    if cache_dir is None:
+        return assemble(text)
+
+    image = os.path.join(cache_dir, source_key(text) + ".npz")
+    if os.path.exists(image):
+        try:
+            with np.load(image) as npz:
+                threads = int(npz["threads"])
+                return Program(npz["words"].tolist(), threads if threads >= 0 else None, npz["data"].tolist())
+        except (OSError, KeyError, ValueError):
+            pass # corrupt/partial image -- rebuild it
+
+    program = assemble(text)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{image}.{os.getpid()}.tmp.npz"
+    np.savez(tmp,
+             words=np.array(program.words, dtype=np.uint32),
+             threads=np.int64(program.threads if program.threads is not None else -1),
+             data=np.array(program.data, dtype=np.uint64))
+    os.replace(tmp, image) # atomic, so parallel test runs never see half-written images
+    return program
+
+if __name__ == "__main__":
+    # python assembler.py kernel.s      -> print hex words
+    # python assembler.py -d kernel.s   -> assemble, then print the disassembly
+    args = sys.argv[1:]
+    disasm = "-d" in args
+    args = [a for a in args if a != "-d"]
+    if len(args) != 1:
+        sys.exit("usage: assembler.py [-d] kernel.s")
+
+    try:
+        program = assemble_file(args[0], cache_dir=None)
+    except AsmError as e:
+        sys.exit(f"{args[0]}: {e}")
+
+    if disasm:
+        print(disassemble(program.words))
+    else:
+        for pc, w in enumerate(program.words):
+            print(f"{pc:2}: {w:#010x}  {disassemble_word(w)}")
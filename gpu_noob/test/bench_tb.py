@@ -0,0 +1,139 @@
+import os
+import time
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, ReadOnly, Timer
+from cocotb.utils import get_sim_time
+from common import bench_param
+from signals import Signals
+from isa_sim import IsaSimulator
+from assembler import assemble_file
+from memory import ProgramMemoryModel, DataMemoryModel
+from perf import read_perf_counters
+from benchmarks import select, write_results, load_results, compare, format_table, RESULTS_FILE
+
+TOPLEVEL = "SIMD" # module this bench drives (DUT=...)
+
+WAVE_SIZE = bench_param("WAVE_SIZE", 32)
+LANE_WIDTH = bench_param("LANE_WIDTH", 16)
+ADDR_WIDTH = bench_param("DATA_MEM_ADDR_WIDTH", 7)
+WAVE_SLOTS = bench_param("WAVE_SLOTS", 1)
+CLOCK_PERIOD = 10 # ns
+
+# --- Kernel benchmark suite (see benchmarks.py) ---
+# The bench plays block/wave dispatcher for one SIMD: the waves of a block
+# are started in dispatch order, each in a free wave slot (one after the
+# other with one slot), and a block starts once the previous one drained.
+
+async def launch(dut, isa, num_threads, block_dim):
+    """Run every wave of the grid on the SIMD; returns (blocks, waves)."""
+    sig = Signals(dut)
+    num_blocks = (num_threads + block_dim - 1) // block_dim
+    waves = 0
+    wave_ids = 0 # packed per slot
+    for block_id in range(num_blocks):
+        block_threads = isa.block_threads(block_id, num_threads, block_dim)
+        num_waves = (block_threads + WAVE_SIZE - 1) // WAVE_SIZE
+        # every slot runs a wave of this block (packed per slot)
+        sig.block_id.write(sum(block_id << 32 * slot for slot in range(WAVE_SLOTS)))
+        sig.num_block_threads.write(sum(block_threads << 32 * slot for slot in range(WAVE_SLOTS)))
+        pending = list(range(num_waves))
+        running = set() # slots holding a wave
+        while pending or running:
+            start = 0
+            for slot in range(WAVE_SLOTS):
+                if slot not in running and pending:
+                    wave_ids = wave_ids & ~(0xFFFFFFFF << 32 * slot) | pending.pop(0) << 32 * slot
+                    start |= 1 << slot
+                    running.add(slot)
+            if start:
+                sig.wave_id.write(wave_ids)
+                sig.simd_start.write(start)
+                await RisingEdge(dut.clk)
+                sig.simd_start.write(0)
+            finished = set()
+            while not finished:
+                await RisingEdge(dut.clk)
+                await ReadOnly()
+                finished = {slot for slot in running if sig.simd_done.bit(slot)}
+            running -= finished
+            waves += len(finished)
+            await RisingEdge(dut.clk) # SIMD_DONE -> SIMD_IDLE before the next start
+    return num_blocks, waves
+
+async def run_benchmark(dut, bench):
+    program = assemble_file(bench.kernel)
+    init = bench.init(bench.num_threads)
+
+    prog_mem = ProgramMemoryModel(dut)
+    prog_mem.load(program)
+    data_mem = DataMemoryModel(dut, ADDR_WIDTH)
+    data_mem.mem[:len(init)] = init
+    tasks = [cocotb.start_soon(prog_mem.run()), cocotb.start_soon(data_mem.run())]
+
+    # Reset (also clears the perf counters)
+    dut.rst.value = 1
+    dut.enable.value = 1
+    dut.perf_addr.value = 0
+    dut.simd_start.value = 0
+    await Timer(2 * CLOCK_PERIOD, units="ns")
+    dut.rst.value = 0
+    await RisingEdge(dut.clk)
+
+    dut.num_threads.value = bench.num_threads
+    dut.block_dim.value = bench.block_dim
+    dut.simd_ready.value = 0
+    dut.simd_working.value = 1
+
+    isa = IsaSimulator(WAVE_SIZE, LANE_WIDTH, ADDR_WIDTH)
+    wall = time.perf_counter()
+    start = get_sim_time("ns")
+    blocks, waves = await launch(dut, isa, bench.num_threads, bench.block_dim)
+    cycles = int(get_sim_time("ns") - start) // CLOCK_PERIOD
+    wall = time.perf_counter() - wall
+
+    perf = await read_perf_counters(dut, LANE_WIDTH)
+    for t in tasks:
+        t.kill()
+
+    golden = isa.run(program, bench.num_threads, bench.block_dim, init)
+    mismatch = data_mem.mem.diff(golden, limit=1)
+    assert not mismatch, f"{bench.name}: M[{mismatch[0]}] differs from ISA model: {data_mem.mem[mismatch[0]]} vs {golden[mismatch[0]]}"
+
+    return {
+        "kernel": os.path.basename(bench.kernel),
+        "num_threads": bench.num_threads,
+        "block_dim": bench.block_dim,
+        "blocks": blocks,
+        "waves": waves,
+        "cycles": cycles,
+        "retired": perf.retired,
+        "ipc": perf.retired / cycles,
+        "thread_ipc": perf.lane_active / cycles,
+        "stall_cycles": perf.stall_cycles,
+        "mem_requests": data_mem.stats()["requests"],
+        "wall_time_s": wall,
+    }
+
+@cocotb.test()
+async def test_benchmarks(dut):
+    clock = Clock(dut.clk, CLOCK_PERIOD, units="ns")
+    cocotb.start_soon(clock.start())
+
+    results = {}
+    num_threads = os.environ.get("BENCH_THREADS")
+    block_dim = os.environ.get("BENCH_BLOCK_DIM")
+    benches = select(os.environ.get("BENCH"), num_threads and int(num_threads), block_dim and int(block_dim))
+    for bench in benches:
+        results[bench.name] = await run_benchmark(dut, bench)
+        dut._log.info(f"{bench.name}: {results[bench.name]['cycles']} cycles")
+
+    write_results(results, RESULTS_FILE, cocotb.SIM_NAME)
+    dut._log.info(f"Benchmark results ({RESULTS_FILE}):\n{format_table(results)}")
+
+    baseline = os.environ.get("BENCH_BASELINE")
+    if baseline:
+        regressions, notes = compare(results, load_results(baseline), float(os.environ.get("BENCH_TOLERANCE", 0)))
+        for line in notes:
+            dut._log.info(line)
+        assert not regressions, "performance regressions against " + baseline + ":\n" + "\n".join(regressions)
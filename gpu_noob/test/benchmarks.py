@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import sys
+from assembler import KERNEL_DIR
+
+'''
+Kernel benchmark suite run by bench_tb.py.
+
+Each benchmark is a kernel from kernels/ launched over a grid of
+num_threads/block_dim on one SIMD. bench_tb records cycles from the first
+simd_start to the last simd_done, retired instructions (IPC), data memory
+transactions and sim wall time, and writes them to a JSON file:
+
+    make DUT=SIMD TESTBENCH=bench_tb
+    BENCH=mask_96x32 BENCH_BASELINE=test/bench_baseline.json make DUT=SIMD TESTBENCH=bench_tb
+
+Compare two result files (exits 1 if anything got slower):
+
+    python benchmarks.py compare bench_results.json bench_baseline.json [--tolerance 0.02]
+
+Kernels other than vector_add.s read their arguments (array bases, scalars)
+from data memory starting at M[0]; arrays are laid out from ARRAY_BASE.
+'''
+
+RESULTS_VERSION = 1
+RESULTS_FILE = os.environ.get("BENCH_OUT", "bench_results.json")
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+ARRAY_BASE = 4
+
+# metrics where a larger value is a regression
+COMPARED_METRICS = ("cycles", "mem_requests")
+
+class Benchmark:
+    def __init__(self, name, kernel, num_threads, block_dim, init):
+        self.name = name
+        self.kernel = os.path.join(KERNEL_DIR, kernel)
+        self.num_threads = num_threads
+        self.block_dim = block_dim
+        self.init = init # num_threads -> initial data memory (list of words)
+
+def vector_add_mem(n):
+    # fixed layout of vector_add.s: A at 0, B at 32
+    return list(range(32)) + list(range(32))
+
+def saxpy_mem(n):
+    x, y = ARRAY_BASE, ARRAY_BASE + n
+    return [x, y, 3, 0] + [i + 1 for i in range(n)] + [100 * i for i in range(n)]
+
+def vector_mul_mem(n):
+    a, b = ARRAY_BASE, ARRAY_BASE + n
+    return [a, b, ARRAY_BASE + 2 * n, 0] + [i + 1 for i in range(n)] + [n - i for i in range(n)]
+
+def mask_mem(n):
+    return [ARRAY_BASE, 0x5A, 0, 0] + [0x1000 + 7 * i for i in range(n)]
+
+BENCHMARKS = [
+    Benchmark("vector_add_32x64", "vector_add.s", 32, 64, vector_add_mem),
+    Benchmark("saxpy_32x32", "saxpy.s", 32, 32, saxpy_mem),
+    Benchmark("vector_mul_32x32", "vector_mul.s", 32, 32, vector_mul_mem),
+    Benchmark("mask_64x32", "mask.s", 64, 32, mask_mem), # 2 blocks
+    Benchmark("mask_96x32", "mask.s", 96, 32, mask_mem), # 3 blocks
+    Benchmark("mask_96x64", "mask.s", 96, 64, mask_mem), # 2 blocks, partial last block
+    Benchmark("mask_76x32", "mask.s", 76, 32, mask_mem), # 3 blocks, last one 12 threads (masked lanes, one wave cycle)
+]
+
+def select(names=None, num_threads=None, block_dim=None):
+    """
+    Benchmarks to run: all, or the comma separated `names` (e.g. from $BENCH).
+    num_threads/block_dim relaunch the chosen kernels over a different grid
+    ($BENCH_THREADS/$BENCH_BLOCK_DIM, used by sweep.py).
+    """
+    benches = list(BENCHMARKS)
+    if names:
+        by_name = {b.name: b for b in BENCHMARKS}
+        unknown = [n for n in names.split(",") if n not in by_name]
+        if unknown:
+            raise ValueError(f"unknown benchmarks {unknown} (have {sorted(by_name)})")
+        benches = [by_name[n] for n in names.split(",")]
+
+    if num_threads is None and block_dim is None:
+        return benches
+    regridded = []
+    for b in benches:
+        n = num_threads or b.num_threads
+        bd = block_dim or b.block_dim
+        name = f"{b.name.rsplit('_', 1)[0]}_{n}x{bd}"
+        regridded.append(Benchmark(name, os.path.basename(b.kernel), n, bd, b.init))
+    return regridded
+
+def write_results(results, path=RESULTS_FILE, simulator=None):
+    out = {"version": RESULTS_VERSION, "simulator": simulator, "benchmarks": results}
+    with open(path, "w") as f:
+        json.dump(out, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def load_results(path):
+    with open(path) as f:
+        results = json.load(f)
+    if results.get("version") != RESULTS_VERSION:
+        raise ValueError(f"{path}: results version {results.get('version')}, expected {RESULTS_VERSION}")
+    return results["benchmarks"]
+
+def compare(results, baseline, tolerance=0.0):
+    """
+    Compare benchmark results against a baseline.
+    Returns (regressions, notes): lists of human readable lines. A metric
+    regresses when it grows by more than `tolerance` (fraction of the baseline).
+    """
+    regressions = []
+    notes = []
+    for name, res in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            notes.append(f"{name}: not in baseline")
+            continue
+        for metric in COMPARED_METRICS:
+            new, old = res[metric], base[metric]
+            if new > old * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {old} -> {new} (+{(new - old) / max(old, 1):.1%})")
+            elif new < old:
+                notes.append(f"{name}: {metric} {old} -> {new} ({(new - old) / max(old, 1):.1%})")
+    for name in sorted(set(baseline) - set(results)):
+        notes.append(f"{name}: in baseline but not run")
+    return regressions, notes
+
+def format_table(results):
+    lines = [f"{'benchmark':<18} {'threads':>7} {'block':>5} {'cycles':>7} {'retired':>7} {'IPC':>6} {'thr IPC':>7} {'mem req':>7} {'wall s':>7}"]
+    for name, r in sorted(results.items()):
+        lines.append(f"{name:<18} {r['num_threads']:>7} {r['block_dim']:>5} {r['cycles']:>7} {r['retired']:>7} "
+                     f"{r['ipc']:>6.3f} {r['thread_ipc']:>7.2f} {r['mem_requests']:>7} {r['wall_time_s']:>7.2f}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show or compare kernel benchmark results")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    show = sub.add_parser("show", help="print a results file as a table")
+    show.add_argument("results")
+    cmp = sub.add_parser("compare", help="flag regressions against a baseline")
+    cmp.add_argument("results")
+    cmp.add_argument("baseline", nargs="?", default=BASELINE_FILE)
+    cmp.add_argument("--tolerance", type=float, default=0.0, help="allowed growth as a fraction (default 0: cycle counts are exact)")
+    args = parser.parse_args()
+
+    results = load_results(args.results)
+    if args.cmd == "show":
+        print(format_table(results))
+        sys.exit(0)
+
+    regressions, notes = compare(results, load_results(args.baseline), args.tolerance)
+    for line in notes:
+        print(line)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    sys.exit(1 if regressions else 0)
@@ -1,45 +1,30 @@
 import cocotb
 from cocotb.clock import Clock
-from cocotb.triggers import RisingEdge, Timer
-from cocotb.utils import get_sim_time
-from common import safe_int, signed_int
+from cocotb.triggers import RisingEdge, ReadOnly, Timer
+from common import bench_param
+from signals import Signals
+from trace_recorder import TraceRecorder, dump_on_failure
 
-THREADS = 320 # 5 BLOCKS (1 more than there are CUs)
+TOPLEVEL = "BlockDispatch" # module this bench drives (DUT=...)
+
+NUM_CORES = bench_param("NUM_CORES", 4)
+BLOCK_SLOTS = bench_param("BLOCK_SLOTS", 1) # resident blocks per CU
+CU_WAVE_SLOTS = bench_param("CU_WAVE_SLOTS", 2) # resident waves per CU
+WAVE_SIZE = bench_param("WAVE_SIZE", 32)
 BLOCK_DIM = 64
+THREADS = (NUM_CORES + 1) * BLOCK_DIM # 1 more block than there are CUs
 
-async def log_signals(dut):
-    cycle = 0
-    dut._log.info(f"NUM_CORES = {int(dut.NUM_CORES.value)}")
+# signals kept in the trace ring buffer (dumped to traces/ on failure)
+TRACE_SIGNALS = [
+    "enable", "rst",
+    "num_threads", "block_dim", "num_blocks",
+    "blocks_dispatched", "blocks_done", "kernel_done",
+    "core_start", "core_ready", "core_block_id[]", "core_done",
+    "slot_working", "kernel_cycles", "resident_wave_cycles",
+]
 
-    while True:
-        await RisingEdge(dut.clk)
-        curr_ns = get_sim_time(units="ns")
-        dispatched = safe_int(dut.blocks_dispatched.value)
-        blocks_done = safe_int(dut.blocks_done.value)
-        kernel_done = safe_int(dut.kernel_done.value)
-        enable = safe_int(dut.enable.value)
-        rst = safe_int(dut.rst.value)
-        num_threads = safe_int(dut.num_threads.value)
-        block_dim = safe_int(dut.block_dim.value)
-        num_blocks = safe_int(dut.num_blocks.value)
-        dut._log.info(
-            f"\n---- CLOCK CYCLE: {cycle} @ {curr_ns} ns ----\n"
-            f"dispatched={dispatched}\n"
-            f"blocks_done={blocks_done} kernel_done={kernel_done}\n"
-            f"enable={enable} rst={rst}\n"
-            f"num_threads={num_threads} block_dim={block_dim} num_blocks={num_blocks}\n"
-        )
-
-        for i in range(int(dut.NUM_CORES.value)):
-            dut._log.info(
-                f"  Core {i}: start={(dut.core_start[i].value)} "
-                f"core_ready={(dut.core_ready[i].value)} "
-                f"block_id={signed_int(dut.core_block_id[i].value)} "
-                f"done={(dut.core_done[i].value)}"
-            )
-        cycle += 1
-
-@cocotb.test()
+@cocotb.test(skip=BLOCK_SLOTS > 1) # one block per CU; see test_block_slots
+@dump_on_failure
 async def test_block_dispatch(dut):
     """
     Test block dispatcher module
@@ -48,42 +33,47 @@ async def test_block_dispatch(dut):
     # start 100MHz clock
     clock = Clock(dut.clk, 10, units="ns")
     cocotb.start_soon(clock.start())
-    cocotb.start_soon(log_signals(dut))
+    dut._log.info(f"NUM_CORES = {int(dut.NUM_CORES.value)}")
+    trace = TraceRecorder(dut, TRACE_SIGNALS, name="block_dispatch")
+    cocotb.start_soon(trace.run())
+    sig = Signals(dut)
 
     # init reset
     dut.rst.value = 1
     dut.enable.value = 1
     dut.num_threads.value = THREADS
     dut.block_dim.value = BLOCK_DIM
+    dut.kernel_start.value = 0
     dut.core_done.value = 0 # none of the cores are done at start (duh)
+    dut.slot_working.value = 0
     await Timer(20, units="ns")  # Hold reset for a while
     dut.rst.value = 0
     await RisingEdge(dut.clk)
 
     # test -- after rst, all blockIDs should be 0 and no blocks dispatched
     for i in range(int(dut.NUM_CORES.value)):
-        assert signed_int(dut.core_block_id[i].value) == signed_int(dut.INVALID_BLOCK_ID), f"After reset, block_id for CU{i} should be {signed_int(dut.INVALID_BLOCK_ID)}"
-    assert safe_int(dut.blocks_dispatched.value) == 0, "After reset, blocks_dispatched should be 0"
-    assert safe_int(dut.blocks_done.value) == 0, "After reset, blocks_done should be 0"
-    assert safe_int(dut.kernel_done.value) == 0, "After reset, kernel_done should be 0"
+        assert sig.core_block_id[i].signed() == sig.INVALID_BLOCK_ID.signed(), f"After reset, block_id for CU{i} should be {sig.INVALID_BLOCK_ID.signed()}"
+    assert sig.blocks_dispatched.read() == 0, "After reset, blocks_dispatched should be 0"
+    assert sig.blocks_done.read() == 0, "After reset, blocks_done should be 0"
+    assert sig.kernel_done.read() == 0, "After reset, kernel_done should be 0"
 
     # test -- all cores have correct assigned block
     await RisingEdge(dut.clk)
     for i in range(int(dut.NUM_CORES.value)):
-        assert safe_int(dut.core_block_id[i].value) == i, f"On first dispatch, CU{i} should have block_id {i}"
+        assert sig.core_block_id[i].read() == i, f"On first dispatch, CU{i} should have block_id {i}"
     
     # test -- CU0 is done executing its block
     dut.core_done[0].value = 1
     await RisingEdge(dut.clk) # core done set
     await RisingEdge(dut.clk) # core done processed
     dut.core_done[0].value = 0
-    assert safe_int(dut.blocks_done.value) == 1, "CU0 is done, blocks_done should be 1"
+    assert sig.blocks_done.read() == 1, "CU0 is done, blocks_done should be 1"
 
     # test -- CU0 was given another block, since it completed its last one
     await RisingEdge(dut.clk) # core given new block
-    assert safe_int(dut.core_block_id[0].value) == 4, f"CU0 should have been assigned new block_id 4, Actual block_id: {safe_int(dut.core_block_id[0].value)}" 
-    assert safe_int(dut.blocks_dispatched.value) == 5, f"5 blocks should have been dispatched, got {safe_int(dut.blocks_dispatched.value)} instead"
-    assert safe_int(dut.core_start[0]) == 1, "CU0 was recently assigned block 4 and start status should be 1"
+    assert sig.core_block_id[0].read() == NUM_CORES, f"CU0 should have been assigned new block_id {NUM_CORES}, Actual block_id: {sig.core_block_id[0].read()}" 
+    assert sig.blocks_dispatched.read() == NUM_CORES + 1, f"{NUM_CORES + 1} blocks should have been dispatched, got {sig.blocks_dispatched.read()} instead"
+    assert sig.core_start.bit(0) == 1, f"CU0 was recently assigned block {NUM_CORES} and start status should be 1"
 
     ## test -- finish all of the blocks now!
     for i in range(int(dut.NUM_CORES.value)):
@@ -91,10 +81,101 @@ async def test_block_dispatch(dut):
         await RisingEdge(dut.clk) # core done set
         await RisingEdge(dut.clk) # core done processed
         dut.core_done[i].value = 0
-        assert safe_int(dut.blocks_done.value) == i + 2, f"CU{i} is done, blocks_done should be {i + 2}" # +1 (C0 finished a block before this), +1 (this core finished its block)
-        assert safe_int(dut.core_ready[i].value) == 1, f"CU{i} is done, ready state should be 1"
-        assert safe_int(dut.core_start[i].value) == 0, f"CU{i} is done, start state should be 0" 
+        assert sig.blocks_done.read() == i + 2, f"CU{i} is done, blocks_done should be {i + 2}" # +1 (C0 finished a block before this), +1 (this core finished its block)
+        assert sig.core_ready.bit(i) == 1, f"CU{i} is done, ready state should be 1"
+        assert sig.core_start.bit(i) == 0, f"CU{i} is done, start state should be 0" 
 
     # test -- kernel is done
     await RisingEdge(dut.clk)
-    assert safe_int(dut.kernel_done) == 1, "All blocks of kernel are done, kernel_done should be 1"
\ No newline at end of file
+    assert sig.kernel_done.read() == 1, "All blocks of kernel are done, kernel_done should be 1"
+
+    # test -- kernel_start launches again without a reset: counters start over, blocks 0.. go out
+    dut.num_threads.value = 2 * BLOCK_DIM
+    dut.kernel_start.value = 1
+    await RisingEdge(dut.clk) # kernel_start seen
+    dut.kernel_start.value = 0
+    await ReadOnly()
+    assert sig.kernel_done.read() == 0, "After kernel_start, kernel_done should be 0"
+    assert sig.blocks_dispatched.read() == 0, "After kernel_start, blocks_dispatched should be 0"
+    assert sig.kernel_cycles.read() == 0, "After kernel_start, kernel_cycles should be 0"
+    await RisingEdge(dut.clk) # blocks dispatched
+    await ReadOnly()
+    for i in range(2):
+        assert sig.core_block_id[i].read() == i, f"On relaunch, CU{i} should have block_id {i}"
+    assert sig.blocks_dispatched.read() == 2, f"2 blocks should have been dispatched, got {sig.blocks_dispatched.read()} instead"
+    await RisingEdge(dut.clk)
+    for i in range(2):
+        dut.core_done[i].value = 1
+    await RisingEdge(dut.clk) # core done set
+    await RisingEdge(dut.clk) # core done processed
+    dut.core_done.value = 0
+    await RisingEdge(dut.clk)
+    await ReadOnly()
+    assert sig.kernel_done.read() == 1, "Both blocks of the second launch are done, kernel_done should be 1"
+
+async def dispatch(dut, num_threads, block_dim):
+    """Reset with a new launch and let the first blocks be dispatched."""
+    dut.rst.value = 1
+    dut.enable.value = 1
+    dut.num_threads.value = num_threads
+    dut.block_dim.value = block_dim
+    dut.kernel_start.value = 0
+    dut.core_done.value = 0
+    dut.slot_working.value = 0
+    await Timer(20, units="ns")
+    dut.rst.value = 0
+    await RisingEdge(dut.clk)
+    await RisingEdge(dut.clk)
+
+@cocotb.test(skip=BLOCK_SLOTS < 2)
+@dump_on_failure
+async def test_block_slots(dut):
+    """
+    Several resident blocks per CU (PARAMS="BLOCK_SLOTS=2"): one-wave blocks
+    fill as many block slots as the CU has wave slots, blocks that fill a
+    CU's wave slots get one CU each, and the occupancy counters add up the
+    working wave slots every cycle until kernel_done.
+    """
+    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+    trace = TraceRecorder(dut, TRACE_SIGNALS, name="block_slots")
+    cocotb.start_soon(trace.run())
+    sig = Signals(dut)
+    invalid = sig.INVALID_BLOCK_ID.signed()
+    resident = min(BLOCK_SLOTS, CU_WAVE_SLOTS)
+
+    # test -- one-wave blocks: slot b of CU c gets block b * NUM_CORES + c, up to the CU's wave slots
+    await dispatch(dut, 3 * NUM_CORES * CU_WAVE_SLOTS * WAVE_SIZE, WAVE_SIZE)
+    for c in range(NUM_CORES):
+        for b in range(BLOCK_SLOTS):
+            expected = b * NUM_CORES + c if b < resident else invalid
+            actual = sig.core_block_id[c * BLOCK_SLOTS + b].signed()
+            assert actual == expected, f"CU{c} block slot {b} should hold block {expected}, got {actual}"
+    assert sig.blocks_dispatched.read() == NUM_CORES * resident, f"{sig.blocks_dispatched.read()} blocks dispatched"
+
+    # test -- occupancy counters: every wave slot working adds NUM_CORES * CU_WAVE_SLOTS per cycle
+    dut.slot_working.value = 2**(NUM_CORES * CU_WAVE_SLOTS) - 1
+    await RisingEdge(dut.clk)
+    await ReadOnly()
+    cycles, waves = sig.kernel_cycles.read(), sig.resident_wave_cycles.read()
+    for _ in range(10):
+        await RisingEdge(dut.clk)
+    await ReadOnly()
+    assert sig.kernel_cycles.read() - cycles == 10, f"kernel_cycles went {cycles} -> {sig.kernel_cycles.read()} in 10 cycles"
+    actual = sig.resident_wave_cycles.read() - waves
+    assert actual == 10 * NUM_CORES * CU_WAVE_SLOTS, f"all wave slots working for 10 cycles should add {10 * NUM_CORES * CU_WAVE_SLOTS}, got {actual}"
+    await RisingEdge(dut.clk)
+
+    # test -- blocks that fill a CU's wave slots don't share it
+    await dispatch(dut, 2 * NUM_CORES * CU_WAVE_SLOTS * WAVE_SIZE, CU_WAVE_SLOTS * WAVE_SIZE)
+    for c in range(NUM_CORES):
+        actual = [sig.core_block_id[c * BLOCK_SLOTS + b].signed() for b in range(BLOCK_SLOTS)]
+        assert actual == [c] + [invalid] * (BLOCK_SLOTS - 1), f"CU{c} should hold only block {c}, got {actual}"
+
+    # test -- once it is done, the next block takes its place
+    dut.core_done[0].value = 1
+    await RisingEdge(dut.clk) # core done set
+    await RisingEdge(dut.clk) # core done processed
+    dut.core_done[0].value = 0
+    await RisingEdge(dut.clk) # core given new block (in any of its block slots)
+    actual = [sig.core_block_id[b].signed() for b in range(BLOCK_SLOTS)]
+    assert NUM_CORES in actual, f"CU0 should hold block {NUM_CORES}, got {actual}"
@@ -0,0 +1,210 @@
+from collections import deque
+import cocotb
+from cocotb.triggers import Event, RisingEdge, ReadOnly, Timer
+from cocotb.utils import get_sim_time
+from signals import Signals
+from memory import ProgramMemoryModel, LineMemoryModel
+from host_buffers import HostBuffers, open_array
+
+'''
+Host-side kernel launches on the GPU top, after the host flow of
+opencl_noob/vadd_2.c: an in-order command queue feeding the device, input
+buffers written into device memory, a kernel enqueued over a grid of
+threads in blocks, an event to wait on, results read back.
+
+    queue = CommandQueue(dut, addr_width=7)
+    await queue.start()                   # the only reset; starts the memory models
+    run = queue.launch("kernels/saxpy.s", grid=32, block=32,
+                       buffers={"X": (4, x), "Y": (36, y)}, args=[4, 36, 3])
+    await run                             # completion: run.cycles, run.read("Y")
+    await queue.finish()                  # every launch enqueued so far (clFinish)
+
+Launches run back to back without a reset (GPU kernel_start). While one
+runs, the next is staged: its program goes into the program memory's back
+bank, and its input buffers into data memory unless they overlap a region
+the running launch uses (then they are written once it is done). Kernel
+arguments (`args`, the words at M[0..] the kernels read) are written
+between launches.
+
+buffers: name -> (base, source) stages `source` (array, .npy or raw file,
+see host_buffers.open_array) at `base`; name -> (base, count) only reserves
+`count` words -- an output, or data an earlier launch left there.
+'''
+
+class Launch:
+    """One enqueued kernel launch. Awaiting it waits for its kernel_done."""
+    def __init__(self, index, program, grid, block, buffers, args):
+        self.index = index
+        self.program = program
+        self.grid = grid # num_threads
+        self.block = block # block_dim
+        self.buffers = dict(buffers)
+        self.args = [int(a) for a in args]
+        self.host = None # HostBuffers over data memory once its inputs are staged
+        self.program_staged = False
+        self.staged_early = False # inputs written while the previous launch ran
+        # set on completion
+        self.start_cycle = None # clock kernel_start was raised
+        self.end_cycle = None # clock kernel_done was seen
+        self.cycles = None # kernel_cycles: start to kernel_done
+        self.resident_wave_cycles = None
+        self.results = {} # name -> buffer contents at kernel_done
+        self._done = Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def inputs(self):
+        """(name, base, array) of the buffers that are staged from a source."""
+        return [(name, base, open_array(source)) for name, (base, source) in self.buffers.items()
+                if not isinstance(source, int)]
+
+    def regions(self):
+        """[base, end) of every buffer and of the kernel arguments."""
+        regions = [(base, base + (source if isinstance(source, int) else open_array(source).size))
+                   for base, source in self.buffers.values()]
+        if self.args:
+            regions.append((0, len(self.args)))
+        return regions
+
+    def overlaps(self, other):
+        """True if staging this launch's inputs would write a region `other` uses."""
+        return any(base < end and b < base + array.size
+                   for _, base, array in self.inputs() for b, end in other.regions())
+
+    def read(self, name, dtype=None):
+        """Contents of a buffer when the launch finished."""
+        words = self.results[name]
+        return words if dtype is None else words.view(dtype)
+
+    def __await__(self):
+        return self._done.wait().__await__()
+
+    def __repr__(self):
+        return f"Launch({self.index}, grid={self.grid}, block={self.block})"
+
+class CommandQueue:
+    """
+    In-order launch queue on a GPU dut, driving its program memory and
+    (line transaction) data memory models.
+    """
+    def __init__(self, dut, addr_width=7, line_words=4, latency=1, clock_period=10, timeout_cycles=200000):
+        self.dut = dut
+        self.sig = Signals(dut)
+        self.prog_mem = ProgramMemoryModel(dut)
+        self.data_mem = LineMemoryModel(dut, addr_width, line_words, latency)
+        self.clock_period = clock_period
+        self.timeout_cycles = timeout_cycles
+        self.launches = []
+        self.pending = deque() # enqueued, not started
+        self._wake = Event()
+        self._tasks = []
+
+    def cycle(self):
+        return int(get_sim_time("ns")) // self.clock_period
+
+    async def start(self):
+        """Reset the GPU once, with an empty grid so the reset launch is done at once, and start serving launches."""
+        dut = self.dut
+        self._tasks = [cocotb.start_soon(m.run()) for m in (self.prog_mem, self.data_mem)]
+        dut.rst.value = 1
+        dut.enable.value = 1
+        dut.kernel_start.value = 0
+        dut.num_threads.value = 0
+        dut.block_dim.value = 1
+        dut.perf_simd.value = 0
+        dut.perf_addr.value = 0
+        await Timer(2 * self.clock_period, units="ns")
+        dut.rst.value = 0
+        self._tasks.append(cocotb.start_soon(self._run()))
+
+    def launch(self, program, grid, block, buffers=None, args=()):
+        """Enqueue `program` (Program, words or .s path) over `grid` threads in blocks of `block`; returns its Launch."""
+        launch = Launch(len(self.launches), program, grid, block, buffers or {}, args)
+        self.launches.append(launch)
+        self.pending.append(launch)
+        self._wake.set()
+        return launch
+
+    async def finish(self):
+        """Wait until every launch enqueued so far is done."""
+        for launch in list(self.launches):
+            await launch
+
+    def stop(self):
+        for t in self._tasks:
+            t.kill()
+        self._tasks = []
+
+    def _stage_program(self, launch):
+        self.prog_mem.stage(launch.program)
+        launch.program_staged = True
+
+    def _stage_inputs(self, launch, running=None):
+        """Write `launch`'s input buffers into data memory (while `running` runs, if given)."""
+        host = HostBuffers(self.data_mem.mem)
+        for name, (base, source) in launch.buffers.items():
+            if isinstance(source, int):
+                host.alloc(name, base, source)
+            else:
+                host.stage(name, base, source)
+        launch.host = host
+        launch.staged_early = running is not None
+
+    def _stage_next(self, running):
+        """Stage what of the next enqueued launch can be staged while `running` runs."""
+        if not self.pending:
+            return
+        launch = self.pending[0]
+        if not launch.program_staged:
+            self._stage_program(launch)
+        if launch.host is None and not launch.overlaps(running):
+            self._stage_inputs(launch, running)
+
+    async def _run(self):
+        sig = self.sig
+        dut = self.dut
+        while True: # the reset launch (empty grid) is done at once
+            await RisingEdge(dut.clk)
+            await ReadOnly()
+            if sig.kernel_done.read():
+                break
+        await RisingEdge(dut.clk)
+        while True:
+            if not self.pending:
+                self._wake.clear()
+                await self._wake.wait()
+            launch = self.pending.popleft()
+
+            # whatever couldn't be staged while the previous launch ran is written now
+            if not launch.program_staged:
+                self._stage_program(launch)
+            if launch.host is None:
+                self._stage_inputs(launch)
+            for i, arg in enumerate(launch.args):
+                self.data_mem.mem[i] = arg
+
+            # GPU is idle (kernel_done): switch programs and start the launch
+            self.prog_mem.swap()
+            dut.num_threads.value = launch.grid
+            dut.block_dim.value = launch.block
+            dut.kernel_start.value = 1
+            launch.start_cycle = self.cycle()
+            await RisingEdge(dut.clk)
+            dut.kernel_start.value = 0
+
+            while True:
+                await RisingEdge(dut.clk)
+                self._stage_next(launch)
+                await ReadOnly()
+                if sig.kernel_done.read():
+                    break
+                assert self.cycle() - launch.start_cycle < self.timeout_cycles, \
+                    f"{launch}: no kernel_done after {self.timeout_cycles} cycles"
+            launch.end_cycle = self.cycle()
+            launch.cycles = sig.kernel_cycles.read()
+            launch.resident_wave_cycles = sig.resident_wave_cycles.read()
+            launch.results = {name: launch.host.read(name) for name in launch.host.buffers}
+            await RisingEdge(dut.clk) # out of the read-only phase
+            launch._done.set()
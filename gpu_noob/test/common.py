@@ -1,3 +1,4 @@
+import os
 from enum import Enum    
 
 class SIMD_State(Enum):
@@ -38,47 +39,25 @@ class OpCode(Enum):
     CONST = 8
     RET = 63
 
-def get_state(state_type: Enum, val):
-    try:
-        v = safe_int(val)
-        if v == "X":
-            return "X"
-        
-        return state_type(v).name
-    
-    except Exception:
-        return "X"
-
-def safe_int(val):
-    try:
-        v = int(val)
-
-        if hasattr(val, 'is_resolvable') and not val.is_resolvable:
-            return "X"
-        
-        return v
-        
-    except Exception:
-        return "X"
-
-def safe_hex(val):
-    try:
-        v = hex(val)
-
-        if hasattr(val, 'is_resolvable') and not val.is_resolvable:
-            return "X"
-        
-        return v
-    
-    except Exception:
-        return "X"
-
-def signed_int(val):
-    try:
-        if hasattr(val, 'signed_integer'):
-            return val.signed_integer
-        
-        return val            
-    
-    except Exception:
-        return "X"
+def decode_fields(instr):
+    """Split an instruction word into (opcode, rd, rm, rn, imm_19) like the Decoder does."""
+    op_code = (instr >> 26) & 0x3F
+    rd = (instr >> 19) & 0x7F
+    rm = (instr >> 12) & 0x7F
+    rn = (instr >> 5) & 0x7F
+    imm_19 = instr & 0x7FFFF # {rm, rn, other}
+    if imm_19 & (1 << 18):
+        imm_19 -= 1 << 19 # sign extended into the register file
+    return op_code, rd, rm, rn, imm_19
+
+def parse_params(text):
+    """'LANE_WIDTH=8 WAVE_SIZE=64' -> {'LANE_WIDTH': 8, 'WAVE_SIZE': 64}"""
+    params = {}
+    for item in text.split():
+        name, _, value = item.partition("=")
+        params[name] = int(value, 0)
+    return params
+
+def bench_param(name, default):
+    """Parameter override the makefile passed to the simulator (PARAMS=...), else `default`."""
+    return parse_params(os.environ.get("PARAMS", "")).get(name, default)
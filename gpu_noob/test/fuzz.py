@@ -0,0 +1,350 @@
+import argparse
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from common import OpCode, decode_fields
+from assembler import encode, assemble, disassemble, IMM_MIN, IMM_MAX
+from isa_sim import IsaSimulator, PROGRAM_MEM_SIZE, R_BLOCK_IDX, R_ZERO
+from paged_memory import PagedMemory
+from regression import parse_results
+
+'''
+Constrained-random instruction fuzzer for the SIMD.
+
+Every seed becomes a random straight-line program over the whole opcode set
+plus a random wave (block/wave id, how many of its lanes exist) and a random
+data memory image. fuzz_tb.py runs it on the SIMD RTL and compares every
+retired instruction -- its register write (Rd and the value of each active
+lane) and its store (address and value of each active lane) -- in lockstep
+against the same wave run through IsaSimulator, stopping at the first
+retire that differs. The failing case is then shrunk (instructions, threads)
+while it still diverges, and written out as a kernel that reproduces it:
+
+    traces/fuzz_seed<N>.s       replay with FUZZ_REPRO=traces/fuzz_seed<N>.s
+
+The programs are valid by construction, so a divergence is an RTL (or
+model) bug rather than undefined behaviour:
+  * only R0-R25 are written (R28-R31 are read-only; R26/R27 hold the
+    constants below), and a register is only read after it is written --
+    a lane's registers carry over from one wave cycle to the next
+  * addresses are ANDed with R27 = 2**ADDR_BITS - 1 before LDUR/STUR
+  * divisors are ORed with R26 = 1 before DIV
+  * the last instruction is RET, within PROGRAM_MEM_SIZE
+
+Run many seeds across processes (the SIMD image is built once and shared):
+
+    python test/fuzz.py --seeds 4000                     # one job per core
+    python test/fuzz.py --seeds 4000 -j 8 SIM=verilator PARAMS="PIPELINED=1"
+'''
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUILD_DIR = os.path.join(ROOT, "sim_build", "fuzz")
+
+ADDR_BITS = 5 # fuzzed loads/stores stay in the first 2**ADDR_BITS words (fewer if the memory is smaller)
+R_ONE = 26
+R_ADDR_MASK = 27
+NUM_FREE_REGS = 26 # R0-R25
+
+# relative weights of the generator's instruction kinds
+WEIGHTS = {OpCode.CONST: 3, OpCode.LOAD: 3, OpCode.STORE: 3, OpCode.ADD: 2, OpCode.SUB: 2,
+           OpCode.MUL: 2, OpCode.DIV: 1, OpCode.AND: 1, OpCode.ORR: 1}
+EDGE_IMMS = [0, 1, -1, 2, IMM_MIN, IMM_MAX]
+
+# one retired instruction: Rd and the active lanes' values (rd None = no register write),
+# and the active lanes' (address, value) stores
+Retire = namedtuple("Retire", ["wave_cycle", "pc", "rd", "writes", "stores"])
+
+class FuzzCase:
+    """A program plus the wave it runs as and the data memory it starts from."""
+    def __init__(self, seed, words, block_id, wave_id, block_threads, block_dim, data, latency=1):
+        self.seed = seed
+        self.words = list(words)
+        self.block_id = block_id
+        self.wave_id = wave_id
+        self.block_threads = block_threads # num_block_threads: lanes of this wave past it are masked
+        self.block_dim = block_dim
+        self.data = [int(d) & (2**64 - 1) for d in data]
+        self.latency = latency # data memory latency (fixed, so a store's lanes land in lane order)
+
+    def replace(self, **kw):
+        fields = dict(seed=self.seed, words=self.words, block_id=self.block_id, wave_id=self.wave_id,
+                      block_threads=self.block_threads, block_dim=self.block_dim, data=self.data,
+                      latency=self.latency)
+        fields.update(kw)
+        return FuzzCase(**fields)
+
+def addr_bits(addr_width):
+    return min(ADDR_BITS, addr_width)
+
+def generate(seed, wave_size=32, addr_width=7):
+    """Random valid FuzzCase for `seed` (the same seed always gives the same case)."""
+    rng = random.Random(seed)
+    bits = addr_bits(addr_width)
+    words = [encode(OpCode.CONST.value, rd=R_ONE) | 1,
+             encode(OpCode.CONST.value, rd=R_ADDR_MASK) | (2**bits - 1)]
+    written = [] # general purpose registers holding a value
+    readable = [R_ONE, R_ADDR_MASK, 28, 29, 30, R_ZERO]
+
+    def imm():
+        r = rng.random()
+        if r < 0.25:
+            v = rng.choice(EDGE_IMMS)
+        elif r < 0.6:
+            v = rng.randint(-64, 64)
+        else:
+            v = rng.randint(IMM_MIN, IMM_MAX)
+        return v & 0x7FFFF
+
+    def src():
+        return rng.choice(written + readable)
+
+    def dst():
+        # mostly overwrite live registers, so values flow through long chains
+        if written and rng.random() < 0.6:
+            return rng.choice(written)
+        return rng.randrange(NUM_FREE_REGS)
+
+    def defined(r):
+        if r not in written:
+            written.append(r)
+
+    kinds = list(WEIGHTS)
+    weights = [WEIGHTS[k] for k in kinds]
+    length = rng.randint(4, PROGRAM_MEM_SIZE - 1)
+    while len(words) < length - 1:
+        op = rng.choices(kinds, weights)[0] if written else OpCode.CONST
+        room = length - 1 - len(words)
+        if op in (OpCode.LOAD, OpCode.STORE, OpCode.DIV) and room < 2:
+            op = OpCode.CONST
+        if op == OpCode.CONST:
+            rd = dst()
+            words.append(encode(op.value, rd=rd) | imm())
+            defined(rd)
+        elif op == OpCode.LOAD:
+            addr, rd = dst(), dst()
+            words.append(encode(OpCode.AND.value, rd=addr, rm=src(), rn=R_ADDR_MASK))
+            defined(addr)
+            words.append(encode(op.value, rd=rd, rm=addr))
+            defined(rd)
+        elif op == OpCode.STORE:
+            addr = dst()
+            words.append(encode(OpCode.AND.value, rd=addr, rm=src(), rn=R_ADDR_MASK))
+            defined(addr)
+            words.append(encode(op.value, rm=addr, rn=src()))
+        elif op == OpCode.DIV:
+            divisor, rd = dst(), dst()
+            words.append(encode(OpCode.ORR.value, rd=divisor, rm=src(), rn=R_ONE))
+            defined(divisor)
+            words.append(encode(op.value, rd=rd, rm=src(), rn=divisor))
+            defined(rd)
+        else:
+            rd = dst()
+            words.append(encode(op.value, rd=rd, rm=src(), rn=src()))
+            defined(rd)
+    words.append(encode(OpCode.RET.value))
+
+    wave_id = rng.randint(0, 3)
+    block_threads = wave_id * wave_size + (wave_size if rng.random() < 0.5 else rng.randint(1, wave_size))
+    block_dim = block_threads + rng.choice([0, 0, rng.randint(1, wave_size)])
+    data = [rng.getrandbits(64) if rng.random() < 0.7 else rng.randint(0, 2**bits - 1) for _ in range(2**bits)]
+    return FuzzCase(seed, words, rng.randint(0, 7), wave_id, block_threads, block_dim, data, rng.choice([1, 1, 3, 8]))
+
+def reads(word):
+    """Registers an instruction reads."""
+    op_code, _, rm, rn, _ = decode_fields(word)
+    if op_code == OpCode.LOAD.value:
+        return (rm,)
+    if op_code == OpCode.STORE.value:
+        return (rm, rn)
+    if OpCode.ADD.value <= op_code <= OpCode.ORR.value:
+        return (rm, rn)
+    return ()
+
+def writes(word):
+    op_code, rd, _, _, _ = decode_fields(word)
+    if op_code in (OpCode.LOAD.value, OpCode.CONST.value) or OpCode.ADD.value <= op_code <= OpCode.ORR.value:
+        return rd if rd < R_BLOCK_IDX else None
+    return None
+
+def valid(case):
+    """True if no instruction reads a general purpose register before it is written (see the module docstring)."""
+    written = set()
+    for word in case.words:
+        if any(r < R_BLOCK_IDX and r not in written for r in reads(word)):
+            return False
+        rd = writes(word)
+        if rd is not None:
+            written.add(rd)
+    return True
+
+def wave_lanes(case, wave_cycle, wave_size, lane_width):
+    """Lanes of `wave_cycle` that run a thread (the rest are masked)."""
+    wave_threads = min(max(case.block_threads - case.wave_id * wave_size, 0), wave_size)
+    lanes = np.arange(lane_width)
+    return lanes[wave_cycle * lane_width + lanes < wave_threads]
+
+def reference_trace(case, wave_size=32, lane_width=16, addr_width=7):
+    """
+    Retires of the case's wave in the SIMD's order (the whole program for
+    wave cycle 0, then for wave cycle 1, ...) and the final data memory.
+    Raises ZeroDivisionError if a DIV divides by zero.
+    """
+    isa = IsaSimulator(wave_size, lane_width, addr_width)
+    data = PagedMemory(addr_width)
+    data.load(case.data)
+    trace = []
+    for wave_cycle in range(isa.total_wave_cycles):
+        lanes = wave_lanes(case, wave_cycle, wave_size, lane_width)
+        if lanes.size == 0:
+            break # the SIMD skips wave cycles with no active lane
+
+        def retire(pc, instr, result, store):
+            rd = decode_fields(instr)[1] if result is not None else None
+            trace.append(Retire(wave_cycle, pc, rd,
+                                tuple(int(v) for v in result) if result is not None else (),
+                                tuple(zip(map(int, store[0]), map(int, store[1]))) if store is not None else ()))
+
+        thread_idx = case.wave_id * wave_size + wave_cycle * lane_width + lanes
+        isa.execute(case.words, np.full(lanes.size, case.block_id), thread_idx, case.block_dim, data, retire)
+    return trace, data
+
+def divergence(expected, actual):
+    """Message for the first retire where `actual` differs from `expected` (lists of Retire), or None."""
+    for i, (e, a) in enumerate(zip(expected, actual)):
+        if e != a:
+            return f"retire {i} differs:\n  expected {format_retire(e)}\n  RTL      {format_retire(a)}"
+    if len(actual) > len(expected):
+        return f"RTL retired {len(actual)} instructions, expected {len(expected)}: extra {format_retire(actual[len(expected)])}"
+    return None
+
+def format_retire(r):
+    text = f"wave cycle {r.wave_cycle} PC {r.pc}"
+    if r.rd is not None:
+        text += f" R{r.rd} <- [{', '.join('X' if v is None else hex(v) for v in r.writes)}]"
+    if r.stores:
+        text += f" store [{', '.join('X' if a is None or v is None else f'M[{a}]={v:#x}' for a, v in r.stores)}]"
+    return text
+
+async def minimize(case, diverges, wave_size=32, lane_width=16, addr_width=7):
+    """
+    Shrink a diverging case: drop runs of instructions (halving the run length
+    down to one) and then threads, keeping every change that is still valid
+    and for which `await diverges(case)` is still true.
+    """
+    def runnable(c):
+        if not valid(c):
+            return False
+        try:
+            reference_trace(c, wave_size, lane_width, addr_width) # no DIV by zero
+        except ZeroDivisionError:
+            return False
+        return True
+
+    chunk = max(1, (len(case.words) - 1) // 2)
+    while chunk >= 1:
+        start = len(case.words) - 1 - chunk # the RET stays
+        while start >= 0:
+            candidate = case.replace(words=case.words[:start] + case.words[start + chunk:])
+            if runnable(candidate) and await diverges(candidate):
+                case = candidate
+            start -= chunk
+        chunk //= 2
+
+    while case.block_threads > case.wave_id * wave_size + 1:
+        drop = max(1, (case.block_threads - case.wave_id * wave_size) // 2)
+        candidate = case.replace(block_threads=case.block_threads - drop, block_dim=max(case.block_dim - drop, 1))
+        if not await diverges(candidate):
+            break
+        case = candidate
+    return case
+
+def write_reproducer(case, message, path):
+    """Write `case` as a kernel (with .threads/.data and a `; fuzz:` line for the wave) that reproduces `message`."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    lines = [f"; fuzz seed {case.seed}"]
+    lines += [f"; {line}" for line in message.splitlines()]
+    lines.append(f"; fuzz: block_id={case.block_id} wave_id={case.wave_id} block_dim={case.block_dim} latency={case.latency}")
+    lines.append(f".threads {case.block_threads}")
+    for i in range(0, len(case.data), 4):
+        lines.append(".data " + " ".join(hex(v) for v in case.data[i:i + 4]))
+    lines.append(disassemble(case.words))
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+def load_reproducer(path):
+    with open(path) as f:
+        text = f.read()
+    program = assemble(text)
+    fields = dict(block_id=0, wave_id=0, block_dim=program.threads, latency=1)
+    seed = re.search(r"; fuzz seed (-?\d+)", text)
+    meta = re.search(r"; fuzz: (.*)", text)
+    if meta:
+        fields.update((k, int(v)) for k, v in (kv.split("=") for kv in meta.group(1).split()))
+    return FuzzCase(int(seed.group(1)) if seed else -1, program.words, data=program.data,
+                    block_threads=program.threads, **fields)
+
+def run_chunk(start, count, make_args, out_dir):
+    """Run seeds [start, start + count) in one simulator process; returns (start, count, passed, log)."""
+    os.makedirs(out_dir, exist_ok=True)
+    results = os.path.join(out_dir, "results.xml")
+    log_file = os.path.join(out_dir, "run.log")
+    if os.path.exists(results):
+        os.remove(results)
+    cmd = ["make", "DUT=SIMD", "TESTBENCH=fuzz_tb", f"COCOTB_RESULTS_FILE={results}"] + make_args
+    env = dict(os.environ, PWD=ROOT, FUZZ_SEED=str(start), FUZZ_SEEDS=str(count), TESTCASE="test_fuzz")
+    with open(log_file, "w") as log:
+        subprocess.run(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    tests = parse_results(results) if os.path.exists(results) else []
+    passed = bool(tests) and all(t[1] == "PASS" for t in tests)
+    return start, count, passed, log_file
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run fuzz_tb.py over many seeds in parallel, stopping at the first divergence")
+    parser.add_argument("--seeds", type=int, default=1000, help="number of seeds (default 1000)")
+    parser.add_argument("--start", type=int, default=0, help="first seed")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="simulator processes at once (default: cores)")
+    parser.add_argument("--chunk", type=int, default=None, help="seeds per simulator process (default: split evenly, at most 500)")
+    parser.add_argument("make_args", nargs="*", help="extra VAR=value arguments passed to make")
+    args = parser.parse_args()
+
+    jobs = max(1, args.jobs)
+    # each process pays for make and simulator startup once; capped so a divergence stops the run early
+    chunk = args.chunk or max(1, min(500, -(-args.seeds // jobs)))
+    chunks = [(s, min(chunk, args.start + args.seeds - s)) for s in range(args.start, args.start + args.seeds, chunk)]
+
+    # build the image once up front instead of in every job
+    env = dict(os.environ, PWD=ROOT)
+    if subprocess.run(["make", "DUT=SIMD", "TESTBENCH=fuzz_tb", "sim_image"] + args.make_args, cwd=ROOT, env=env).returncode:
+        raise SystemExit("building the SIMD image failed")
+
+    start_time = time.perf_counter()
+    done = 0
+    failed = []
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending = {pool.submit(run_chunk, s, n, args.make_args, os.path.join(BUILD_DIR, str(s))) for s, n in chunks}
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in finished:
+                s, n, passed, log = f.result()
+                if passed:
+                    done += n
+                else:
+                    failed.append((s, n, log))
+            if failed:
+                # stop at the first divergence: drop the chunks that haven't started
+                for f in pending:
+                    f.cancel()
+                pending = {f for f in pending if not f.cancelled()}
+    wall = time.perf_counter() - start_time
+
+    print(f"{done} seeds passed in {wall:.1f} s ({done / max(wall, 1e-9):.0f} seeds/s, {jobs} jobs)")
+    for s, n, log in sorted(failed):
+        print(f"FAIL seeds {s}-{s + n - 1}: see {log} (reproducer in traces/fuzz_seed<N>.s)", file=sys.stderr)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,147 @@
+import os
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, ReadOnly, Timer
+from common import *
+from fuzz import Retire, generate, reference_trace, divergence, minimize, write_reproducer, load_reproducer
+from memory import ProgramMemoryModel, DataMemoryModel, set_lanes
+from signals import Signals
+from trace_recorder import TraceRecorder, TRACE_DIR, dump_on_failure
+
+TOPLEVEL = "SIMD" # module this bench drives (DUT=...)
+
+WAVE_SIZE = bench_param("WAVE_SIZE", 32)
+LANE_WIDTH = bench_param("LANE_WIDTH", 16)
+ADDR_WIDTH = bench_param("DATA_MEM_ADDR_WIDTH", 7)
+# seeds [FUZZ_SEED, FUZZ_SEED + FUZZ_SEEDS) -- read from the environment rather than PARAMS
+# so every seed range runs on the same cached image (test/fuzz.py spreads ranges over processes)
+FUZZ_SEED = int(os.environ.get("FUZZ_SEED", 0))
+FUZZ_SEEDS = int(os.environ.get("FUZZ_SEEDS", 25))
+FUZZ_REPRO = os.environ.get("FUZZ_REPRO") # replay one reproducer .s instead
+MAX_CYCLES = 20000 # a case that hasn't finished by then is a hang
+
+# signals kept in the trace of a minimized failing case
+TRACE_SIGNALS = [
+    "rst", "instruction", "curr_pc", "op_code", "simd_state", "curr_wave_cycle",
+    "fetcher_state", "next_instruction", "issue", "simd_done",
+    "rd", "rm", "rn", "REG_WRITE", "MEM_READ", "MEM_WRITE", "lane_active",
+    "lsu_state[]", "rm_data[]", "rn_data[]", "alu_out[]", "mem_addr[]", "mem_write_data[]",
+]
+
+def sample_retire(sig):
+    """The instruction retiring this clock (SIMD_UPDATE) as a Retire, X values as None."""
+    lanes = list(set_lanes(sig.lane_active.bits()))
+    rd = sig.rd.read()
+    writes = ()
+    if sig.REG_WRITE.read() and rd is not None and rd < 28: # RegisterFile drops writes to R28-R31
+        values, xmask = sig.reg_write_data.read()
+        writes = tuple(None if xmask[l] else int(values[l]) for l in lanes)
+    else:
+        rd = None
+    stores = ()
+    if sig.MEM_WRITE.read():
+        addrs, addr_x = sig.mem_addr.read()
+        data, data_x = sig.mem_write_data.read()
+        stores = tuple((None if addr_x[l] else int(addrs[l]), None if data_x[l] else int(data[l])) for l in lanes)
+    return Retire(sig.curr_wave_cycle.read(), sig.curr_pc.read(), rd, writes, stores)
+
+async def run_case(dut, case, name=None):
+    """
+    Run `case` as slot 0's only wave, comparing each retire with the ISA model
+    as it happens; returns the first divergence (message) or None.
+    `name` records a trace of the run (dumped if the test fails).
+    """
+    sig = Signals(dut)
+    expected, golden = reference_trace(case, WAVE_SIZE, LANE_WIDTH, ADDR_WIDTH)
+    prog_mem = ProgramMemoryModel(dut)
+    prog_mem.load(case.words)
+    data_mem = DataMemoryModel(dut, ADDR_WIDTH, latency=case.latency)
+    data_mem.mem.load(case.data)
+    models = [prog_mem, data_mem]
+    if name:
+        models.append(TraceRecorder(dut, TRACE_SIGNALS, name=name))
+    tasks = [cocotb.start_soon(m.run()) for m in models]
+
+    dut.rst.value = 1
+    dut.enable.value = 1
+    dut.perf_addr.value = 0
+    dut.simd_start.value = 0
+    await Timer(20, units="ns")
+    dut.rst.value = 0
+    await RisingEdge(dut.clk)
+    dut.num_threads.value = case.block_threads
+    dut.block_dim.value = case.block_dim
+    dut.block_id.value = case.block_id
+    dut.wave_id.value = case.wave_id
+    dut.num_block_threads.value = case.block_threads
+    dut.simd_ready.value = 0
+    dut.simd_working.value = 1
+    dut.simd_start.value = 1
+    await RisingEdge(dut.clk)
+    dut.simd_start.value = 0
+
+    # lockstep: every retire is checked as it happens, so a divergence stops the run there
+    actual = []
+    message = None
+    for cycle in range(MAX_CYCLES):
+        await RisingEdge(dut.clk)
+        await ReadOnly()
+        if sig.simd_state.read() == SIMD_State.UPDATE.value:
+            actual.append(sample_retire(sig))
+            if len(actual) > len(expected) or actual[-1] != expected[len(actual) - 1]:
+                message = divergence(expected, actual)
+                break
+        if sig.simd_done.bit(0):
+            if len(actual) < len(expected):
+                message = f"RTL finished after {len(actual)} retires, expected {len(expected)}"
+            break
+    else:
+        message = f"no simd_done after {MAX_CYCLES} cycles ({len(actual)} of {len(expected)} instructions retired)"
+
+    if message is None:
+        mismatch = data_mem.mem.diff(golden, limit=1)
+        if mismatch:
+            a = mismatch[0]
+            message = f"data memory M[{a}] = {data_mem.mem[a]:#x} after the kernel, ISA model has {golden[a]:#x}"
+
+    await RisingEdge(dut.clk) # out of the read-only phase
+    for t in tasks:
+        t.kill()
+    return message
+
+async def report_divergence(dut, case, message):
+    """Shrink the failing case, write its reproducer and a trace of it, and fail."""
+    async def diverges(candidate):
+        return await run_case(dut, candidate) is not None
+
+    dut._log.info(f"seed {case.seed} diverges with {len(case.words)} instructions, shrinking")
+    small = await minimize(case, diverges, WAVE_SIZE, LANE_WIDTH, ADDR_WIDTH)
+    small_message = await run_case(dut, small, name=f"fuzz_seed{case.seed}")
+    path = write_reproducer(small, small_message, os.path.join(TRACE_DIR, f"fuzz_seed{case.seed}.s"))
+    assert False, (f"seed {case.seed}: {message}\n"
+                   f"minimized to {len(small.words)} instructions, {small.block_threads - small.wave_id * WAVE_SIZE} "
+                   f"threads: {small_message}\nreproducer: {path} (replay with FUZZ_REPRO={path})")
+
+@cocotb.test(skip=FUZZ_REPRO is not None)
+@dump_on_failure
+async def test_fuzz(dut):
+    """Random valid programs over seeds [FUZZ_SEED, FUZZ_SEED + FUZZ_SEEDS), retire by retire against the ISA model."""
+    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+    instructions = 0
+    for seed in range(FUZZ_SEED, FUZZ_SEED + FUZZ_SEEDS):
+        case = generate(seed, WAVE_SIZE, ADDR_WIDTH)
+        message = await run_case(dut, case)
+        if message is not None:
+            await report_divergence(dut, case, message)
+        instructions += len(case.words)
+    dut._log.info(f"seeds {FUZZ_SEED}-{FUZZ_SEED + FUZZ_SEEDS - 1}: {FUZZ_SEEDS} programs ({instructions} instructions) "
+                  f"match the ISA model retire by retire")
+
+@cocotb.test(skip=FUZZ_REPRO is None)
+@dump_on_failure
+async def test_fuzz_repro(dut):
+    """Replay a reproducer written by test_fuzz (FUZZ_REPRO=traces/fuzz_seed<N>.s), with a trace."""
+    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+    case = load_reproducer(FUZZ_REPRO)
+    message = await run_case(dut, case, name=f"fuzz_repro_seed{case.seed}")
+    assert message is None, f"{FUZZ_REPRO}: {message}"
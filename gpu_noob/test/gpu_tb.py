@@ -0,0 +1,208 @@
+import os
+import time
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, ReadOnly, Timer
+from cocotb.utils import get_sim_time
+from common import bench_param
+from signals import Signals
+from isa_sim import IsaSimulator
+from assembler import assemble_file, KERNEL_DIR
+from memory import ProgramMemoryModel, LineMemoryModel
+from paged_memory import PagedMemory
+from command_queue import CommandQueue
+from perf import read_perf_counters
+from benchmarks import select, mask_mem, ARRAY_BASE
+from trace_recorder import TraceRecorder, dump_on_failure
+
+TOPLEVEL = "GPU" # module this bench drives (DUT=...)
+
+NUM_CORES = bench_param("NUM_CORES", 4)
+NUM_SIMDS = bench_param("NUM_SIMDS", 2)
+WAVE_SIZE = bench_param("WAVE_SIZE", 32)
+LANE_WIDTH = bench_param("LANE_WIDTH", 16)
+ADDR_WIDTH = bench_param("DATA_MEM_ADDR_WIDTH", 7)
+LINE_WORDS = bench_param("LINE_WORDS", 4)
+WAVE_SLOTS = bench_param("WAVE_SLOTS", 1)
+BLOCK_SLOTS = bench_param("BLOCK_SLOTS", 1) # resident blocks per CU
+CLOCK_PERIOD = 10 # ns
+TIMEOUT_CYCLES = 200000
+
+TRACE_SIGNALS = [
+    "rst", "kernel_done", "kernel_cycles", "resident_wave_cycles", "prog_mem_read_valid", "prog_mem_read_ack", "prog_mem_addr",
+    "mem_read_valid", "mem_write_valid", "mem_read_ack", "mem_write_ack", "mem_addr", "mem_write_mask",
+]
+
+# --- Whole-chip launches ---
+# BlockDispatch -> NUM_CORES ComputeUnits (WaveDispatch, NUM_SIMDS SIMDs, shared
+# instruction cache, coalescing memory controller) -> arbitrated program and
+# data memory. Each launch starts from reset and ends at kernel_done.
+
+async def launch(dut, program, num_threads, block_dim, init, name, latency=1):
+    """Run one kernel launch on the GPU; returns (cycles, data memory model, program memory model)."""
+    trace = TraceRecorder(dut, TRACE_SIGNALS, name=name)
+    prog_mem = ProgramMemoryModel(dut)
+    prog_mem.load(program)
+    data_mem = LineMemoryModel(dut, ADDR_WIDTH, LINE_WORDS, latency)
+    data_mem.mem[:len(init)] = init
+    tasks = [cocotb.start_soon(m.run()) for m in (trace, prog_mem, data_mem)]
+
+    sig = Signals(dut)
+    dut.rst.value = 1
+    dut.enable.value = 1
+    dut.num_threads.value = num_threads
+    dut.block_dim.value = block_dim
+    dut.kernel_start.value = 0
+    dut.perf_simd.value = 0
+    dut.perf_addr.value = 0
+    await Timer(2 * CLOCK_PERIOD, units="ns")
+    dut.rst.value = 0
+
+    start = get_sim_time("ns")
+    while True:
+        await RisingEdge(dut.clk)
+        await ReadOnly()
+        if sig.kernel_done.read():
+            break
+        cycles = int(get_sim_time("ns") - start) // CLOCK_PERIOD
+        assert cycles < TIMEOUT_CYCLES, f"{name}: no kernel_done after {cycles} cycles"
+    cycles = int(get_sim_time("ns") - start) // CLOCK_PERIOD
+    await RisingEdge(dut.clk)
+    for t in tasks:
+        t.kill()
+    return cycles, data_mem, prog_mem
+
+async def read_chip_counters(dut):
+    """Retired instructions and active lanes summed over every SIMD."""
+    retired = lane_active = 0
+    for simd in range(NUM_CORES * NUM_SIMDS):
+        dut.perf_simd.value = simd
+        perf = await read_perf_counters(dut, LANE_WIDTH)
+        retired += perf.retired
+        lane_active += perf.lane_active
+    return retired, lane_active
+
+def occupancy(dut):
+    """Achieved occupancy of the last launch: mean fraction of the chip's wave slots holding a wave."""
+    sig = Signals(dut)
+    slots = NUM_CORES * NUM_SIMDS * WAVE_SLOTS
+    return sig.resident_wave_cycles.read() / (sig.kernel_cycles.read() * slots)
+
+def check(name, data_mem, golden):
+    mismatch = data_mem.mem.diff(golden, limit=1)
+    assert not mismatch, f"{name}: M[{mismatch[0]}] differs from ISA model: {data_mem.mem[mismatch[0]]} vs {golden[mismatch[0]]}"
+
+@cocotb.test()
+@dump_on_failure
+async def test_gpu_benchmarks(dut):
+    """Run the benchmarks.py suite on the whole chip and report kernel cycles."""
+    cocotb.start_soon(Clock(dut.clk, CLOCK_PERIOD, units="ns").start())
+    isa = IsaSimulator(WAVE_SIZE, LANE_WIDTH, ADDR_WIDTH)
+
+    lines = [f"{'benchmark':<18} {'threads':>7} {'block':>5} {'blocks':>6} {'cycles':>7} {'retired':>7} {'IPC':>6} "
+             f"{'thr IPC':>7} {'mem txn':>7} {'fetches':>7} {'wall s':>7}"]
+    benches = select(os.environ.get("BENCH"))
+    for bench in benches:
+        program = assemble_file(bench.kernel)
+        init = bench.init(bench.num_threads)
+        wall = time.perf_counter()
+        cycles, data_mem, prog_mem = await launch(dut, program, bench.num_threads, bench.block_dim, init, bench.name)
+        wall = time.perf_counter() - wall
+        retired, lane_active = await read_chip_counters(dut)
+
+        golden = isa.run(program, bench.num_threads, bench.block_dim, init)
+        check(bench.name, data_mem, golden)
+        blocks = (bench.num_threads + bench.block_dim - 1) // bench.block_dim
+        lines.append(f"{bench.name:<18} {bench.num_threads:>7} {bench.block_dim:>5} {blocks:>6} {cycles:>7} {retired:>7} "
+                     f"{retired / cycles:>6.3f} {lane_active / cycles:>7.2f} {data_mem.transactions:>7} "
+                     f"{prog_mem.reads:>7} {wall:>7.2f}")
+    dut._log.info(f"{NUM_CORES} CUs x {NUM_SIMDS} SIMDs, kernel cycles from reset to kernel_done:\n" + "\n".join(lines))
+
+@cocotb.test()
+@dump_on_failure
+async def test_gpu_many_blocks(dut):
+    """
+    mask.s over the largest grid of one-wave blocks that fits data memory
+    (3 blocks with 7-bit addresses, 31 with PARAMS="DATA_MEM_ADDR_WIDTH=10"):
+    the blocks spread over the CUs, and every CU runs up to BLOCK_SLOTS
+    blocks at a time (one wave each, so one block leaves a SIMD idle).
+    """
+    cocotb.start_soon(Clock(dut.clk, CLOCK_PERIOD, units="ns").start())
+    program = assemble_file(os.path.join(KERNEL_DIR, "mask.s"))
+    num_threads = (2**ADDR_WIDTH - ARRAY_BASE) // WAVE_SIZE * WAVE_SIZE
+    block_dim = WAVE_SIZE
+    init = mask_mem(num_threads)
+
+    cycles, data_mem, prog_mem = await launch(dut, program, num_threads, block_dim, init, "gpu_many_blocks", latency=4)
+    golden = IsaSimulator(WAVE_SIZE, LANE_WIDTH, ADDR_WIDTH).run(program, num_threads, block_dim, init)
+    check("mask", data_mem, golden)
+
+    blocks = num_threads // block_dim
+    assert prog_mem.reads <= NUM_CORES * len(program), \
+        f"{prog_mem.reads} program memory reads: each CU's cache should fetch an instruction at most once"
+    achieved = occupancy(dut)
+    assert 0 < achieved <= 1, f"achieved occupancy {achieved} out of range"
+    dut._log.info(f"mask.s, {blocks} blocks of {block_dim} threads on {NUM_CORES} CUs ({BLOCK_SLOTS} block slots each), "
+                  f"4-cycle data memory: {cycles} cycles ({cycles / blocks:.1f} per block), achieved occupancy {achieved:.1%}, "
+                  f"{data_mem.transactions} line transactions, {prog_mem.reads} program memory reads")
+
+# --- Launch queue ---
+# Many small kernels in a row through command_queue.CommandQueue: one reset,
+# then every launch starts with kernel_start as soon as the last is done.
+
+@cocotb.test()
+@dump_on_failure
+async def test_gpu_launch_queue(dut):
+    """
+    Six small launches back to back without a reset, some chained on the
+    results of earlier ones: each launch's buffers match a sequential run of
+    the ISA model, the next launch starts within a few cycles of the last
+    one's kernel_done, and inputs that don't overlap the running launch are
+    staged while it runs.
+    """
+    cocotb.start_soon(Clock(dut.clk, CLOCK_PERIOD, units="ns").start())
+    queue = CommandQueue(dut, ADDR_WIDTH, LINE_WORDS, clock_period=CLOCK_PERIOD, timeout_cycles=TIMEOUT_CYCLES)
+    await queue.start()
+    n = 16 # threads per launch
+    block = min(WAVE_SIZE, n // 2) # 2 blocks each
+    ramp = [i + 1 for i in range(n)]
+    down = [n - i for i in range(n)]
+    kernel = lambda name: os.path.join(KERNEL_DIR, name)
+
+    # (kernel, buffers, args, inputs staged during the previous launch)
+    plan = [
+        ("vector_mul.s", {"A": (4, ramp), "B": (20, down), "C": (36, n)}, [4, 20, 36], False),
+        ("saxpy.s", {"X": (52, ramp), "Y": (68, [100 * i for i in range(n)])}, [52, 68, 3], True),
+        ("mask.s", {"A": (36, n)}, [36, 0x5A], True), # in place over launch 0's C
+        ("vector_mul.s", {"A": (84, down), "B": (100, ramp), "C": (4, n)}, [84, 100, 4], True),
+        ("saxpy.s", {"X": (84, [7 * i for i in range(n)]), "Y": (68, n)}, [84, 68, 5], False), # X overwrites launch 3's A
+        ("mask.s", {"A": (68, n)}, [68, 0xF0F], True),
+    ]
+    runs = [queue.launch(kernel(name), n, block, buffers, args) for name, buffers, args, _ in plan]
+    await queue.finish()
+
+    # golden: the same launches one after another on the ISA model
+    isa = IsaSimulator(WAVE_SIZE, LANE_WIDTH, ADDR_WIDTH)
+    golden = PagedMemory(ADDR_WIDTH)
+    for run, (name, buffers, args, early) in zip(runs, plan):
+        for base, source in buffers.values():
+            if not isinstance(source, int):
+                golden[base:base + len(source)] = source
+        golden[:len(args)] = args
+        golden = isa.run(assemble_file(kernel(name)), n, block, golden)
+        for buf, (base, source) in buffers.items():
+            size = source if isinstance(source, int) else len(source)
+            expected = golden.read(base, size)
+            assert (run.read(buf) == expected).all(), \
+                f"launch {run.index} ({name}) {buf}: {run.read(buf).tolist()} vs ISA model {expected.tolist()}"
+        assert run.staged_early == early, f"launch {run.index} ({name}): inputs staged early = {run.staged_early}, expected {early}"
+    check("launch queue", queue.data_mem, golden)
+
+    gaps = [b.start_cycle - a.end_cycle for a, b in zip(runs, runs[1:])]
+    assert max(gaps) <= 3, f"cycles between kernel_done and the next launch: {gaps}"
+    total = runs[-1].end_cycle - runs[0].start_cycle
+    busy = sum(run.cycles for run in runs)
+    queue.stop()
+    await RisingEdge(dut.clk)
+    dut._log.info(f"{len(runs)} launches of {n} threads back to back: {total} cycles, {busy} in kernels "
+                  f"({[run.cycles for run in runs]}), gaps {gaps}, one reset")
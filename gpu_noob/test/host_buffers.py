@@ -0,0 +1,112 @@
+import os
+import numpy as np
+from paged_memory import PagedMemory
+
+'''
+Host-side buffers for staging kernel inputs and collecting results.
+
+Inputs come from .npy files, raw binary files or arrays. Files are opened
+with np.memmap in copy-on-write mode and mapped page by page into a
+PagedMemory (PagedMemory.map), so a dataset is never copied element by
+element and the kernel's stores never touch the file on disk:
+
+    host = HostBuffers(data_mem.mem)
+    host.stage("X", 0x4000_0000, "x.npy")
+    host.stage("Y", 0x8000_0000, "y.bin", dtype=np.int64)
+    host.alloc("out", 0xC000_0000, n)
+    ... run the kernel ...
+    host.save("out", "out.npy")
+    host.check("Y", expected)      # vectorized, reports the first mismatches
+
+Words are 64 bits: int64/uint64 inputs are shared with the file, other
+dtypes are converted (one vectorized copy) on the way in. Arrays passed in
+directly are always copied, so the kernel's stores never reach them either.
+'''
+
+class HostBuffer:
+    def __init__(self, name, base, size, source=None):
+        self.name = name
+        self.base = base
+        self.size = size # words
+        self.source = source # path it was staged from, if any
+
+    @property
+    def end(self):
+        return self.base + self.size
+
+    def __repr__(self):
+        return f"HostBuffer({self.name!r}, base={self.base:#x}, size={self.size})"
+
+def open_array(source, dtype=None, offset=0, count=-1):
+    """
+    Flat array for `source`: an array as is, a .npy file, or a raw binary file
+    of `dtype` (default uint64) starting `offset` bytes in. Files are mapped
+    copy-on-write, not read.
+    """
+    if not isinstance(source, (str, os.PathLike)):
+        return np.asarray(source).ravel()
+    if str(source).endswith(".npy"):
+        array = np.load(source, mmap_mode="c")
+        if offset or count >= 0:
+            raise ValueError(".npy files carry their own layout; offset/count are for raw files")
+        return array.ravel()
+    dtype = np.dtype(dtype or np.uint64)
+    if count < 0:
+        count = (os.path.getsize(source) - offset) // dtype.itemsize
+    return np.memmap(source, dtype=dtype, mode="c", offset=offset, shape=(count,))
+
+class HostBuffers:
+    def __init__(self, mem: PagedMemory):
+        self.mem = mem
+        self.buffers = {}
+
+    def _add(self, buf):
+        if buf.name in self.buffers:
+            raise ValueError(f"buffer {buf.name!r} already exists")
+        if buf.base < 0 or buf.end > self.mem.size:
+            raise ValueError(f"{buf} does not fit a {self.mem.addr_width}-bit address space")
+        for other in self.buffers.values():
+            if buf.base < other.end and other.base < buf.end:
+                raise ValueError(f"{buf} overlaps {other}")
+        self.buffers[buf.name] = buf
+        return buf
+
+    def stage(self, name, base, source, dtype=None, offset=0, count=-1):
+        """Map `source` (see open_array) into data memory at `base`; returns the HostBuffer."""
+        array = open_array(source, dtype, offset, count)
+        buf = self._add(HostBuffer(name, base, array.size, source if isinstance(source, (str, os.PathLike)) else None))
+        self.mem.map(base, array)
+        return buf
+
+    def alloc(self, name, base, size):
+        """Reserve a result region without staging anything (pages appear when the kernel stores)."""
+        return self._add(HostBuffer(name, base, size))
+
+    def read(self, name, dtype=np.uint64):
+        """Current contents of a buffer (a copy, one slice per page)."""
+        buf = self.buffers[name]
+        return self.mem.read(buf.base, buf.size).view(dtype)
+
+    def save(self, name, path, dtype=np.uint64):
+        """Write a buffer to a .npy file, streaming it page by page into a memory-mapped output."""
+        buf = self.buffers[name]
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(buf.size,))
+        words = out.view(np.uint64)
+        step = self.mem.page_words
+        for pos in range(0, buf.size, step):
+            words[pos:pos + step] = self.mem.read(buf.base + pos, min(step, buf.size - pos))
+        out.flush()
+        del out
+        return path
+
+    def check(self, name, expected, max_report=8):
+        """Assert a buffer equals `expected` (array-like or path), listing the first mismatches."""
+        buf = self.buffers[name]
+        expected = open_array(expected)
+        if expected.size != buf.size:
+            raise AssertionError(f"{name}: expected {expected.size} words, buffer has {buf.size}")
+        actual = self.read(name, np.int64 if expected.dtype.kind == "i" else np.uint64)
+        bad = np.flatnonzero(actual != expected)
+        if bad.size:
+            lines = [f"  M[{buf.base + i:#x}] ({name}[{i}]): {actual[i]} vs {expected[i]}" for i in bad[:max_report]]
+            raise AssertionError(f"{name}: {bad.size} of {buf.size} words differ\n" + "\n".join(lines))
@@ -0,0 +1,148 @@
+import os
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, ReadOnly, Timer
+from cocotb.utils import get_sim_time
+from common import bench_param
+from signals import Signals
+from assembler import assemble_file, KERNEL_DIR
+from memory import ProgramMemoryModel
+from trace_recorder import TraceRecorder, dump_on_failure
+
+TOPLEVEL = "InstructionCache" # module this bench drives (DUT=...)
+
+NUM_CLIENTS = bench_param("NUM_CLIENTS", 2)
+NUM_LINES = bench_param("NUM_LINES", 16)
+CLOCK_PERIOD = 10 # ns
+FETCH_LATENCY = 8 # program memory latency for the replay test
+
+PROGRAM = assemble_file(os.path.join(KERNEL_DIR, "vector_add.s"))
+
+TRACE_SIGNALS = [
+    "rst", "invalidate", "read_valid", "read_ack", "read_addr[]", "read_data[]",
+    "prog_mem_read_valid", "prog_mem_read_ack", "prog_mem_addr", "fill_state", "hits", "misses",
+]
+
+class Fetchers:
+    """Plays NUM_CLIENTS Fetchers: raise read_valid, hold it until read_ack, drop it."""
+    def __init__(self, dut):
+        self.dut = dut
+        self.sig = Signals(dut)
+        self.valid = 0
+
+    def _drive(self, client, on):
+        if on:
+            self.valid |= 1 << client
+        else:
+            self.valid &= ~(1 << client)
+        self.sig.read_valid.write(self.valid)
+
+    async def fetch(self, client, addr):
+        self.sig.read_addr[client].write(addr)
+        self._drive(client, True)
+        while True:
+            await RisingEdge(self.dut.clk)
+            await ReadOnly()
+            if self.sig.read_ack.bit(client):
+                break
+        data = self.sig.read_data[client].read()
+        await RisingEdge(self.dut.clk)
+        self._drive(client, False)
+        await RisingEdge(self.dut.clk) # let ack drop before the next request
+        return data
+
+    async def stream(self, client, addrs):
+        for addr in addrs:
+            data = await self.fetch(client, addr)
+            assert data == PROGRAM[addr], f"client {client}: PC {addr} read {data:#x}, expected {PROGRAM[addr]:#x}"
+
+async def setup(dut, name, latency=1):
+    cocotb.start_soon(Clock(dut.clk, CLOCK_PERIOD, units="ns").start())
+    trace = TraceRecorder(dut, TRACE_SIGNALS, name=name)
+    cocotb.start_soon(trace.run())
+    prog_mem = ProgramMemoryModel(dut, latency=latency)
+    prog_mem.load(PROGRAM)
+    cocotb.start_soon(prog_mem.run())
+    await reset(dut)
+    return prog_mem
+
+async def reset(dut):
+    dut.rst.value = 1
+    dut.enable.value = 1
+    dut.invalidate.value = 0
+    dut.read_valid.value = 0
+    await Timer(2 * CLOCK_PERIOD, units="ns")
+    dut.rst.value = 0
+    await RisingEdge(dut.clk)
+
+@cocotb.test()
+@dump_on_failure
+async def test_icache_hits_and_misses(dut):
+    """Cold misses, then hits, then misses again after invalidate."""
+    prog_mem = await setup(dut, "icache_hits_and_misses")
+    sig = Signals(dut)
+    fetchers = Fetchers(dut)
+    n = min(len(PROGRAM), NUM_LINES)
+
+    await fetchers.stream(0, range(n))
+    assert (sig.hits.read(), sig.misses.read()) == (0, n), f"cold pass: {sig.hits.read()} hits, {sig.misses.read()} misses"
+    await fetchers.stream(0, range(n))
+    assert (sig.hits.read(), sig.misses.read()) == (n, n), f"warm pass: {sig.hits.read()} hits, {sig.misses.read()} misses"
+    assert prog_mem.reads == n, f"hits should not reach program memory ({prog_mem.reads} reads for {n} lines)"
+
+    dut.invalidate.value = 1
+    await RisingEdge(dut.clk)
+    dut.invalidate.value = 0
+    await fetchers.stream(0, [0])
+    assert sig.misses.read() == n + 1, "fetch after invalidate should miss"
+    assert prog_mem.reads == n + 1
+
+@cocotb.test()
+@dump_on_failure
+async def test_icache_shared_clients(dut):
+    """Clients fetching the same stream share the fills: program memory sees each line once."""
+    prog_mem = await setup(dut, "icache_shared_clients")
+    sig = Signals(dut)
+    fetchers = Fetchers(dut)
+    n = min(len(PROGRAM), NUM_LINES)
+
+    tasks = [cocotb.start_soon(fetchers.stream(c, range(n))) for c in range(NUM_CLIENTS)]
+    for t in tasks:
+        await t
+    assert prog_mem.reads == n, f"{NUM_CLIENTS} clients fetching {n} lines made {prog_mem.reads} program memory reads"
+    assert sig.hits.read() + sig.misses.read() == NUM_CLIENTS * n, "every request counts once as a hit or a miss"
+
+async def replay(dut, fetchers, passes):
+    """Every client fetches the program `passes` times (once per wave cycle); returns cycles."""
+    start = get_sim_time("ns")
+    tasks = [cocotb.start_soon(fetchers.stream(c, list(range(len(PROGRAM))) * passes)) for c in range(NUM_CLIENTS)]
+    for t in tasks:
+        await t
+    return int(get_sim_time("ns") - start) // CLOCK_PERIOD
+
+@cocotb.test()
+@dump_on_failure
+async def test_icache_fetch_latency(dut):
+    """
+    Replay the vector_add fetch stream of NUM_CLIENTS SIMDs (two wave cycles
+    each) against a FETCH_LATENCY-cycle program memory, with the cache held
+    invalid (every fetch goes to memory) and then enabled.
+    """
+    prog_mem = await setup(dut, "icache_fetch_latency", FETCH_LATENCY)
+    fetchers = Fetchers(dut)
+
+    dut.invalidate.value = 1
+    uncached = await replay(dut, fetchers, 2)
+    uncached_reads = prog_mem.reads
+
+    dut.invalidate.value = 0
+    await reset(dut)
+    prog_mem.reads = 0
+    cached = await replay(dut, fetchers, 2)
+
+    dut._log.info(f"{NUM_CLIENTS} clients x {2 * len(PROGRAM)} fetches, {FETCH_LATENCY}-cycle program memory: "
+                  f"{uncached} cycles / {uncached_reads} reads uncached, {cached} cycles / {prog_mem.reads} reads cached "
+                  f"({uncached - cached} cycles saved)")
+    if NUM_LINES >= len(PROGRAM):
+        assert prog_mem.reads == len(PROGRAM), f"expected one read per instruction, got {prog_mem.reads}"
+    assert cached < uncached, f"cache should save cycles ({cached} vs {uncached})"
@@ -0,0 +1,169 @@
+import numpy as np
+from common import OpCode, decode_fields
+from paged_memory import PagedMemory
+
+'''
+Functional (untimed) model of the noob ISA.
+
+Every thread of the grid runs in lockstep as one NumPy lane, so a kernel over
+thousands of threads costs one array op per instruction instead of thousands
+of simulated cycles. Threads are enumerated the same way the RTL dispatches
+them (block -> wave -> wave cycle -> lane), leaving out the lanes the SIMD
+masks (threadIdx past the block's thread count), and R28-R31 are set up the
+same way RegisterFile does, so the memory image matches the SIMD bench for
+kernels whose threads don't race on memory.
+'''
+
+WAVE_SIZE = 32
+LANE_WIDTH = 16
+ADDR_WIDTH = 7
+NUM_REGISTERS = 32
+PROGRAM_MEM_SIZE = 64
+
+# read-only registers
+R_BLOCK_IDX = 28
+R_BLOCK_DIM = 29
+R_THREAD_IDX = 30
+R_ZERO = 31
+
+class IsaSimulator:
+    def __init__(self, wave_size=WAVE_SIZE, lane_width=LANE_WIDTH, addr_width=ADDR_WIDTH):
+        self.wave_size = wave_size
+        self.lane_width = lane_width
+        self.addr_width = addr_width
+        self.total_wave_cycles = (wave_size + lane_width - 1) // lane_width
+
+        # state of the last launch (kept around for debugging)
+        self.regs = None
+        self.block_idx = None
+        self.thread_idx = None
+        self.retired = 0
+
+    def block_threads(self, block_id, num_threads, block_dim):
+        """Number of threads WaveDispatch computes for a block (num_actual_block_threads)."""
+        num_blocks = (num_threads + block_dim - 1) // block_dim
+        remainder = num_threads % block_dim
+        if block_id == num_blocks - 1:
+            return block_dim if remainder == 0 else remainder
+        return block_dim
+
+    def threads(self, num_threads, block_dim):
+        """(blockIdx, threadIdx) of every thread the RTL runs (unmasked lanes), in dispatch order."""
+        num_blocks = (num_threads + block_dim - 1) // block_dim
+        block_ids = []
+        thread_ids = []
+        # threadIdx = wave_id * wave_size + (wave_cycle * lane_width + lane_id)
+        cycle_lane = (np.arange(self.total_wave_cycles)[:, None] * self.lane_width
+                      + np.arange(self.lane_width)[None, :]).ravel()
+        cycle_lane = cycle_lane[cycle_lane < self.wave_size]
+        for block_id in range(num_blocks):
+            block_threads = self.block_threads(block_id, num_threads, block_dim)
+            num_waves = (block_threads + self.wave_size - 1) // self.wave_size
+            tids = (np.arange(num_waves)[:, None] * self.wave_size + cycle_lane[None, :]).ravel()
+            tids = tids[tids < block_threads]
+            block_ids.append(np.full(tids.size, block_id, dtype=np.uint64))
+            thread_ids.append(tids.astype(np.uint64))
+
+        if not block_ids:
+            return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint64)
+        return np.concatenate(block_ids), np.concatenate(thread_ids)
+
+    def read_reg(self, r, block_dim):
+        if r < R_BLOCK_IDX:
+            return self.regs[r]
+        if r == R_BLOCK_IDX:
+            return self.block_idx
+        if r == R_BLOCK_DIM:
+            return np.full(self.block_idx.size, block_dim, dtype=np.uint64)
+        if r == R_THREAD_IDX:
+            return self.thread_idx
+        if r == R_ZERO:
+            return np.zeros(self.block_idx.size, dtype=np.uint64)
+        raise ValueError(f"R{r} does not exist (only {NUM_REGISTERS} registers per lane)")
+
+    def run(self, program, num_threads, block_dim, mem):
+        """
+        Run `program` (list of instruction words) over the whole grid.
+        `mem` is the initial data memory: a PagedMemory (not modified) or an
+        array-like image from address 0. Returns the final image as a PagedMemory.
+        """
+        data = PagedMemory(self.addr_width)
+        data.load(mem) # addresses wrap at ADDR_WIDTH bits like mem_addr
+
+        block_idx, thread_idx = self.threads(num_threads, block_dim)
+        return self.execute(program, block_idx, thread_idx, block_dim, data)
+
+    def execute(self, program, block_idx, thread_idx, block_dim, data, on_retire=None):
+        """
+        Run `program` over the given threads (arrays of blockIdx/threadIdx, one
+        lane each, all starting with zeroed registers) against the PagedMemory
+        `data`, which is updated in place and returned.
+
+        on_retire(pc, instr, result, store) is called as each instruction
+        retires: `result` is the array written to Rd (None if nothing is
+        written), `store` the (addresses, values) arrays of a store (None
+        otherwise), both in thread order, addresses wrapped like mem_addr.
+        """
+        self.block_idx = np.asarray(block_idx, dtype=np.uint64)
+        self.thread_idx = np.asarray(thread_idx, dtype=np.uint64)
+        self.regs = np.zeros((R_BLOCK_IDX, self.block_idx.size), dtype=np.uint64)
+        self.retired = 0
+        addr_mask = np.uint64(2**self.addr_width - 1)
+
+        # no branches -- every thread walks the same straight-line program
+        for pc in range(PROGRAM_MEM_SIZE):
+            instr = program[pc] if pc < len(program) else 0
+            op_code, rd, rm, rn, imm_19 = decode_fields(instr)
+            self.retired += 1
+
+            if op_code == OpCode.RET.value:
+                if on_retire:
+                    on_retire(pc, instr, None, None)
+                return data
+
+            if op_code == OpCode.CONST.value:
+                result = np.full(self.block_idx.size, imm_19 & (2**64 - 1), dtype=np.uint64)
+
+            elif op_code == OpCode.LOAD.value:
+                result = data.gather(self.read_reg(rm, block_dim))
+
+            elif op_code == OpCode.STORE.value:
+                # lanes are serviced in order, so the last thread to write an address wins
+                addrs = self.read_reg(rm, block_dim)
+                values = self.read_reg(rn, block_dim)
+                data.scatter(addrs, values)
+                if on_retire:
+                    on_retire(pc, instr, None, (addrs & addr_mask, values))
+                continue
+
+            elif OpCode.ADD.value <= op_code <= OpCode.ORR.value:
+                rm_data = self.read_reg(rm, block_dim)
+                rn_data = self.read_reg(rn, block_dim)
+                if op_code == OpCode.ADD.value:
+                    result = rm_data + rn_data
+                elif op_code == OpCode.SUB.value:
+                    result = rm_data - rn_data
+                elif op_code == OpCode.MUL.value:
+                    result = rm_data * rn_data
+                elif op_code == OpCode.DIV.value:
+                    if not rn_data.all():
+                        raise ZeroDivisionError(f"DIV by zero at PC {pc} (result is X in the RTL)")
+                    result = rm_data // rn_data
+                elif op_code == OpCode.AND.value:
+                    result = rm_data & rn_data
+                else:
+                    result = rm_data | rn_data
+
+            else:
+                # Decoder raises no control signals for unknown opcodes
+                if on_retire:
+                    on_retire(pc, instr, None, None)
+                continue
+
+            # writing only allowed to general purpose registers
+            if rd < R_BLOCK_IDX:
+                self.regs[rd] = result
+            if on_retire:
+                on_retire(pc, instr, result if rd < R_BLOCK_IDX else None, None)
+
+        raise ValueError(f"program has no RET in the first {PROGRAM_MEM_SIZE} instructions")
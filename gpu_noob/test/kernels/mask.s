@@ -0,0 +1,17 @@
+; A[i] = A[i] & mask  (in place, so grids of several blocks fit in data memory)
+; kernel arguments at M[0..1]: baseA, mask
+.threads 64
+
+MUL R4, %blockIdx, %blockDim
+ADD R4, R4, %threadIdx      ; i = blockIdx * blockDim + threadIdx
+
+CONST R1, #1
+LDUR R5, %zero              ; baseA
+LDUR R6, R1                 ; mask
+
+ADD R8, R5, R4              ; addr(A[i]) = baseA + i
+LDUR R9, R8                 ; load A[i]
+AND R9, R9, R6              ; A[i] & mask
+STUR R9, R8                 ; store A[i]
+
+RET
@@ -0,0 +1,24 @@
+; Y[i] = a * X[i] + Y[i]
+; kernel arguments at M[0..2]: baseX, baseY, a
+.threads 32
+
+MUL R4, %blockIdx, %blockDim
+ADD R4, R4, %threadIdx      ; i = blockIdx * blockDim + threadIdx
+
+CONST R1, #1
+CONST R2, #2
+LDUR R5, %zero              ; baseX
+LDUR R6, R1                 ; baseY
+LDUR R7, R2                 ; a
+
+ADD R8, R5, R4              ; addr(X[i]) = baseX + i
+LDUR R9, R8                 ; load X[i]
+
+ADD R10, R6, R4             ; addr(Y[i]) = baseY + i
+LDUR R11, R10               ; load Y[i]
+
+MUL R9, R7, R9              ; a * X[i]
+ADD R11, R9, R11            ; a * X[i] + Y[i]
+STUR R11, R10               ; store Y[i]
+
+RET
@@ -0,0 +1,23 @@
+; C[i] = A[i] + B[i]
+; A at 0, B at 32, C at 64 (one SIMD, two wave cycles)
+.threads 32
+
+MUL R4, %blockIdx, %blockDim
+ADD R4, R4, %threadIdx      ; i = blockIdx * blockDim + threadIdx
+
+CONST R5, #0                ; baseA
+CONST R6, #32               ; baseB
+CONST R7, #64               ; baseC
+
+ADD R8, R5, R4              ; addr(A[i]) = baseA + i
+LDUR R8, R8                 ; load A[i]
+
+ADD R9, R6, R4              ; addr(B[i]) = baseB + i
+LDUR R9, R9                 ; load B[i]
+
+ADD R10, R8, R9             ; C[i] = A[i] + B[i]
+
+ADD R11, R7, R4             ; addr(C[i]) = baseC + i
+STUR R10, R11               ; store C[i]
+
+RET
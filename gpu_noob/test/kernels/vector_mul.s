@@ -0,0 +1,25 @@
+; C[i] = A[i] * B[i]
+; kernel arguments at M[0..2]: baseA, baseB, baseC
+.threads 32
+
+MUL R4, %blockIdx, %blockDim
+ADD R4, R4, %threadIdx      ; i = blockIdx * blockDim + threadIdx
+
+CONST R1, #1
+CONST R2, #2
+LDUR R5, %zero              ; baseA
+LDUR R6, R1                 ; baseB
+LDUR R7, R2                 ; baseC
+
+ADD R8, R5, R4              ; addr(A[i]) = baseA + i
+LDUR R8, R8                 ; load A[i]
+
+ADD R9, R6, R4              ; addr(B[i]) = baseB + i
+LDUR R9, R9                 ; load B[i]
+
+MUL R10, R8, R9             ; C[i] = A[i] * B[i]
+
+ADD R11, R7, R4             ; addr(C[i]) = baseC + i
+STUR R10, R11               ; store C[i]
+
+RET
@@ -0,0 +1,354 @@
+import random
+from collections import deque
+import numpy as np
+from cocotb.triggers import Edge, First, RisingEdge
+from cocotb.utils import get_sim_steps, get_sim_time
+from signals import Signals
+from assembler import assemble_file
+from paged_memory import PagedMemory
+
+'''
+Testbench models of program and data memory.
+
+Both models sleep until one of the request valids changes, then sync to the
+next clock edge and answer every lane whose valid is set -- the same
+"ack on the next edge, hold ack while valid is high" behaviour as polling
+every clock, but the bench only pays for cycles with memory traffic.
+
+DataMemoryModel can also add latency (fixed or drawn per request) and limit
+how many requests start per cycle / are in flight, to exercise SIMD_WAIT and
+LSU_WAITING the way a real DRAM would. It stays awake every clock only while
+requests are queued or in flight. Its words are a PagedMemory, so the
+address width can go up to the full 64 bits (see paged_memory.py).
+
+ProgramMemoryModel takes a fetch latency the same way, so the cycles an
+instruction buffer/cache saves (instruction_cache.v) can be measured. It is
+double-buffered: stage() loads the next kernel into the back bank while the
+current one runs, and swap() makes it current between launches.
+
+LineMemoryModel serves the wide transactions of a coalescing
+MemoryController (memory_controller.v): one line of words per request.
+'''
+
+def set_lanes(bits):
+    lane = 0
+    while bits:
+        if bits & 1:
+            yield lane
+        bits >>= 1
+        lane += 1
+
+class ProgramMemoryModel:
+    """
+    Program memory of `size` instructions.
+
+    latency: cycles from the edge a fetch is first seen to the edge its ack is
+        driven, plus one (1 = ack on the next edge). An int, or a zero-argument
+        callable drawing a latency per fetch (see uniform_latency).
+    `reads` counts the fetches served.
+    """
+    def __init__(self, dut, size=64, latency=1):
+        self.dut = dut
+        self.mem = [0] * size
+        self.back = None # staged program (stage/swap)
+        self.latency = latency if callable(latency) else (lambda: latency)
+        self.reads = 0
+        sig = Signals(dut)
+        self.read_valid = sig.prog_mem_read_valid
+        self.addr = sig.prog_mem_addr
+        self.read_data = sig.prog_mem_read_data
+        self.read_ack = sig.prog_mem_read_ack
+
+    def image(self, program):
+        """Words of an assembled image (Program, list of words, or path to a .s kernel)."""
+        if isinstance(program, str):
+            program = assemble_file(program)
+        if len(program) > len(self.mem):
+            raise ValueError(f"program has {len(program)} instructions, program memory holds {len(self.mem)}")
+        return [int(instr) for instr in program]
+
+    def load(self, program):
+        """Load an assembled image (Program, list of words, or path to a .s kernel)."""
+        for i, instr in enumerate(self.image(program)):
+            self.mem[i] = instr
+
+    def stage(self, program):
+        """Load `program` into the back bank; fetches keep reading the current one until swap()."""
+        words = self.image(program)
+        self.back = words + [0] * (len(self.mem) - len(words))
+
+    def swap(self):
+        """Make the staged program current (between launches, no fetch in flight)."""
+        if self.back is None:
+            raise RuntimeError("no program staged")
+        self.mem, self.back = self.back, None
+
+    async def run(self):
+        self.read_ack.write(0)
+        while True:
+            # nothing to do until the fetcher raises/drops a request
+            await Edge(self.read_valid.handle)
+            await RisingEdge(self.dut.clk)
+
+            if self.read_valid.bits():
+                for _ in range(max(1, int(self.latency())) - 1):
+                    await RisingEdge(self.dut.clk)
+                self.read_data.write(self.mem[self.addr.read()])
+                self.read_ack.write(1)
+                self.reads += 1
+            else:
+                self.read_ack.write(0)
+
+class MemRequest:
+    __slots__ = ("write", "lane", "addr", "data", "arrival", "done", "acked")
+
+    def __init__(self, write, lane, addr, data, arrival):
+        self.write = write
+        self.lane = lane
+        self.addr = addr
+        self.data = data
+        self.arrival = arrival # cycle the request was first seen
+        self.done = None # cycle its ack is driven
+        self.acked = False
+
+def uniform_latency(lo, hi, seed=None):
+    """Latency drawn uniformly from [lo, hi] cycles."""
+    rng = random.Random(seed)
+    return lambda: rng.randint(lo, hi)
+
+def weighted_latency(weights, seed=None):
+    """Latency drawn from {cycles: weight}, e.g. {10: 0.8, 100: 0.2} for row hits/misses."""
+    rng = random.Random(seed)
+    cycles = list(weights)
+    w = [weights[c] for c in cycles]
+    return lambda: rng.choices(cycles, w)[0]
+
+class DataMemoryModel:
+    """
+    Per-lane data memory of 2**addr_width words (`mem`, a PagedMemory).
+
+    latency: cycles from the edge a request is first seen to the edge its ack
+        is driven, plus one (1 = ack on the next edge). An int, or a
+        zero-argument callable drawing a latency per request.
+    issue_width: requests that may start service per cycle (None = unlimited).
+    max_outstanding: requests in service at once (None = unlimited).
+    Requests that can't start wait in a FIFO queue.
+    """
+    def __init__(self, dut, addr_width=7, latency=1, issue_width=None, max_outstanding=None,
+                 word_bytes=8, clock_period=10, clock_units="ns"):
+        self.dut = dut
+        self.mem = PagedMemory(addr_width)
+        sig = Signals(dut)
+        self.read_valid = sig.mem_read_valid
+        self.write_valid = sig.mem_write_valid
+        self.addr = sig.mem_addr
+        self.write_data = sig.mem_write_data
+        self.read_data = sig.mem_read_data
+        self.read_ack_port = sig.data_mem_read_ack
+        self.write_ack_port = sig.data_mem_write_ack
+        self.latency = latency if callable(latency) else (lambda: latency)
+        self.issue_width = issue_width
+        self.max_outstanding = max_outstanding
+        self.word_bytes = word_bytes
+        self.period_steps = get_sim_steps(clock_period, clock_units)
+
+        self.queue = deque() # waiting to start service
+        self.in_flight = [] # started, ack not driven yet
+        self.tracked = {} # (write, lane) -> request that lane is holding valid for
+        self.read_ack = 0
+        self.write_ack = 0
+
+        # stats
+        self.latencies = []
+        self.bytes = 0
+        self.first_cycle = None
+        self.last_cycle = None
+        self.max_queue_depth = 0
+
+    def cycle(self):
+        return get_sim_time("step") // self.period_steps
+
+    async def run(self):
+        self.read_ack_port.write(0)
+        self.write_ack_port.write(0)
+        while True:
+            if not self.queue and not self.in_flight:
+                # nothing to do until some lane raises/drops a request
+                await First(Edge(self.read_valid.handle), Edge(self.write_valid.handle))
+            await RisingEdge(self.dut.clk)
+            self.step(self.cycle())
+
+    def step(self, cycle):
+        read = self.read_valid.bits()
+        write = self.write_valid.bits()
+
+        # lanes that dropped valid are done with their request
+        for key in [k for k in self.tracked if not ((write if k[0] else read) >> k[1]) & 1]:
+            req = self.tracked.pop(key)
+            if not req.acked:
+                # dropped before it was served
+                if req in self.queue:
+                    self.queue.remove(req)
+                if req in self.in_flight:
+                    self.in_flight.remove(req)
+            elif req.write:
+                self.write_ack &= ~(1 << req.lane)
+            else:
+                self.read_ack &= ~(1 << req.lane)
+
+        # new requests (all lanes usually raise valid together, so read the ports whole)
+        addrs = data = None
+        for is_write, bits in ((False, read), (True, write)):
+            for lane in set_lanes(bits):
+                if (is_write, lane) in self.tracked:
+                    continue
+                if addrs is None:
+                    addrs, addr_x = self.addr.read()
+                if addr_x[lane]:
+                    raise ValueError(f"lane {lane} raised a memory request with an X/Z address (cycle {cycle})")
+                if is_write and data is None:
+                    data, _ = self.write_data.read()
+                req = MemRequest(is_write, lane, int(addrs[lane]), int(data[lane]) if is_write else None, cycle)
+                self.tracked[(is_write, lane)] = req
+                self.queue.append(req)
+                if self.first_cycle is None:
+                    self.first_cycle = cycle
+        self.max_queue_depth = max(self.max_queue_depth, len(self.queue))
+
+        # start service
+        issued = 0
+        while self.queue:
+            if self.issue_width is not None and issued >= self.issue_width:
+                break
+            if self.max_outstanding is not None and len(self.in_flight) >= self.max_outstanding:
+                break
+            req = self.queue.popleft()
+            req.done = cycle + max(1, int(self.latency())) - 1
+            self.in_flight.append(req)
+            issued += 1
+
+        # complete
+        still_in_flight = []
+        for req in self.in_flight:
+            if req.done > cycle:
+                still_in_flight.append(req)
+                continue
+            if req.write:
+                self.mem[req.addr] = req.data
+                self.write_ack |= 1 << req.lane
+            else:
+                self.read_data[req.lane].write(self.mem[req.addr])
+                self.read_ack |= 1 << req.lane
+            req.acked = True
+            self.latencies.append(cycle - req.arrival + 1)
+            self.bytes += self.word_bytes
+            self.last_cycle = cycle
+        self.in_flight = still_in_flight
+
+        self.read_ack_port.write(self.read_ack)
+        self.write_ack_port.write(self.write_ack)
+
+    def stats(self):
+        """Latency (cycles) and bandwidth over the window from the first request to the last ack."""
+        if not self.latencies:
+            return {"requests": 0}
+        lat = np.array(self.latencies)
+        window = self.last_cycle - self.first_cycle + 1
+        return {
+            "requests": len(lat),
+            "avg_latency": float(lat.mean()),
+            "min_latency": int(lat.min()),
+            "p50_latency": float(np.percentile(lat, 50)),
+            "p95_latency": float(np.percentile(lat, 95)),
+            "p99_latency": float(np.percentile(lat, 99)),
+            "max_latency": int(lat.max()),
+            "max_queue_depth": self.max_queue_depth,
+            "cycles": window,
+            "bytes": self.bytes,
+            "bytes_per_cycle": self.bytes / window,
+            "requests_per_cycle": len(lat) / window,
+        }
+
+    def report(self):
+        s = self.stats()
+        if not s["requests"]:
+            self.dut._log.info("Data memory: no requests")
+            return s
+        self.dut._log.info(
+            f"Data memory: {s['requests']} requests over {s['cycles']} cycles | "
+            f"latency avg={s['avg_latency']:.1f} p95={s['p95_latency']:.1f} p99={s['p99_latency']:.1f} max={s['max_latency']} | "
+            f"bandwidth={s['bytes_per_cycle']:.2f} B/cycle ({s['requests_per_cycle']:.2f} req/cycle), "
+            f"max queue depth={s['max_queue_depth']}"
+        )
+        return s
+
+    def dump(self, line_width=4, result_base=None, start=None, end=None):
+        """Print the allocated pages (or [start, end)) as Addr[N]: VALUE lines, see PagedMemory.dump."""
+        self.mem.dump(line_width, result_base, start, end)
+
+class LineMemoryModel:
+    """
+    Data memory behind a MemoryController: serves one line transaction
+    (`line_words` words from a line-aligned mem_addr, writes under
+    mem_write_mask) at a time with the same valid/ack handshake as
+    DataMemoryModel. `mem` is a PagedMemory; latency as in DataMemoryModel.
+    """
+    def __init__(self, dut, addr_width=7, line_words=4, latency=1, word_bytes=8):
+        self.dut = dut
+        self.mem = PagedMemory(addr_width)
+        self.line_words = line_words
+        self.latency = latency if callable(latency) else (lambda: latency)
+        self.word_bytes = word_bytes
+        sig = Signals(dut)
+        self.read_valid = sig.mem_read_valid
+        self.write_valid = sig.mem_write_valid
+        self.addr = sig.mem_addr
+        self.write_mask = sig.mem_write_mask
+        self.write_data = sig.mem_write_data
+        self.read_data = sig.mem_read_data
+        self.read_ack = sig.mem_read_ack
+        self.write_ack = sig.mem_write_ack
+
+        # stats
+        self.reads = 0
+        self.writes = 0
+        self.words = 0 # words read or written under the mask
+
+    async def run(self):
+        self.read_ack.write(0)
+        self.write_ack.write(0)
+        while True:
+            await First(Edge(self.read_valid.handle), Edge(self.write_valid.handle))
+            await RisingEdge(self.dut.clk)
+            read = self.read_valid.bits()
+            write = self.write_valid.bits()
+            if not (read or write):
+                self.read_ack.write(0)
+                self.write_ack.write(0)
+                continue
+            for _ in range(max(1, int(self.latency())) - 1):
+                await RisingEdge(self.dut.clk)
+            base = self.addr.read()
+            if write:
+                mask = self.write_mask.bits()
+                data, _ = self.write_data.read()
+                for w in set_lanes(mask):
+                    self.mem[base + w] = int(data[w])
+                self.writes += 1
+                self.words += bin(mask).count("1")
+                self.write_ack.write(1)
+            else:
+                for w, value in enumerate(self.mem.read(base, self.line_words)):
+                    self.read_data[w].write(int(value))
+                self.reads += 1
+                self.words += self.line_words
+                self.read_ack.write(1)
+
+    @property
+    def transactions(self):
+        return self.reads + self.writes
+
+    @property
+    def bytes(self):
+        """Bytes moved, counting whole lines (a burst moves the line even if few words are used)."""
+        return self.transactions * self.line_words * self.word_bytes
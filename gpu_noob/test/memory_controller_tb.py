@@ -0,0 +1,141 @@
+import cocotb
+import numpy as np
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, ReadOnly, Timer
+from cocotb.utils import get_sim_time
+from common import bench_param
+from signals import Signals
+from memory import LineMemoryModel, set_lanes
+from trace_recorder import TraceRecorder, dump_on_failure
+
+TOPLEVEL = "MemoryController" # module this bench drives (DUT=...)
+
+NUM_LANES = bench_param("NUM_LANES", 16)
+LINE_WORDS = bench_param("LINE_WORDS", 4)
+ADDR_WIDTH = bench_param("DATA_MEM_ADDR_WIDTH", 7)
+CLOCK_PERIOD = 10 # ns
+
+TRACE_SIGNALS = [
+    "rst", "mc_state", "lane_read_valid", "lane_write_valid", "lane_read_ack", "lane_write_ack",
+    "lane_addr[]", "in_flight", "mem_read_valid", "mem_write_valid", "mem_read_ack", "mem_write_ack",
+    "mem_addr", "mem_write_mask", "lane_requests", "mem_transactions",
+]
+
+class Lanes:
+    """Plays the LSUs: every lane raises valid together, holds it until its ack, then drops it."""
+    def __init__(self, dut):
+        self.dut = dut
+        self.sig = Signals(dut)
+
+    async def access(self, addrs, data=None):
+        """One memory instruction: lane i loads addrs[i] (stores data[i] if given); None = lane idle."""
+        valid = 0
+        for lane, addr in enumerate(addrs):
+            if addr is None:
+                continue
+            self.sig.lane_addr[lane].write(addr)
+            if data is not None:
+                self.sig.lane_write_data[lane].write(int(data[lane]))
+            valid |= 1 << lane
+        valid_port = self.sig.lane_write_valid if data is not None else self.sig.lane_read_valid
+        ack_port = self.sig.lane_write_ack if data is not None else self.sig.lane_read_ack
+
+        loaded = [None] * len(addrs)
+        pending = valid
+        while True:
+            valid_port.write(pending) # lanes acked last cycle drop valid, like the LSU
+            if not pending:
+                break
+            await ReadOnly()
+            acked = ack_port.bits() & pending
+            for lane in set_lanes(acked):
+                loaded[lane] = self.sig.lane_read_data[lane].read()
+            pending &= ~acked
+            await RisingEdge(self.dut.clk)
+        await RisingEdge(self.dut.clk) # let the acks drop before the next instruction
+        await RisingEdge(self.dut.clk)
+        return loaded
+
+async def setup(dut, name, latency=1):
+    cocotb.start_soon(Clock(dut.clk, CLOCK_PERIOD, units="ns").start())
+    trace = TraceRecorder(dut, TRACE_SIGNALS, name=name)
+    cocotb.start_soon(trace.run())
+    mem = LineMemoryModel(dut, ADDR_WIDTH, LINE_WORDS, latency)
+    cocotb.start_soon(mem.run())
+
+    dut.rst.value = 1
+    dut.enable.value = 1
+    dut.lane_read_valid.value = 0
+    dut.lane_write_valid.value = 0
+    await Timer(2 * CLOCK_PERIOD, units="ns")
+    dut.rst.value = 0
+    await RisingEdge(dut.clk)
+    return mem
+
+def counters(sig):
+    return sig.lane_requests.read(), sig.mem_transactions.read()
+
+@cocotb.test()
+@dump_on_failure
+async def test_coalesce_vector_add(dut):
+    """vector_add's accesses (2 loads + 1 store of consecutive words per lane, two wave cycles) take one transaction per line."""
+    mem = await setup(dut, "coalesce_vector_add")
+    sig = Signals(dut)
+    lanes = Lanes(dut)
+    n = 2 * NUM_LANES # threads
+    mem.mem[:2 * n] = np.arange(2 * n) # A = 0..n-1, B = n..2n-1
+
+    start = get_sim_time("ns")
+    for wave_cycle in range(2):
+        first = wave_cycle * NUM_LANES
+        idx = range(first, first + NUM_LANES)
+        a = await lanes.access([i for i in idx])
+        b = await lanes.access([n + i for i in idx])
+        assert a == list(idx) and b == [n + i for i in idx], f"wave cycle {wave_cycle}: loaded {a} / {b}"
+        await lanes.access([2 * n + i for i in idx], [x + y for x, y in zip(a, b)])
+    cycles = int(get_sim_time("ns") - start) // CLOCK_PERIOD
+
+    expected = 2 * np.arange(n) + n
+    got = mem.mem.read(2 * n, n)
+    assert np.array_equal(got, expected), f"C = {got}, expected {expected}"
+
+    requests, transactions = counters(sig)
+    assert requests == 3 * n, f"expected {3 * n} lane requests, got {requests}"
+    lines_per_access = (NUM_LANES + LINE_WORDS - 1) // LINE_WORDS
+    assert transactions == 6 * lines_per_access, f"expected {6 * lines_per_access} transactions, got {transactions}"
+    assert mem.transactions == transactions
+    dut._log.info(f"vector_add accesses: {requests} lane requests -> {transactions} transactions "
+                  f"({requests / transactions:.1f}x), {mem.bytes} bytes moved, {cycles} cycles")
+
+@cocotb.test()
+@dump_on_failure
+async def test_coalesce_patterns(dut):
+    """Unaligned, repeated, strided and conflicting accesses."""
+    mem = await setup(dut, "coalesce_patterns")
+    sig = Signals(dut)
+    lanes = Lanes(dut)
+    mem.mem[:2**ADDR_WIDTH] = np.arange(2**ADDR_WIDTH) * 10
+
+    async def check(name, addrs, expected_transactions, data=None):
+        before = counters(sig)
+        loaded = await lanes.access(addrs, data)
+        requests, transactions = (a - b for a, b in zip(counters(sig), before))
+        active = [a for a in addrs if a is not None]
+        assert requests == len(active), f"{name}: {requests} lane requests for {len(active)} active lanes"
+        assert transactions == expected_transactions, f"{name}: {transactions} transactions, expected {expected_transactions}"
+        if data is None:
+            for lane, addr in enumerate(addrs):
+                if addr is not None:
+                    assert loaded[lane] == addr * 10, f"{name}: lane {lane} loaded {loaded[lane]} from {addr}"
+        dut._log.info(f"{name}: {requests} requests -> {transactions} transactions")
+
+    await check("unaligned", [1 + i for i in range(NUM_LANES)], NUM_LANES // LINE_WORDS + 1)
+    await check("broadcast", [5] * NUM_LANES, 1)
+    await check("reversed", [NUM_LANES - 1 - i for i in range(NUM_LANES)], NUM_LANES // LINE_WORDS)
+    await check("strided", [i * LINE_WORDS for i in range(NUM_LANES)], NUM_LANES)
+    await check("partial", [i if i % 3 else None for i in range(NUM_LANES)], len({i // LINE_WORDS for i in range(NUM_LANES) if i % 3}))
+
+    # every lane stores to one word: one transaction, the highest lane wins
+    await check("conflicting store", [7] * NUM_LANES, 1, data=list(range(100, 100 + NUM_LANES)))
+    assert mem.mem[7] == 100 + NUM_LANES - 1, f"M[7] = {mem.mem[7]}, expected the last lane's {100 + NUM_LANES - 1}"
+    assert mem.mem[6] == 60 and mem.mem[8] == 80, "masked words of the line must not be written"
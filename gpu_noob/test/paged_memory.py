@@ -0,0 +1,220 @@
+import numpy as np
+
+'''
+Sparse, page-allocated word memory.
+
+The data memory seen by the SIMD is 2**addr_width 64-bit words. Instead of a
+flat list, words live in NumPy uint64 pages of 2**page_bits words that are
+allocated the first time they're written, so a kernel can use a gigabyte-scale
+address space while the bench only holds the pages it actually touched.
+Untouched words read as 0.
+
+    mem = PagedMemory(32)
+    mem[0x4000_0000] = 7                   # one word
+    mem.write(0x8000_0000, np.arange(64))  # a block, page by page
+    mem.map(0x8000_0000, memmap)           # a block, whole pages shared with a copy-on-write memmap
+    mem.read(0x8000_0000, 64)              # -> uint64 array
+    mem.gather(addrs) / mem.scatter(addrs, values)   # vectorized, any addresses
+
+Addresses wrap at addr_width bits like the RTL's mem_addr.
+'''
+
+WORD_MASK = 2**64 - 1
+PAGE_BITS = 12 # 4096 words (32 KiB) per page
+
+class PagedMemory:
+    def __init__(self, addr_width=7, page_bits=PAGE_BITS):
+        self.addr_width = addr_width
+        self.size = 2**addr_width
+        self.page_bits = min(page_bits, addr_width)
+        self.page_words = 2**self.page_bits
+        self.pages = {} # page index -> uint64 array of page_words
+
+    def _page(self, index, create=False):
+        page = self.pages.get(index)
+        if page is None and create:
+            page = self.pages[index] = np.zeros(self.page_words, dtype=np.uint64)
+        return page
+
+    def _split(self, addr):
+        addr &= self.size - 1
+        return addr >> self.page_bits, addr & (self.page_words - 1)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.size)
+            return self.read(start, stop - start)[::step]
+        index, offset = self._split(int(key))
+        page = self._page(index)
+        return 0 if page is None else int(page[offset])
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.size)
+            values = np.asarray(value)
+            if step != 1 or values.size != stop - start:
+                raise ValueError(f"can only assign {stop - start} contiguous words to {key}, got {values.size}")
+            self.write(start, values)
+            return
+        index, offset = self._split(int(key))
+        self._page(index, create=True)[offset] = int(value) & WORD_MASK
+
+    def read(self, base, count):
+        """`count` words from `base` as a uint64 array (a copy)."""
+        out = np.zeros(count, dtype=np.uint64)
+        pos = 0
+        while pos < count:
+            index, offset = self._split(base + pos)
+            n = min(self.page_words - offset, count - pos)
+            page = self._page(index)
+            if page is not None:
+                out[pos:pos + n] = page[offset:offset + n]
+            pos += n
+        return out
+
+    def write(self, base, values):
+        """Store `values` (array-like of words) from `base`, allocating the pages they cover."""
+        values = as_words(values)
+        pos = 0
+        while pos < values.size:
+            index, offset = self._split(base + pos)
+            n = min(self.page_words - offset, values.size - pos)
+            self._page(index, create=True)[offset:offset + n] = values[pos:pos + n]
+            pos += n
+
+    def map(self, base, values):
+        """
+        Like write(), but whole pages of a uint64/int64 copy-on-write np.memmap
+        (mode "c") are adopted as views instead of copied, so only the pages
+        the kernel touches are ever read from disk (see host_buffers.py).
+        Any other array is copied: a store must never reach the caller's array.
+        """
+        if not (isinstance(values, np.memmap) and values.mode == "c" and values.dtype in (np.uint64, np.int64)):
+            self.write(base, values)
+            return
+        values = values.ravel().view(np.uint64)
+        pos = 0
+        while pos < values.size:
+            index, offset = self._split(base + pos)
+            n = min(self.page_words - offset, values.size - pos)
+            if n == self.page_words:
+                self.pages[index] = values[pos:pos + n]
+            else:
+                self._page(index, create=True)[offset:offset + n] = values[pos:pos + n]
+            pos += n
+
+    def gather(self, addrs):
+        """Words at every address in `addrs` (uint64 array), one NumPy op per page touched."""
+        addrs = np.asarray(addrs, dtype=np.uint64) & np.uint64(self.size - 1)
+        index = addrs >> np.uint64(self.page_bits)
+        offset = addrs & np.uint64(self.page_words - 1)
+        out = np.zeros(addrs.size, dtype=np.uint64)
+        for i in np.unique(index):
+            page = self._page(int(i))
+            if page is not None:
+                sel = index == i
+                out[sel] = page[offset[sel]]
+        return out
+
+    def scatter(self, addrs, values):
+        """Store values[k] at addrs[k]; when addresses repeat the last one wins, like lanes serviced in order."""
+        addrs = np.asarray(addrs, dtype=np.uint64) & np.uint64(self.size - 1)
+        values = np.broadcast_to(as_words(values), addrs.shape)
+        index = addrs >> np.uint64(self.page_bits)
+        offset = addrs & np.uint64(self.page_words - 1)
+        for i in np.unique(index):
+            sel = index == i
+            self._page(int(i), create=True)[offset[sel]] = values[sel]
+
+    def load(self, image):
+        """Contents of another PagedMemory, or an array-like image placed at address 0."""
+        if isinstance(image, PagedMemory):
+            for index in image.touched_pages():
+                page = image.pages[index]
+                self.write(index * image.page_words, page)
+        else:
+            self.write(0, image)
+
+    def copy(self):
+        mem = PagedMemory(self.addr_width, self.page_bits)
+        mem.pages = {i: p.copy() for i, p in self.pages.items()}
+        return mem
+
+    def touched_pages(self):
+        return sorted(self.pages)
+
+    def ranges(self):
+        """Allocated address ranges as [(start, end)], adjacent pages merged."""
+        ranges = []
+        for index in self.touched_pages():
+            start = index * self.page_words
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], start + self.page_words)
+            else:
+                ranges.append((start, start + self.page_words))
+        return ranges
+
+    @property
+    def nbytes(self):
+        """Host memory held by allocated pages."""
+        return len(self.pages) * self.page_words * 8
+
+    def diff(self, other, limit=None):
+        """Addresses (ascending) where this memory and `other` differ, at most `limit` of them."""
+        addrs = []
+        if self.page_words != other.page_words:
+            raise ValueError("can only compare memories with the same page size")
+        for index in sorted(set(self.pages) | set(other.pages)):
+            a = self._page(index)
+            b = other._page(index)
+            if a is None:
+                changed = np.flatnonzero(b)
+            elif b is None:
+                changed = np.flatnonzero(a)
+            else:
+                changed = np.flatnonzero(a != b)
+            addrs.extend(int(index * self.page_words + o) for o in changed)
+            if limit is not None and len(addrs) >= limit:
+                return addrs[:limit]
+        return addrs
+
+    def dump(self, line_width=4, result_base=None, start=None, end=None):
+        """
+        Print Addr[N]: VALUE lines for the allocated pages (or [start, end)),
+        skipping all-zero lines so a sparse gigabyte space prints in a few lines.
+        """
+        ranges = self.ranges() if start is None else [(start, end if end is not None else start + self.page_words)]
+        addr_digits = max(3, len(str(self.size - 1)))
+
+        print("\nData Memory Dump:")
+        print("-" * 30)
+        print(f"{len(self.pages)} page(s) of {self.page_words} words allocated, {self.nbytes / 2**10:.0f} KiB")
+
+        for lo, hi in ranges:
+            words = self.read(lo, hi - lo)
+            skipped = 0
+            for line in range(lo, hi, line_width):
+                chunk = words[line - lo:line - lo + line_width]
+                marker = result_base is not None and line <= result_base < line + line_width
+                if not chunk.any() and not marker:
+                    skipped += len(chunk)
+                    continue
+                if skipped:
+                    print(f"  ... {skipped} zero words")
+                    skipped = 0
+                if marker:
+                    print("-"*15 + "Result addresses" + "-"*15)
+                print("  ".join(f"M[{line + i:{addr_digits}}]: {int(v):<5}" for i, v in enumerate(chunk)))
+            if skipped:
+                print(f"  ... {skipped} zero words")
+
+        print("-" * 30)
+
+def as_words(values):
+    """Array-like of ints (negative ones two's complement) as uint64."""
+    values = np.asarray(values)
+    if values.dtype == np.uint64:
+        return values.ravel()
+    if values.dtype.kind in "iub":
+        return values.astype(np.int64).astype(np.uint64).ravel()
+    return np.array([int(v) & WORD_MASK for v in values.ravel()], dtype=np.uint64)
@@ -0,0 +1,119 @@
+import numpy as np
+from cocotb.triggers import Timer
+from common import SIMD_State
+from signals import Signals
+from assembler import disassemble_word
+
+'''
+Reads the SIMD performance counters (module/perf_counters.v) through the
+perf_addr/perf_data port and turns them into a CPI report and a per-PC
+profile.
+
+    perf = await read_perf_counters(dut)
+    perf.report(dut._log, program)
+'''
+
+PROGRAM_MEM_ADDR_WIDTH = 6
+LANE_WIDTH = 16
+
+# perf_addr = {region, index} -- matches `PERF_* in common_defs.v
+REGION_GENERAL = 0
+REGION_LANE_MEM = 1
+REGION_PC_CYCLES = 2
+REGION_PC_RETIRED = 3
+
+PERF_RETIRED = 8
+PERF_STALL_CYCLES = 9
+PERF_LANE_ACTIVE = 10
+PERF_ICACHE_HITS = 11
+PERF_ICACHE_MISSES = 12
+PERF_WAVE_SWITCHES = 13
+
+def perf_address(region, index, pc_width=PROGRAM_MEM_ADDR_WIDTH):
+    return (region << pc_width) | index
+
+class PerfSnapshot:
+    """Counter values read at one point in the simulation."""
+    def __init__(self, state_cycles, retired, stall_cycles, lane_active, mem_requests,
+                 pc_cycles, pc_retired, lane_width=LANE_WIDTH, icache_hits=0, icache_misses=0, wave_switches=0):
+        self.state_cycles = state_cycles # {SIMD_State name: cycles}
+        self.retired = retired
+        self.stall_cycles = stall_cycles
+        self.lane_active = lane_active
+        self.mem_requests = mem_requests # per lane
+        self.pc_cycles = pc_cycles # np array indexed by PC
+        self.pc_retired = pc_retired
+        self.lane_width = lane_width
+        self.icache_hits = icache_hits # instruction buffer (0/0 without one)
+        self.icache_misses = icache_misses
+        self.wave_switches = wave_switches # resident wave swaps on stalls (0 with one wave slot)
+
+    @property
+    def busy_cycles(self):
+        """Cycles the SIMD was holding a wave (every state but IDLE)."""
+        return sum(c for s, c in self.state_cycles.items() if s != SIMD_State.IDLE.name)
+
+    @property
+    def cpi(self):
+        return self.busy_cycles / self.retired if self.retired else float("nan")
+
+    @property
+    def lane_utilization(self):
+        """Fraction of lane slots of retired instructions that did useful work."""
+        return self.lane_active / (self.retired * self.lane_width) if self.retired else float("nan")
+
+    def profile(self, program=None):
+        """Per-PC rows (pc, retired, cycles, cpi, share of cycles, disassembly) for every PC that ran."""
+        total = int(self.pc_cycles.sum())
+        rows = []
+        for pc in np.flatnonzero(self.pc_cycles):
+            cycles = int(self.pc_cycles[pc])
+            retired = int(self.pc_retired[pc])
+            text = disassemble_word(program[pc]) if program is not None and pc < len(program) else ""
+            rows.append((int(pc), retired, cycles, cycles / retired if retired else float("nan"), cycles / total, text))
+        return rows
+
+    def report(self, log, program=None):
+        lines = ["SIMD performance counters:"]
+        lines.append(f"  retired={self.retired} busy cycles={self.busy_cycles} CPI={self.cpi:.2f} "
+                     f"stall cycles={self.stall_cycles} ({self.stall_cycles / max(1, self.busy_cycles):.1%}) "
+                     f"lane utilization={self.lane_utilization:.1%}")
+        lines.append("  " + " ".join(f"{s}={c}" for s, c in self.state_cycles.items()))
+        lines.append(f"  mem requests per lane: {self.mem_requests}")
+        if self.icache_hits or self.icache_misses:
+            fetches = self.icache_hits + self.icache_misses
+            lines.append(f"  instruction buffer: {self.icache_hits} hits, {self.icache_misses} misses "
+                         f"({self.icache_hits / fetches:.1%} hit rate)")
+        if self.wave_switches:
+            lines.append(f"  wave switches: {self.wave_switches}")
+        lines.append(f"  {'PC':>4} {'retired':>8} {'cycles':>8} {'CPI':>6} {'share':>6}  instruction")
+        for pc, retired, cycles, cpi, share, text in self.profile(program):
+            lines.append(f"  {pc:4} {retired:8} {cycles:8} {cpi:6.2f} {share:6.1%}  {text}")
+        log.info("\n".join(lines))
+
+async def read_perf_reg(dut, addr, sig=None):
+    sig = sig or Signals(dut)
+    sig.perf_addr.write(addr)
+    await Timer(1, units="ps") # perf_data is combinational
+    v = sig.perf_data.read()
+    return 0 if v is None else v
+
+async def read_perf_counters(dut, lane_width=LANE_WIDTH, pc_width=PROGRAM_MEM_ADDR_WIDTH):
+    """Read every counter through the SIMD's perf port (takes well under one clock period)."""
+    sig = Signals(dut) # resolved once for the ~2**(pc_width+1) reads
+    async def read(region, index):
+        return await read_perf_reg(dut, perf_address(region, index, pc_width), sig)
+
+    state_cycles = {s.name: await read(REGION_GENERAL, s.value) for s in SIMD_State}
+    retired = await read(REGION_GENERAL, PERF_RETIRED)
+    stall_cycles = await read(REGION_GENERAL, PERF_STALL_CYCLES)
+    lane_active = await read(REGION_GENERAL, PERF_LANE_ACTIVE)
+    icache_hits = await read(REGION_GENERAL, PERF_ICACHE_HITS)
+    icache_misses = await read(REGION_GENERAL, PERF_ICACHE_MISSES)
+    wave_switches = await read(REGION_GENERAL, PERF_WAVE_SWITCHES)
+    mem_requests = [await read(REGION_LANE_MEM, lane) for lane in range(lane_width)]
+    pc_cycles = np.array([await read(REGION_PC_CYCLES, pc) for pc in range(2**pc_width)], dtype=np.int64)
+    pc_retired = np.array([await read(REGION_PC_RETIRED, pc) for pc in range(2**pc_width)], dtype=np.int64)
+
+    return PerfSnapshot(state_cycles, retired, stall_cycles, lane_active, mem_requests,
+                        pc_cycles, pc_retired, lane_width, icache_hits, icache_misses, wave_switches)
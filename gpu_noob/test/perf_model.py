@@ -0,0 +1,226 @@
+import argparse
+import os
+import sys
+from common import OpCode, decode_fields
+from assembler import assemble_file, KERNEL_DIR
+from isa_sim import IsaSimulator, PROGRAM_MEM_SIZE
+
+'''
+Transaction-level performance model of the whole GPU.
+
+Composes the RTL's scheduling policies without simulating signals:
+
+    BlockDispatch   up to block_slots blocks per CU, as long as their waves
+                    fit in the CU's SIMDs; blocks handed out in order to
+                    whichever CU can take them first (lowest index first,
+                    like the RTL's loop)
+    WaveDispatch    waves of the CU's blocks go to ready SIMDs
+    SimdController  each wave makes one pass over the kernel per wave cycle
+                    with an active lane (a partial last wave skips the rest);
+                    every instruction walks FETCH -> DECODE -> REQUEST ->
+                    WAIT -> EXECUTE -> UPDATE
+
+Per-instruction costs follow the controller FSM with the bench memory models
+(ack one cycle after the request is seen): 9 cycles for ALU/CONST/RET and
+8 + 3 + mem_latency + queueing for LDUR/STUR. Kernels are straight-line,
+so a wave's cost is fixed and a launch of millions of threads costs one
+placement per block. The model runs one wave per SIMD at a time, so its
+occupancy limit is NUM_SIMDS waves per CU (WAVE_SLOTS=1).
+
+    python perf_model.py run kernels/mask.s --threads 1000000 --block-dim 64 --cores 4 --simds 2
+    python perf_model.py --block-slots 2 run kernels/mask.s --threads 4096 --block-dim 32
+    python perf_model.py calibrate [bench_results.json] [--tolerance 0.02]
+
+`calibrate` replays every benchmark in a bench_tb results file (default:
+bench_baseline.json) on a 1 CU / 1 SIMD model and reports the error
+against the RTL cycle counts.
+'''
+
+class Costs:
+    """Cycles per SimdController state (defaults match the RTL with 1-cycle memories)."""
+    def __init__(self, fetch=4, decode=1, request=1, wait=1, execute=1, update=1,
+                 mem_wait_overhead=3, wave_overhead=2, block_overhead=0):
+        self.fetch = fetch # FETCH until the Fetcher has the word (program memory acks next edge)
+        self.decode = decode
+        self.request = request
+        self.wait = wait # SIMD_WAIT when no lane has a memory request
+        self.execute = execute
+        self.update = update
+        self.mem_wait_overhead = mem_wait_overhead # SIMD_WAIT cycles besides the memory latency (LSU REQUESTING, valid seen, LSU DONE)
+        self.wave_overhead = wave_overhead # simd_start -> FETCH, SIMD_DONE -> SIMD_IDLE
+        self.block_overhead = block_overhead # extra cycles between a CU finishing a block and starting the next
+
+    @property
+    def alu_instr(self):
+        return self.fetch + self.decode + self.request + self.wait + self.execute + self.update
+
+class ModelResult:
+    def __init__(self, cycles, blocks, waves, wave_cycles, cu_busy, simd_busy, num_cores, num_simds):
+        self.cycles = cycles
+        self.blocks = blocks
+        self.waves = waves
+        self.wave_cycles = wave_cycles # cycles one SIMD spends on one wave
+        self.cu_busy = cu_busy # per CU: cycles holding at least one block
+        self.simd_busy = simd_busy # total SIMD cycles spent on waves
+        self.num_cores = num_cores
+        self.num_simds = num_simds
+
+    @property
+    def cu_utilization(self):
+        return sum(self.cu_busy) / (self.num_cores * self.cycles) if self.cycles else 0.0
+
+    @property
+    def simd_utilization(self):
+        return self.simd_busy / (self.num_cores * self.num_simds * self.cycles) if self.cycles else 0.0
+
+    def summary(self):
+        return (f"{self.cycles} cycles | {self.blocks} blocks, {self.waves} waves ({self.wave_cycles} cycles/wave) | "
+                f"CU utilization {self.cu_utilization:.1%}, SIMD utilization {self.simd_utilization:.1%}")
+
+class GpuModel:
+    def __init__(self, num_cores=4, num_simds=2, wave_size=32, lane_width=16,
+                 mem_latency=1, mem_issue_width=None, costs=None, block_slots=1):
+        self.num_cores = num_cores
+        self.num_simds = num_simds
+        self.block_slots = block_slots # resident blocks per CU
+        self.wave_size = wave_size
+        self.lane_width = lane_width
+        self.total_wave_cycles = (wave_size + lane_width - 1) // lane_width
+        self.mem_latency = mem_latency # worst lane's latency for one memory instruction
+        self.mem_issue_width = mem_issue_width # requests the memory starts per cycle (None = all lanes)
+        self.costs = costs or Costs()
+        self.isa = IsaSimulator(wave_size, lane_width)
+
+    def instr_cycles(self, op_code):
+        c = self.costs
+        if op_code in (OpCode.LOAD.value, OpCode.STORE.value):
+            queueing = 0
+            if self.mem_issue_width:
+                queueing = (self.lane_width + self.mem_issue_width - 1) // self.mem_issue_width - 1
+            return c.alu_instr - c.wait + c.mem_wait_overhead + self.mem_latency + queueing
+        return c.alu_instr
+
+    def pass_cycles(self, program):
+        """Cycles for one pass (one wave cycle) over the straight-line kernel, up to and including RET."""
+        total = 0
+        for pc in range(PROGRAM_MEM_SIZE):
+            instr = program[pc] if pc < len(program) else 0
+            op_code = decode_fields(instr)[0]
+            total += self.instr_cycles(op_code)
+            if op_code == OpCode.RET.value:
+                return total
+        raise ValueError(f"program has no RET in the first {PROGRAM_MEM_SIZE} instructions")
+
+    def wave_cycles(self, program, threads=None):
+        """Cycles of a wave with `threads` threads (default full): wave cycles with no active lane are skipped."""
+        passes = self.total_wave_cycles
+        if threads is not None:
+            passes = min(passes, -(-threads // self.lane_width))
+        return passes * self.pass_cycles(program) + self.costs.wave_overhead
+
+    def block_waves(self, program, block_threads):
+        """Cycles of each wave of a block of `block_threads` threads."""
+        full = self.wave_cycles(program)
+        waves = [full] * (block_threads // self.wave_size)
+        if block_threads % self.wave_size:
+            waves.append(self.wave_cycles(program, block_threads % self.wave_size))
+        return waves
+
+    def block_start(self, resident, earliest, num_waves):
+        """
+        First cycle >= earliest at which a CU holding `resident` blocks
+        ([(cycle it is free again, waves)]) can take a block of `num_waves` waves.
+        """
+        for t in sorted({earliest} | {free for free, _ in resident if free > earliest}):
+            held = [w for free, w in resident if free > t]
+            if not held or (len(held) < self.block_slots and sum(held) + num_waves <= self.num_simds):
+                return t
+
+    def run(self, program, num_threads, block_dim):
+        wave = self.wave_cycles(program)
+        num_blocks = (num_threads + block_dim - 1) // block_dim
+        full_waves = self.block_waves(program, block_dim)
+
+        cu_busy = [0] * self.num_cores
+        cu_end = [0] * self.num_cores # last cycle a CU held a block
+        simd_free = [[0] * self.num_simds for _ in range(self.num_cores)] # cycle each SIMD finishes its waves
+        resident = [[] for _ in range(self.num_cores)] # per CU: (cycle the block's slot is free, waves)
+        start = 0
+        end = 0
+        waves = 0
+        simd_busy = 0
+        for block_id in range(num_blocks):
+            if block_id < num_blocks - 1:
+                block = full_waves
+            else:
+                block = self.block_waves(program, self.isa.block_threads(block_id, num_threads, block_dim))
+            # blocks go out in order: the next one to whichever CU can take it first
+            start, cu = min((self.block_start(resident[cu], start, len(block)), cu) for cu in range(self.num_cores))
+            for r in resident:
+                r[:] = [b for b in r if b[0] > start]
+
+            # its waves go to whichever of the CU's SIMDs is free first
+            done = start
+            simds = simd_free[cu]
+            for cycles in block:
+                s = min(range(self.num_simds), key=lambda i: simds[i])
+                simds[s] = max(start, simds[s]) + cycles
+                done = max(done, simds[s])
+            resident[cu].append((done + self.costs.block_overhead, len(block)))
+
+            cu_busy[cu] += max(0, done - max(start, cu_end[cu]))
+            cu_end[cu] = max(cu_end[cu], done)
+            waves += len(block)
+            simd_busy += sum(block)
+            end = max(end, done)
+
+        return ModelResult(end, num_blocks, waves, wave, cu_busy, simd_busy, self.num_cores, self.num_simds)
+
+def calibrate(results, model, tolerance=0.02):
+    """
+    Replay bench_tb results (benchmark name -> result dict) on `model`.
+    Returns [(name, rtl cycles, model cycles, relative error)] and whether all are within tolerance.
+    """
+    rows = []
+    ok = True
+    for name, res in sorted(results.items()):
+        program = assemble_file(os.path.join(KERNEL_DIR, res["kernel"]))
+        predicted = model.run(program, res["num_threads"], res["block_dim"]).cycles
+        err = (predicted - res["cycles"]) / res["cycles"]
+        ok &= abs(err) <= tolerance
+        rows.append((name, res["cycles"], predicted, err))
+    return rows, ok
+
+if __name__ == "__main__":
+    from benchmarks import load_results, BASELINE_FILE
+
+    parser = argparse.ArgumentParser(description="Transaction-level GPU performance model")
+    parser.add_argument("--cores", type=int, default=4)
+    parser.add_argument("--simds", type=int, default=2)
+    parser.add_argument("--wave-size", type=int, default=32)
+    parser.add_argument("--lane-width", type=int, default=16)
+    parser.add_argument("--mem-latency", type=int, default=1, help="worst-lane memory latency in cycles")
+    parser.add_argument("--mem-issue-width", type=int, help="memory requests started per cycle")
+    parser.add_argument("--block-slots", type=int, default=1, help="resident blocks per CU")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    run = sub.add_parser("run", help="estimate one launch")
+    run.add_argument("kernel")
+    run.add_argument("--threads", type=int, required=True)
+    run.add_argument("--block-dim", type=int, required=True)
+    cal = sub.add_parser("calibrate", help="compare against RTL benchmark results (1 CU, 1 SIMD)")
+    cal.add_argument("results", nargs="?", default=BASELINE_FILE)
+    cal.add_argument("--tolerance", type=float, default=0.02)
+    args = parser.parse_args()
+
+    if args.cmd == "run":
+        model = GpuModel(args.cores, args.simds, args.wave_size, args.lane_width, args.mem_latency, args.mem_issue_width,
+                         block_slots=args.block_slots)
+        print(model.run(assemble_file(args.kernel), args.threads, args.block_dim).summary())
+        sys.exit(0)
+
+    model = GpuModel(1, 1, args.wave_size, args.lane_width, args.mem_latency, args.mem_issue_width)
+    rows, ok = calibrate(load_results(args.results), model, args.tolerance)
+    print(f"{'benchmark':<18} {'RTL':>7} {'model':>7} {'error':>7}")
+    for name, rtl, predicted, err in rows:
+        print(f"{name:<18} {rtl:>7} {predicted:>7} {err:>7.1%}")
+    sys.exit(0 if ok else 1)
@@ -1,29 +1,33 @@
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge, Timer
-from common import safe_int
+from common import bench_param
+from signals import Signals
+
+TOPLEVEL = "RegisterFile" # module this bench drives (DUT=...)
 
 BLOCK_ID = 7
 BLOCK_DIM = 64
 WAVE_ID = 2
 CURR_WAVE_CYCLE = 1
 LANE_ID = 3
-WAVE_SIZE = 32
-LANE_WIDTH = 16
+WAVE_SIZE = bench_param("WAVE_SIZE", 32)
+LANE_WIDTH = bench_param("LANE_WIDTH", 16)
 
 async def reg_logger(dut):
     """Logs the value of each register every clock cycle in a readable format."""
+    reg_file = Signals(dut).reg_file
     cycle = 0
     while True:
         await RisingEdge(dut.clk)
-        reg_vals = [safe_int(dut.reg_file[i].value) for i in range(32)]
+        reg_vals, xmask = reg_file.read() # every register in one pass
 
         lines = []
         for i in range(0, 32, 4):
             line = []
             for j in range(4):
                 reg_index = i + j
-                val = reg_vals[reg_index]
+                val = "X" if xmask[reg_index] else int(reg_vals[reg_index])
                 # Mark read-only registers
                 ro_marker = "*" if reg_index >= 28 else " "
                 line.append(f"{ro_marker}R{reg_index:02d}={val:<7}")
@@ -37,6 +41,7 @@ async def reg_logger(dut):
 
 async def reset_and_check_readonly(dut):
     """Check reset and read-only registers."""
+    sig = Signals(dut)
     dut._log.info("Asserting reset and initializing kernel metadata.")
     dut.rst.value = 1
     dut.enable.value = 1
@@ -45,21 +50,25 @@ async def reset_and_check_readonly(dut):
     dut.wave_id.value = WAVE_ID
     dut.curr_wave_cycle.value = CURR_WAVE_CYCLE
     dut.lane_id.value = LANE_ID
+    dut.operand_read.value = 0
+    dut.slot.value = 0
+    dut.bg_write.value = 0
     await Timer(10, units="ns")
     dut.rst.value = 0
     await RisingEdge(dut.clk)
 
     # Check blockIdx, blockDim, threadIdx, zero
     dut._log.info("Checking read-only registers after reset.")
-    assert safe_int(dut.reg_file[28].value) == BLOCK_ID, "blockIdx (R28) incorrect after reset"
-    assert safe_int(dut.reg_file[29].value) == BLOCK_DIM, "blockDim (R29) incorrect after reset"
+    assert sig.reg_file[28].read() == BLOCK_ID, "blockIdx (R28) incorrect after reset"
+    assert sig.reg_file[29].read() == BLOCK_DIM, "blockDim (R29) incorrect after reset"
     expected_thread_idx = WAVE_ID * WAVE_SIZE + (CURR_WAVE_CYCLE * LANE_WIDTH + LANE_ID)
-    assert safe_int(dut.reg_file[30].value) == expected_thread_idx, f"threadIdx (R30) incorrect after reset, expected {expected_thread_idx}"
-    assert safe_int(dut.reg_file[31].value) == 0, "Zero register (R31) should be 0 after reset"
+    assert sig.reg_file[30].read() == expected_thread_idx, f"threadIdx (R30) incorrect after reset, expected {expected_thread_idx}"
+    assert sig.reg_file[31].read() == 0, "Zero register (R31) should be 0 after reset"
 
 @cocotb.test()
 async def test_register_file(dut):
     """Test RegisterFile basic functionality."""
+    sig = Signals(dut)
 
     # Start clock
     clock = Clock(dut.clk, 10, units="ns")
@@ -81,7 +90,7 @@ async def test_register_file(dut):
     await RisingEdge(dut.clk)
     dut.REG_WRITE.value = 0
     await RisingEdge(dut.clk)
-    assert safe_int(dut.reg_file[4].value) == test_val, "Failed to write to general-purpose register R4"
+    assert sig.reg_file[4].read() == test_val, "Failed to write to general-purpose register R4"
 
     # Test that writing to read-only register (R28) does not change its value
     dut._log.info("Testing write attempt to read-only register R28.")
@@ -92,7 +101,7 @@ async def test_register_file(dut):
     await RisingEdge(dut.clk)
     dut.REG_WRITE.value = 0
     await RisingEdge(dut.clk)
-    assert safe_int(dut.reg_file[28].value) == BLOCK_ID, "Should not be able to write to read-only register R28"
+    assert sig.reg_file[28].read() == BLOCK_ID, "Should not be able to write to read-only register R28"
 
     # Test reading from registers
     dut._log.info("Testing register read (R4 and R5).")
@@ -101,8 +110,8 @@ async def test_register_file(dut):
     dut.simd_state.value = 0b011  # REQUEST state
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
-    assert safe_int(dut.rm_data.value) == test_val, "rm_data should match value in R4"
-    assert safe_int(dut.rn_data.value) == 0, "rn_data should match value in R5 (default 0)"
+    assert sig.rm_data.read() == test_val, "rm_data should match value in R4"
+    assert sig.rn_data.read() == 0, "rn_data should match value in R5 (default 0)"
 
     # Test writing to R31 (zero register) does not change its value
     dut._log.info("Testing write attempt to zero register R31.")
@@ -113,6 +122,34 @@ async def test_register_file(dut):
     await RisingEdge(dut.clk)
     dut.REG_WRITE.value = 0
     await RisingEdge(dut.clk)
-    assert safe_int(dut.reg_file[31].value) == 0, "Zero register (R31) should always be 0"
+    assert sig.reg_file[31].read() == 0, "Zero register (R31) should always be 0"
+
+    dut._log.info("RegisterFile test passed.")
+
+@cocotb.test()
+async def test_register_forwarding(dut):
+    """Pipelined operand read on the clock the previous instruction writes back sees the new value."""
+    sig = Signals(dut)
+    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+    await reset_and_check_readonly(dut)
 
-    dut._log.info("RegisterFile test passed.")
\ No newline at end of file
+    # R4 = 5 (written earlier), then one clock writing R5 = 7 while reading R4, R5
+    dut.REG_WRITE.value = 1
+    dut.simd_state.value = 0b110  # UPDATE state
+    dut.rd.value = 4
+    dut.reg_write_data.value = 5
+    await RisingEdge(dut.clk)
+    dut.rd.value = 5
+    dut.reg_write_data.value = 7
+    dut.operand_read.value = 1
+    dut.operand_rm.value = 4
+    dut.operand_rn.value = 5
+    await RisingEdge(dut.clk)
+    dut.REG_WRITE.value = 0
+    dut.operand_read.value = 0
+    dut.slot.value = 0
+    dut.bg_write.value = 0
+    await RisingEdge(dut.clk)
+    assert sig.rm_data.read() == 5, f"rm_data = {sig.rm_data.read()}, expected R4 = 5"
+    assert sig.rn_data.read() == 7, f"rn_data = {sig.rn_data.read()}, expected the forwarded R5 = 7"
+    assert sig.reg_file[5].read() == 7, "forwarded write must still reach R5"
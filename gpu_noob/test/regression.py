@@ -0,0 +1,175 @@
+import argparse
+import ast
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+'''
+Parallel regression runner.
+
+Finds every test/*_tb.py, reads the toplevel it drives from its module level
+TOPLEVEL = "..." and runs `make DUT=<toplevel> TESTBENCH=<bench>` for each
+bench at the same time, each with its own results.xml and log in
+sim_build/regression/<bench>. A bench whose tests need other parameters
+lists them in REGRESSION_PARAMS = ["WAVE_SLOTS=2", ...]; each entry is one
+more run, `<bench>[WAVE_SLOTS=2]`, with those PARAMS added to any given on
+the command line. Runs with the same toplevel and parameters share one
+cached simulation image (see sim_cache.py), so the image is built once
+(`make sim_image`) before those benches run. The results are aggregated into
+one report (printed, and written to sim_build/regression/summary.json).
+
+    python test/regression.py                       # all benches, one job per core
+    python test/regression.py -j 4 -b simd_tb -b pc_tb
+    python test/regression.py SIM=verilator         # extra VAR=value args go to make
+'''
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = os.path.join(ROOT, "test")
+BUILD_DIR = os.path.join(ROOT, "sim_build", "regression")
+
+# one image build at a time per toplevel and parameters -- benches sharing it wait for the first
+_build_locks = defaultdict(threading.Lock)
+
+class Bench:
+    def __init__(self, module, toplevel, params=""):
+        self.module = module # TESTBENCH
+        self.toplevel = toplevel
+        self.params = params # PARAMS of this run, on top of the command line's
+        self.name = f"{module}[{params}]" if params else module
+        # no "=" or spaces in the path: make would read COCOTB_RESULTS_FILE's target as an assignment
+        self.out_dir = os.path.join(BUILD_DIR, re.sub(r"[^\w.-]+", "_", self.name).strip("_"))
+        self.results_file = os.path.join(self.out_dir, "results.xml")
+        self.log_file = os.path.join(self.out_dir, "run.log")
+
+def read_constant(path, name):
+    """Value of the bench's module level `name = <literal>`, or None."""
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name) and node.targets[0].id == name):
+            try:
+                return ast.literal_eval(node.value)
+            except ValueError:
+                return None
+    return None
+
+def read_toplevel(path):
+    """Value of the bench's module level `TOPLEVEL = "..."`, or None."""
+    toplevel = read_constant(path, "TOPLEVEL")
+    return toplevel if isinstance(toplevel, str) else None
+
+def discover(names=None):
+    benches = []
+    for path in sorted(glob.glob(os.path.join(TEST_DIR, "*_tb.py"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if names and name not in names:
+            continue
+        toplevel = read_toplevel(path)
+        if toplevel is None:
+            print(f"skipping {name}: no TOPLEVEL = \"...\" in {path}", file=sys.stderr)
+            continue
+        benches.append(Bench(name, toplevel))
+        benches.extend(Bench(name, toplevel, params) for params in read_constant(path, "REGRESSION_PARAMS") or [])
+    missing = set(names or []) - {b.module for b in benches}
+    if missing:
+        raise SystemExit(f"no such bench: {', '.join(sorted(missing))}")
+    return benches
+
+def parse_results(path):
+    """[(test name, status, wall seconds, sim time ns)] from a cocotb results.xml."""
+    tests = []
+    for case in ET.parse(path).getroot().iter("testcase"):
+        if case.find("failure") is not None or case.find("error") is not None:
+            status = "FAIL"
+        elif case.find("skipped") is not None:
+            status = "SKIP"
+        else:
+            status = "PASS"
+        tests.append((case.get("name"), status, float(case.get("time", 0)), float(case.get("sim_time_ns", 0))))
+    return tests
+
+def with_params(make_args, params):
+    """make_args with `params` added to their PARAMS=... (or as a new one)."""
+    if not params:
+        return list(make_args)
+    given = [a.split("=", 1)[1] for a in make_args if a.startswith("PARAMS=")]
+    rest = [a for a in make_args if not a.startswith("PARAMS=")]
+    return rest + ["PARAMS=" + " ".join(given + [params])]
+
+def run_bench(bench, make_args, wave=False):
+    os.makedirs(bench.out_dir, exist_ok=True)
+    if os.path.exists(bench.results_file):
+        os.remove(bench.results_file)
+
+    cmd = ["make", f"DUT={bench.toplevel}", f"TESTBENCH={bench.module}", f"WAVE={int(wave)}",
+           f"COCOTB_RESULTS_FILE={bench.results_file}"] + with_params(make_args, bench.params)
+    env = dict(os.environ, PWD=ROOT) # the makefile locates sources through $(PWD)
+
+    start = time.perf_counter()
+    with open(bench.log_file, "w") as log:
+        with _build_locks[bench.toplevel, bench.params]:
+            rc = subprocess.run(cmd + ["sim_image"], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT).returncode
+        if rc == 0:
+            log.flush()
+            rc = subprocess.run(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT).returncode
+    wall = time.perf_counter() - start
+
+    tests = parse_results(bench.results_file) if os.path.exists(bench.results_file) else []
+    if not tests:
+        status = "ERROR" # didn't build or crashed before writing results
+    elif any(t[1] == "FAIL" for t in tests):
+        status = "FAIL"
+    else:
+        status = "PASS"
+    return {"bench": bench.name, "toplevel": bench.toplevel, "status": status, "returncode": rc,
+            "wall_time_s": wall, "tests": tests, "log": bench.log_file}
+
+def report(results, wall):
+    width = max([20] + [len(r["bench"]) for r in results])
+    lines = [f"{'bench':<{width}} {'toplevel':<14} {'status':<6} {'tests':>5} {'fail':>4} {'wall s':>7}"]
+    for r in sorted(results, key=lambda r: r["bench"]):
+        fails = sum(t[1] == "FAIL" for t in r["tests"])
+        lines.append(f"{r['bench']:<{width}} {r['toplevel']:<14} {r['status']:<6} {len(r['tests']):>5} {fails:>4} {r['wall_time_s']:>7.1f}")
+        for name, status, _, _ in r["tests"]:
+            if status == "FAIL":
+                lines.append(f"    FAIL {name}")
+        if r["status"] == "ERROR":
+            lines.append(f"    no results, see {r['log']}")
+    serial = sum(r["wall_time_s"] for r in results)
+    lines.append(f"{len(results)} benches in {wall:.1f} s (sum of runs {serial:.1f} s)")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run every cocotb bench in parallel and aggregate the results")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="benches run at once (default: cores)")
+    parser.add_argument("-b", "--bench", action="append", help="only run this bench (repeatable)")
+    parser.add_argument("--wave", action="store_true", help="dump waveforms (off by default)")
+    parser.add_argument("make_args", nargs="*", help="extra VAR=value arguments passed to make")
+    args = parser.parse_args()
+
+    benches = discover(args.bench)
+    start = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        # each job just waits on its own make/simulator process
+        futures = [pool.submit(run_bench, b, args.make_args, args.wave) for b in benches]
+        for f in as_completed(futures):
+            r = f.result()
+            print(f"{r['status']:<6} {r['bench']} ({r['wall_time_s']:.1f} s)", flush=True)
+            results.append(r)
+    wall = time.perf_counter() - start
+
+    print(report(results, wall))
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    with open(os.path.join(BUILD_DIR, "summary.json"), "w") as f:
+        json.dump({"wall_time_s": wall, "benches": results}, f, indent=2)
+    sys.exit(0 if all(r["status"] == "PASS" for r in results) else 1)
@@ -0,0 +1,211 @@
+import numpy as np
+from cocotb.handle import NonHierarchyIndexableObject
+from common import SIMD_State, LSU_State, Fetcher_State, OpCode
+
+'''
+Cached signal access for the benches and memory/perf models.
+
+`dut.simd_wave_id[i].value` walks the hierarchy by name on every access, and
+turning values into ints or state names through try/except and Enum
+construction costs more than the read itself. Signals resolves each handle
+once and reports X/Z through masks instead of exceptions:
+
+    sig = Signals(dut)
+    sig.waves_done.read()                 # int, or None if any bit is X/Z
+    sig.simd_wave_id.read()               # (np.uint64 values, bool X mask), one entry per element
+    sig.simd_wave_id.signed()             # (np.int64 values, bool X mask)
+    sig.simd_wave_id[0].signed()          # one element, int or None
+    sig.mem_read_valid.bits()             # packed vector with X/Z bits as 0
+    sig.simd_ready.bit(1)                 # one bit of a packed vector, int or None
+    SignalWords(dut.wave_id).read()       # a vector wider than 64 bits as 64-bit words, like SignalArray
+    label(SIMD_STATE_NAMES, sig.simd_state.read())          # "EXECUTE" / "X"
+    labels(LSU_STATE_NAMES, *sig.lsu_state.read())          # array of names
+
+The *_NAMES tables cover every value of the signal's width (values with no
+enum member are their number) and end with "X", so index -1 is the X label
+and a whole masked array is named with one fancy index.
+'''
+
+def name_table(enum, width):
+    """Names for every `width`-bit value, followed by "X"."""
+    names = [str(v) for v in range(2**width)] + ["X"]
+    for member in enum:
+        names[member.value] = member.name
+    return np.array(names)
+
+SIMD_STATE_NAMES = name_table(SIMD_State, 3)
+LSU_STATE_NAMES = name_table(LSU_State, 2)
+FETCHER_STATE_NAMES = name_table(Fetcher_State, 3)
+OPCODE_NAMES = name_table(OpCode, 6)
+
+# signal name -> its table (trace_recorder renders these by name)
+NAME_TABLES = {
+    "simd_state": SIMD_STATE_NAMES,
+    "lsu_state": LSU_STATE_NAMES,
+    "fetcher_state": FETCHER_STATE_NAMES,
+    "op_code": OPCODE_NAMES,
+}
+
+def label(table, value):
+    """Name of one value read with Signal.read (None = X)."""
+    return table[-1] if value is None else table[value]
+
+def labels(table, values, xmask):
+    """Names of a whole array read with SignalArray.read."""
+    return table[np.where(xmask, -1, values.astype(np.intp))]
+
+def to_signed(values, width):
+    """Two's complement reinterpretation of `width`-bit unsigned values (array or int)."""
+    if isinstance(values, np.ndarray):
+        values = values.astype(np.int64)
+        if width < 64:
+            values = np.where(values >= 1 << (width - 1), values - (1 << width), values)
+        return values
+    return values - (1 << width) if values >= 1 << (width - 1) else values
+
+_X_TO_ZERO = str.maketrans("xXzZuUwW-", "000000000")
+
+class Signal:
+    """One scalar or packed signal (or parameter), resolved once."""
+    __slots__ = ("handle", "_width")
+
+    def __init__(self, handle):
+        self.handle = handle
+        self._width = None
+
+    @property
+    def width(self):
+        if self._width is None:
+            v = self.handle.value
+            self._width = 32 if isinstance(v, int) else len(v)
+        return self._width
+
+    def read(self):
+        """Unsigned value, or None if any bit is X/Z."""
+        v = self.handle.value
+        if isinstance(v, int): # parameters
+            return v
+        return v.integer if v.is_resolvable else None
+
+    def signed(self):
+        v = self.handle.value
+        if isinstance(v, int):
+            return v
+        return v.signed_integer if v.is_resolvable else None
+
+    def bits(self):
+        """Value with X/Z bits read as 0 (valid/ack vectors)."""
+        v = self.handle.value
+        if isinstance(v, int) or v.is_resolvable:
+            return int(v)
+        return int(v.binstr.translate(_X_TO_ZERO), 2)
+
+    def bit(self, i):
+        """Bit `i` of a packed vector, or None if it is X/Z."""
+        v = self.handle.value
+        if isinstance(v, int) or v.is_resolvable:
+            return int(v) >> i & 1
+        c = v.binstr[-1 - i]
+        return int(c) if c in "01" else None
+
+    def write(self, value):
+        self.handle.value = value
+
+class SignalArray:
+    """
+    An unpacked array (or a list of handles), with every element handle
+    resolved once. read() fills one NumPy array per call.
+    """
+    def __init__(self, handles):
+        if not isinstance(handles, (list, tuple)):
+            handles = [handles[i] for i in range(len(handles))]
+        self.handles = list(handles)
+        self.elements = [Signal(h) for h in self.handles]
+        self._width = None
+
+    def __len__(self):
+        return len(self.handles)
+
+    def __getitem__(self, i):
+        return self.elements[i]
+
+    @property
+    def width(self):
+        if self._width is None:
+            self._width = self.elements[0].width
+        return self._width
+
+    def read(self, out=None, xmask=None):
+        """(values, xmask): np.uint64 values with X/Z elements as 0 and flagged in the bool mask."""
+        if out is None:
+            out = np.zeros(len(self.handles), dtype=np.uint64)
+        if xmask is None:
+            xmask = np.zeros(len(self.handles), dtype=bool)
+        for i, h in enumerate(self.handles):
+            v = h.value
+            if v.is_resolvable:
+                out[i] = v.integer
+                xmask[i] = False
+            else:
+                out[i] = 0
+                xmask[i] = True
+        return out, xmask
+
+    def signed(self):
+        values, xmask = self.read()
+        return to_signed(values, self.width), xmask
+
+class SignalWords:
+    """
+    A packed vector wider than 64 bits (e.g. the SIMD's per-slot wave_id with
+    WAVE_SLOTS >= 3) read like a SignalArray: one np.uint64 element per 64-bit
+    word, least significant first, each flagged in the mask if any of its
+    bits is X/Z.
+    """
+    def __init__(self, handle):
+        self.handle = handle
+        self.width = Signal(handle).width
+        self.count = (self.width + 63) // 64
+
+    def __len__(self):
+        return self.count
+
+    def read(self, out=None, xmask=None):
+        """(values, xmask) of the words, as SignalArray.read."""
+        if out is None:
+            out = np.zeros(self.count, dtype=np.uint64)
+        if xmask is None:
+            xmask = np.zeros(self.count, dtype=bool)
+        v = self.handle.value
+        if v.is_resolvable:
+            value = v.integer
+            for i in range(self.count):
+                out[i] = value >> 64 * i & 0xFFFFFFFFFFFFFFFF
+                xmask[i] = False
+            return out, xmask
+        binstr = v.binstr
+        for i in range(self.count):
+            word = binstr[max(0, len(binstr) - 64 * (i + 1)):len(binstr) - 64 * i]
+            xmask[i] = not set(word) <= set("01")
+            out[i] = 0 if xmask[i] else int(word, 2)
+        return out, xmask
+
+class Signals:
+    """Handle cache for one DUT: sig.name / sig["name"] -> Signal or SignalArray."""
+    def __init__(self, dut):
+        self._dut = dut
+        self._cache = {}
+
+    def __getitem__(self, name):
+        s = self._cache.get(name)
+        if s is None:
+            handle = getattr(self._dut, name)
+            # exact type: packed vectors (ModifiableObject) subclass it too, unpacked arrays are exactly it
+            s = SignalArray(handle) if type(handle) is NonHierarchyIndexableObject else Signal(handle)
+            self._cache[name] = s
+        return s
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
@@ -0,0 +1,165 @@
+import argparse
+import hashlib
+import os
+import shutil
+import time
+from importlib.metadata import version, PackageNotFoundError
+
+'''
+Content-addressed cache of compiled simulation images.
+
+The makefile asks for the build directory of its configuration:
+
+    python sim_cache.py dir --sim icarus --toplevel SIMD --waves 0 \\
+        --params "LANE_WIDTH=8" --args "..." -I module module/*.v
+
+which prints .cache/sim/<key>, where the key hashes the simulator, toplevel,
+waveform setting, parameter overrides, compile args and the contents of
+every source and include file. The simulator's own makefile still compares
+file times, so on a hit every file of the entry is touched: a checkout,
+branch switch or edit-then-revert that leaves the sources newer than the
+image doesn't rebuild it. Re-running benches (or a sweep point seen before)
+then only pays for simulation, and changing Python tests never triggers a
+recompile. Entries are evicted least-recently-used first once the cache
+grows past --max-mb (default per simulator, MAX_MB), except those used in
+the last IN_USE_SECONDS: another make, e.g. one of regression.py's parallel
+jobs, may still be building or running them, so the cache can stay over
+budget until they age out.
+
+    python sim_cache.py list      # entries, sizes, last use
+    python sim_cache.py clean     # drop everything
+'''
+
+# bump when the key layout changes
+CACHE_VERSION = 1
+
+CACHE_DIR = os.environ.get("NOOB_SIM_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "sim"))
+# budget per simulator: verilator images are up to ~170 MB, a regression alone caches over 1 GB
+MAX_MB = {"verilator": 4096}
+DEFAULT_MAX_MB = 1024
+IN_USE_SECONDS = 2 * 3600 # an entry marked used this recently is never evicted
+INCLUDE_EXTS = (".v", ".vh", ".sv", ".svh")
+STAMP = ".last_used"
+IMAGES = ("Vtop", "sim.vvp") # verilator / icarus: an entry holding one is a finished build
+
+def input_files(sources, include_dirs):
+    """Sources plus every HDL file in the include dirs, deduplicated and sorted."""
+    files = {os.path.realpath(s) for s in sources}
+    for d in include_dirs:
+        for name in os.listdir(d):
+            if name.endswith(INCLUDE_EXTS):
+                files.add(os.path.realpath(os.path.join(d, name)))
+    return sorted(files, key=lambda p: (os.path.basename(p), p))
+
+def build_key(sim, toplevel, sources, include_dirs=(), params="", args="", waves=False):
+    h = hashlib.sha256()
+    try:
+        cocotb_version = version("cocotb")
+    except PackageNotFoundError:
+        cocotb_version = "unknown"
+    header = [f"noob-sim-v{CACHE_VERSION}", f"cocotb={cocotb_version}", f"sim={sim}", f"toplevel={toplevel}",
+              f"waves={int(bool(waves))}", f"params={' '.join(sorted(params.split()))}", f"args={' '.join(args.split())}"]
+    h.update("\n".join(header).encode())
+    for path in input_files(sources, include_dirs):
+        # file names, not absolute paths, so moving the checkout keeps the key
+        h.update(f"\n{os.path.basename(path)}\n".encode())
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:24]
+
+def entry_size(path):
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+def last_used(path):
+    try:
+        return os.path.getmtime(os.path.join(path, STAMP))
+    except OSError:
+        return os.path.getmtime(path)
+
+def entries(cache_dir):
+    if not os.path.isdir(cache_dir):
+        return []
+    paths = [os.path.join(cache_dir, d) for d in os.listdir(cache_dir)]
+    return sorted((p for p in paths if os.path.isdir(p)), key=last_used)
+
+def evict(cache_dir, max_bytes, keep=(), in_use=IN_USE_SECONDS):
+    """
+    Remove least recently used entries until the cache fits in max_bytes,
+    skipping `keep` and entries used in the last `in_use` seconds; returns
+    removed paths.
+    """
+    keep = {os.path.realpath(k) for k in keep}
+    sized = [(p, entry_size(p)) for p in entries(cache_dir)]
+    total = sum(s for _, s in sized)
+    now = time.time()
+    removed = []
+    for path, size in sized:
+        if total <= max_bytes:
+            break
+        if os.path.realpath(path) in keep or now - last_used(path) < in_use:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed.append(path)
+    return removed
+
+def refresh(path):
+    """
+    Touch every file of a finished build so make sees it as newer than the
+    sources (the key already proves they match); returns True on a hit.
+    """
+    if not any(os.path.exists(os.path.join(path, image)) for image in IMAGES):
+        return False # new or unfinished build: leave it to make
+    now = time.time()
+    for dirpath, _, files in os.walk(path):
+        for name in files:
+            os.utime(os.path.join(dirpath, name), (now, now))
+    return True
+
+def build_dir(cache_dir, key, max_mb=DEFAULT_MAX_MB):
+    """Directory for `key` (created, brought up to date and marked used), evicting old entries if the cache is over budget."""
+    path = os.path.join(os.path.abspath(cache_dir), key)
+    os.makedirs(path, exist_ok=True)
+    refresh(path)
+    with open(os.path.join(path, STAMP), "w") as f:
+        f.write(f"{time.time()}\n")
+    evict(cache_dir, max_mb * 2**20, keep=[path])
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Content-addressed simulation build cache")
+    parser.add_argument("--cache", default=CACHE_DIR, help="cache directory")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    d = sub.add_parser("dir", help="print (and create) the build directory for a configuration")
+    d.add_argument("--sim", required=True)
+    d.add_argument("--toplevel", required=True)
+    d.add_argument("--waves", default="0")
+    d.add_argument("--params", default="", help="parameter overrides, e.g. 'LANE_WIDTH=8 WAVE_SIZE=64'")
+    d.add_argument("--args", default="", help="extra compile args")
+    d.add_argument("--max-mb", type=int, help="evict least recently used entries beyond this size (default: MAX_MB of --sim)")
+    d.add_argument("-I", dest="include_dirs", action="append", default=[])
+    d.add_argument("sources", nargs="+")
+    sub.add_parser("list", help="show cached images")
+    sub.add_parser("clean", help="remove every cached image")
+    args = parser.parse_args()
+
+    if args.cmd == "dir":
+        key = build_key(args.sim, args.toplevel, args.sources, args.include_dirs, args.params, args.args, args.waves == "1")
+        print(build_dir(args.cache, key, args.max_mb or MAX_MB.get(args.sim, DEFAULT_MAX_MB)))
+    elif args.cmd == "list":
+        total = 0
+        for path in entries(args.cache):
+            size = entry_size(path)
+            total += size
+            age = time.time() - last_used(path)
+            print(f"{os.path.basename(path)}  {size / 2**20:8.1f} MB  used {age / 60:6.0f} min ago")
+        print(f"total {total / 2**20:.1f} MB in {args.cache}")
+    else:
+        shutil.rmtree(args.cache, ignore_errors=True)
@@ -1,181 +1,69 @@
+import os
+import tempfile
+import numpy as np
 import cocotb
 from cocotb.clock import Clock
-from cocotb.triggers import RisingEdge, Timer
+from cocotb.triggers import RisingEdge, ReadOnly, Timer
+from cocotb.utils import get_sim_time
 from common import *
+from isa_sim import IsaSimulator
+from assembler import assemble, assemble_file, KERNEL_DIR
+from memory import ProgramMemoryModel, DataMemoryModel, uniform_latency
+from host_buffers import HostBuffers
+from trace_recorder import TraceRecorder, dump_on_failure
+from perf import read_perf_counters
+from signals import Signals
+from benchmarks import mask_mem
+
+TOPLEVEL = "SIMD" # module this bench drives (DUT=...)
+# also run by regression.py, so the wave slot tests run by default (see test_simd_wave_slots*)
+REGRESSION_PARAMS = ["WAVE_SLOTS=2", "WAVE_SLOTS=2 PIPELINED=1", "WAVE_SLOTS=3", "WAVE_SLOTS=3 PIPELINED=1"]
 
 BLOCK_DIM = 64
-WAVE_SIZE = 32
-NUM_THREADS = 32 # number of threads to launch for this test
-LANE_WIDTH = 16
+WAVE_SIZE = bench_param("WAVE_SIZE", 32)
+NUM_THREADS = 32 # number of threads to launch for this test (vector_add.s is laid out for 32)
+LANE_WIDTH = bench_param("LANE_WIDTH", 16)
 DATA_WIDTH = 64
-ADDR_WIDTH = 7  # 128 locations for data memory
+ADDR_WIDTH = bench_param("DATA_MEM_ADDR_WIDTH", 7)  # 128 locations for data memory by default
+TOTAL_WAVE_CYCLES = (WAVE_SIZE + LANE_WIDTH - 1) // LANE_WIDTH
+# wave cycles vector add runs: past NUM_THREADS lanes are masked and empty wave cycles skipped (e.g. LANE_WIDTH=64)
+VECTOR_ADD_WAVE_CYCLES = (min(NUM_THREADS, WAVE_SIZE) + LANE_WIDTH - 1) // LANE_WIDTH
+ICACHE_LINES = bench_param("ICACHE_LINES", 0) # instruction buffer lines (0 = none)
+PIPELINED = bench_param("PIPELINED", 0) # overlap fetch/decode with execute
+WAVE_SLOTS = bench_param("WAVE_SLOTS", 1) # resident waves
+FETCH_LATENCY = 8 # program memory latency for test_simd_vector_add_fetch_latency
 
 # --- Simulate the kernel in one SIMD over two wavecycles ---
-### Calculate global_id ###
-# MUL R4, %blockIdx, %blockDim # 0 * 64
-# ADD R4, R4, %threadIdx ; i = blockIdx * blockDim + threadIdx 
-
-
-### Placing data memory addresses of matrices in registers ###
-# CONST R5, #0 ; baseA (matrix A base address) 
-# CONST R6, #32 ; baseB (matrix B base address) 
-# CONST R7, #64 ; baseC (matrix C base address) 
-
-### Calculating A[i] address and getting from data memory ###
-# ADD R8, R5, R4 ; addr(A[i]) = baseA + i 
-# LDR R8, R8 ; load A[i] from global memory 
-
-### Calculating B[i] address and getting from data memory ###
-# ADD R9, R6, R4 ; addr(B[i]) = baseB + i 
-# LDR R9, R9 ; load B[i] from global memory 
-
-### Addition of A[i], B[i] ###
-# ADD R10, R8, R9 ; C[i] = A[i] + B[i] 
-
-### Calculating C[i] and storing computed sum in data memory ###
-# ADD R11, R7, R4 ; addr(C[i]) = baseC + i 
-# STR R10, R11 ; store C[i] in global memory 
-
-# RET ; end of kernel
-
-A = [i for i in range(WAVE_SIZE)]
-B = [i for i in range(WAVE_SIZE)]
-C_expected = [A[i] + B[i] for i in range(WAVE_SIZE)]
-
-async def log_signals(dut, DEBUG=False):
-    cycle = 0
-    while True:
-        await RisingEdge(dut.clk)
-        if (DEBUG):
-            dut._log.info(
-                f"\n---- CYCLE {cycle} ----\n"
-                f"INSTRUCTION={safe_hex(dut.instruction.value)}, PC={safe_int(dut.curr_pc.value)}, PC_OUT={safe_int(dut.pc_out.value)}\n"
-                f"OPCODE={get_state(OpCode, safe_int(dut.op_code.value))}, Total_Wave_Cycles={safe_int(dut.TOTAL_WAVE_CYCLES.value)}\n"
-                
-                f"rst={safe_int(dut.rst.value)} enable={safe_int(dut.enable.value)}\n"
-                f"FETCHER_STATE={get_state(Fetcher_State, dut.fetcher_state.value)}\n"
-                f"SIMD_STATE={get_state(SIMD_State, dut.simd_state.value)} wave_id={safe_int(dut.wave_id.value)}, wave_cycle={safe_int(dut.curr_wave_cycle.value)}\n"
-                f"simd_ready={safe_int(dut.simd_ready.value)}, simd_start={safe_int(dut.simd_start.value)}, simd_working={safe_int(dut.simd_working.value)}, simd_done={safe_int(dut.simd_done.value)}\n"
-                f"Rd={safe_int(dut.rd.value)}, Rm={safe_int(dut.rm.value)}, Rn={safe_int(dut.rn.value)}\n"
-            )
-
-            dut._log.info("------------------------------------------------------- \n"
-                f"PROG_MEM_READ={safe_int(dut.prog_mem_read_valid.value)} "
-                f"PROG_MEM_ACK={safe_int(dut.prog_mem_read_ack.value)}\n"
-                f"DATA_MEM_READ={safe_int(dut.MEM_READ.value)} DATA_MEM_WRITE={safe_int(dut.MEM_WRITE.value)}\n"
-                f"REG_WRITE={safe_int(dut.REG_WRITE.value)}\n"
-                f"------------------------------------------------------- \n")
-
-            dut._log.info("------------------------------------------------------- \n")
-            for lane in range(LANE_WIDTH):
-                dut._log.info(
-                    f"  Lane {safe_int(dut.lane_id[lane])}: "
-                    f"ThreadIdx: {safe_int(dut.out_thread_id_x[lane].value)} "
-                    #f"LSU_State: {get_state(LSU_State, dut.lsu_state[lane].value)} "
-                    f"rm_data={safe_int(dut.rm_data[lane].value)}, rn_data={safe_int(dut.rn_data[lane].value)} " 
-                    f"ALU_Out: {safe_int(dut.alu_out[lane].value)} "
-                    f"mem_read_valid={safe_int(dut.mem_read_valid[lane].value)} "
-                    f"mem_write_valid={safe_int(dut.mem_write_valid[lane].value)} "
-                    f"mem_addr={safe_int(dut.mem_addr[lane].value)} "
-                    f"mem_write_data={safe_int(dut.mem_write_data[lane].value)} "
-                    f"mem_read_data={safe_int(dut.mem_read_data[lane].value)}"
-                )
-            dut._log.info("\n ------------------------------------------------------- \n")
-        
-        else:
-            op_str = get_state(OpCode, safe_int(dut.op_code.value))
-            simd_str = get_state(SIMD_State, dut.simd_state.value)
-            pc = safe_int(dut.curr_pc.value)
-            print(f"Cycle: {cycle:3} | PC: {pc:2} | OPCODE: {op_str:<8} | SIMD_STATE: {simd_str}")
-            for lane in range(LANE_WIDTH):
-                thread_id = safe_int(dut.out_thread_id_x[lane].value)
-                alu_out = safe_int(dut.alu_out[lane].value)
-                print(f"  Lane {lane:2}: ThreadIdx={thread_id:2}, ALU_Out={alu_out}")
-        
-        cycle += 1
-    
-class ProgramMemoryModel:
-    def __init__(self, dut):
-        self.dut = dut
-        self.mem = [0] * 64
-
-    async def run(self):
-        while True:
-            await RisingEdge(self.dut.clk)
-            try:
-                # signaled for a prog_mem read
-                valid = safe_int(self.dut.prog_mem_read_valid.value)
-            except Exception:
-                valid = 0
-            if valid == 1:
-                addr = safe_int(self.dut.prog_mem_addr.value)
-                self.dut.prog_mem_read_data.value = self.mem[addr]
-                self.dut.prog_mem_read_ack.value = 1
-
-            else:
-                self.dut.prog_mem_read_ack.value = 0
-
-class DataMemoryModel:
-    def __init__(self, dut):
-        self.dut = dut
-        self.mem = [0] * (2**ADDR_WIDTH)
-
-    async def run(self):
-        while True:
-            await RisingEdge(self.dut.clk)
-            for lane in range(LANE_WIDTH):
-                # LOAD
-                try:
-                    valid = safe_int(self.dut.mem_read_valid[lane].value)
-                except Exception:
-                    valid = 0
-                if valid == 1:
-                    addr = safe_int(self.dut.mem_addr[lane].value)
-                    self.dut.mem_read_data[lane].value = self.mem[addr]
-                    self.dut.data_mem_read_ack[lane].value = 1
-                else:
-                    self.dut.data_mem_read_ack[lane].value = 0
-
-                # STORE
-                try:
-                    valid = safe_int(self.dut.mem_write_valid[lane].value)
-                except Exception:
-                    valid = 0
-                if valid == 1:
-                    addr = safe_int(self.dut.mem_addr[lane].value)
-                    data = safe_int(self.dut.mem_write_data[lane].value)
-                    self.mem[addr] = data
-                    self.dut.data_mem_write_ack[lane].value = 1
-                else:
-                    self.dut.data_mem_write_ack[lane].value = 0
-    
-    def dump(self, line_width = 4):
-        """Print memory contents as Addr[N]: VALUE for each address."""
-        mem_size = len(self.mem)
-
-        print("\nData Memory Dump:")
-        print("-" * 30)
-
-        for addr in range(mem_size):
-            if addr % line_width == 0:
-                if addr != 0:
-                    print()
+# see kernels/vector_add.s
+VECTOR_ADD = os.path.join(KERNEL_DIR, "vector_add.s")
 
-            if (addr == NUM_THREADS * 2):
-                print("-"*15 + "Result addresses" + "-"*15)
+A = np.arange(WAVE_SIZE)
+B = np.arange(WAVE_SIZE)
+C_expected = A + B
 
-            print(f"M[{addr:3}]: {self.mem[addr]:<5}", end="  ")
+# signals kept in the trace ring buffer (dumped to traces/ on failure)
+TRACE_SIGNALS = [
+    "rst", "enable",
+    "instruction", "curr_pc", "pc_out", "op_code",
+    "fetcher_state", "simd_state", "wave_id", "curr_slot", "curr_wave_cycle",
+    "next_instruction", "next_pc", "next_ready", "issue",
+    "simd_ready", "simd_start", "simd_working", "simd_done",
+    "rd", "rm", "rn",
+    "prog_mem_read_valid", "prog_mem_read_ack",
+    "MEM_READ", "MEM_WRITE", "REG_WRITE",
+    "mem_read_valid", "mem_write_valid",
+    "out_thread_id_x[]", "lsu_state[]", "rm_data[]", "rn_data[]", "alu_out[]",
+    "mem_addr[]", "mem_write_data[]", "mem_read_data[]",
+]
 
-    print("\n" + "-" * 30)
-
-@cocotb.test()
-async def test_simd_vector_add(dut):
-    # Logger
-    cocotb.start_soon(log_signals(dut))
+async def run_vector_add(dut, data_mem, name, prog_mem=None):
+    """Run the vector add kernel on one SIMD against `data_mem`; returns cycles to simd_done."""
+    # Trace
+    trace = TraceRecorder(dut, TRACE_SIGNALS, name=name)
+    cocotb.start_soon(trace.run())
 
     # Initialize models
-    data_mem = DataMemoryModel(dut)
-    prog_mem = ProgramMemoryModel(dut)
+    prog_mem = prog_mem or ProgramMemoryModel(dut)
     cocotb.start_soon(data_mem.run())
     cocotb.start_soon(prog_mem.run())
     
@@ -184,35 +72,23 @@ async def test_simd_vector_add(dut):
     cocotb.start_soon(clock.start())
         
     # Initialize data memory
-    for i in range(NUM_THREADS):
-        data_mem.mem[i] = i # Vector A: 0-31
-        data_mem.mem[i+NUM_THREADS] = i # Vector B: 32-63
+    host = HostBuffers(data_mem.mem)
+    host.stage("A", 0, A[:NUM_THREADS]) # Vector A: 0-31
+    host.stage("B", NUM_THREADS, B[:NUM_THREADS]) # Vector B: 32-63
+    host.alloc("C", NUM_THREADS * 2, NUM_THREADS)
+    initial_mem = data_mem.mem.copy()
     
-    data_mem.dump()
+    data_mem.dump(result_base=NUM_THREADS * 2)
     
     # Load vector addition program
-    instructions = [
-        0b000100_0000100_0011100_0011101_00000, # MUL R4, R28, R29 
-        0b000010_0000100_0000100_0011110_00000, # ADD R4, R4, R30
-        0b001000_0000101_0000000_0000000_00000, # CONST R5, 0
-        0b001000_0000110_0000000_0000001_00000, # CONST R6, 32
-        0b001000_0000111_0000000_0000010_00000, # CONST R7, 64
-        0b000010_0001000_0000101_0000100_00000, # ADD R8, R5, R4
-        0b000000_0001000_0001000_0000000_00000, # LDUR R8, R8
-        0b000010_0001001_0000110_0000100_00000, # ADD R9, R6, R4
-        0b000000_0001001_0001001_0000000_00000, # LDUR R9, R9
-        0b000010_0001010_0001000_0001001_00000, # ADD R10, R8, R9
-        0b000010_0001011_0000111_0000100_00000, # ADD R11, R7, R4
-        0b000001_0000000_0001011_0001010_00000, # STUR R10, R11
-        0b111111_0000000_0000000_0000000_00000 # RET
-    ]
-    for i, instr in enumerate(instructions):
-        prog_mem.mem[i] = instr
+    instructions = assemble_file(VECTOR_ADD)
+    prog_mem.load(instructions)
     
     # set initial state
     # Reset
     dut.rst.value = 1
     dut.enable.value = 1
+    dut.perf_addr.value = 0
     await Timer(20, units="ns")
     dut.rst.value = 0
     await RisingEdge(dut.clk)
@@ -221,7 +97,7 @@ async def test_simd_vector_add(dut):
     dut.block_dim.value = BLOCK_DIM
     dut.block_id.value = 0
     dut.wave_id.value = 0
-    dut.num_waves_in_block.value = 1
+    dut.num_block_threads.value = NUM_THREADS
     dut.simd_ready.value = 0
     dut.simd_start.value = 1
     dut.simd_working.value = 1
@@ -229,14 +105,355 @@ async def test_simd_vector_add(dut):
     dut.simd_start.value = 0
     await RisingEdge(dut.clk)
 
+    cycles = 2
     while dut.simd_done.value != 1:
         await RisingEdge(dut.clk)    
+        cycles += 1
     
+    data_mem.dump(result_base=NUM_THREADS * 2)
+
+    host.check("C", C_expected[:NUM_THREADS]) # A[i] + B[i]
+
+    # RTL memory image should match the functional model
+    isa = IsaSimulator(WAVE_SIZE, LANE_WIDTH, ADDR_WIDTH)
+    golden = isa.run(instructions, NUM_THREADS, BLOCK_DIM, initial_mem)
+    mismatch = data_mem.mem.diff(golden, limit=1)
+    assert not mismatch, f"M[{mismatch[0]}] differs from ISA model: {data_mem.mem[mismatch[0]]} vs {golden[mismatch[0]]}"
+
+    # every instruction retires once per wave cycle; each lane with a thread makes 2 loads + 1 store per wave cycle
+    perf = await read_perf_counters(dut, LANE_WIDTH)
+    perf.report(dut._log, instructions)
+    threads = min(NUM_THREADS, WAVE_SIZE)
+    lane_cycles = [sum(1 for c in range(VECTOR_ADD_WAVE_CYCLES) if c * LANE_WIDTH + lane < threads) for lane in range(LANE_WIDTH)]
+    assert perf.retired == isa.retired * VECTOR_ADD_WAVE_CYCLES, f"retired {perf.retired}, expected {isa.retired * VECTOR_ADD_WAVE_CYCLES}"
+    assert perf.mem_requests == [3 * c for c in lane_cycles], f"unexpected per-lane requests {perf.mem_requests}"
+    assert perf.pc_retired.sum() == perf.retired
+    assert perf.pc_cycles.sum() == perf.busy_cycles - perf.state_cycles["DONE"]
+    if PIPELINED:
+        # only the first instruction of a wave cycle goes through DECODE; only loads/stores through REQUEST
+        mem_instructions = sum(1 for word in instructions if word >> 26 in (OpCode.LOAD.value, OpCode.STORE.value))
+        assert perf.state_cycles["DECODE"] == VECTOR_ADD_WAVE_CYCLES, f"{perf.state_cycles['DECODE']} DECODE cycles with prefetch"
+        assert perf.state_cycles["REQUEST"] == mem_instructions * VECTOR_ADD_WAVE_CYCLES, \
+            f"{perf.state_cycles['REQUEST']} REQUEST cycles for {mem_instructions} memory instructions"
+
+    dut._log.info(f"SIMD vector addition kernel test passed for all lanes ({cycles} cycles, PIPELINED={PIPELINED}).")
+    return cycles
+
+@cocotb.test()
+@dump_on_failure
+async def test_simd_vector_add(dut):
+    await run_vector_add(dut, DataMemoryModel(dut, ADDR_WIDTH), "simd_vector_add")
+
+@cocotb.test()
+@dump_on_failure
+async def test_simd_vector_add_dram_latency(dut):
+    """Same kernel against a DRAM-like memory: 20-40 cycle latency, 4 requests started per cycle."""
+    data_mem = DataMemoryModel(dut, ADDR_WIDTH, latency=uniform_latency(20, 40, seed=1), issue_width=4)
+    await run_vector_add(dut, data_mem, "simd_vector_add_dram_latency")
+    stats = data_mem.report()
+    assert stats["requests"] == 3 * NUM_THREADS, f"expected 2 loads + 1 store per thread, got {stats['requests']} requests"
+    assert stats["min_latency"] >= 20, f"requests should take at least 20 cycles, got {stats['min_latency']}"
+
+@cocotb.test()
+@dump_on_failure
+async def test_simd_vector_add_fetch_latency(dut):
+    """
+    Same kernel with a slow program memory. Without an instruction buffer every
+    fetch pays FETCH_LATENCY; with one (PARAMS="ICACHE_LINES=16") only the first
+    fetch of each instruction does -- the second wave cycle restarts at PC 0 and hits.
+    """
+    prog_mem = ProgramMemoryModel(dut, latency=FETCH_LATENCY)
+    cycles = await run_vector_add(dut, DataMemoryModel(dut, ADDR_WIDTH), "simd_vector_add_fetch_latency", prog_mem)
+    perf = await read_perf_counters(dut, LANE_WIDTH)
+    fetches = perf.retired # one fetch per instruction per wave cycle
+    if ICACHE_LINES:
+        program_length = perf.retired // VECTOR_ADD_WAVE_CYCLES
+        assert prog_mem.reads == program_length, f"expected one program memory read per instruction, got {prog_mem.reads}"
+        assert perf.icache_misses == program_length and perf.icache_hits == fetches - program_length, \
+            f"instruction buffer counted {perf.icache_hits} hits / {perf.icache_misses} misses for {fetches} fetches"
+    else:
+        assert prog_mem.reads == fetches, f"expected {fetches} program memory reads, got {prog_mem.reads}"
+    dut._log.info(f"{FETCH_LATENCY}-cycle program memory, ICACHE_LINES={ICACHE_LINES}: {cycles} cycles, "
+                  f"{prog_mem.reads} program memory reads for {fetches} fetches")
+
+@cocotb.test()
+@dump_on_failure
+async def test_simd_saxpy_sparse(dut):
+    """
+    saxpy.s with X and Y at the top quarters of the address space (GB apart with
+    PARAMS="DATA_MEM_ADDR_WIDTH=32"), staged from and saved to .npy files.
+    """
+    base_x = 2**(ADDR_WIDTH - 2)
+    base_y = 3 * 2**(ADDR_WIDTH - 2)
+    x = np.arange(1, NUM_THREADS + 1, dtype=np.int64)
+    y = 100 * np.arange(NUM_THREADS, dtype=np.int64)
+    tmp = tempfile.TemporaryDirectory()
+    np.save(os.path.join(tmp.name, "x.npy"), x)
+    y.tofile(os.path.join(tmp.name, "y.bin"))
+
+    data_mem = DataMemoryModel(dut, ADDR_WIDTH)
+    prog_mem = ProgramMemoryModel(dut)
+    program = assemble_file(os.path.join(KERNEL_DIR, "saxpy.s"))
+    prog_mem.load(program)
+    host = HostBuffers(data_mem.mem)
+    host.stage("args", 0, [base_x, base_y, 3])
+    host.stage("X", base_x, os.path.join(tmp.name, "x.npy"))
+    host.stage("Y", base_y, os.path.join(tmp.name, "y.bin"), dtype=np.int64)
+    initial_mem = data_mem.mem.copy()
+
+    cocotb.start_soon(data_mem.run())
+    cocotb.start_soon(prog_mem.run())
+    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+
+    dut.rst.value = 1
+    dut.enable.value = 1
+    dut.perf_addr.value = 0
+    await Timer(20, units="ns")
+    dut.rst.value = 0
+    await RisingEdge(dut.clk)
+
+    dut.num_threads.value = NUM_THREADS
+    dut.block_dim.value = BLOCK_DIM
+    dut.block_id.value = 0
+    dut.wave_id.value = 0
+    dut.num_block_threads.value = NUM_THREADS
+    dut.simd_ready.value = 0
+    dut.simd_start.value = 1
+    dut.simd_working.value = 1
+    await RisingEdge(dut.clk)
+    dut.simd_start.value = 0
+    while dut.simd_done.value != 1:
+        await RisingEdge(dut.clk)
+
     data_mem.dump()
+    host.check("Y", 3 * x + y)
+    # results go back out as .npy; the staged input file is untouched (copy-on-write)
+    assert (np.load(host.save("Y", os.path.join(tmp.name, "out.npy"), np.int64)) == 3 * x + y).all()
+    assert (np.fromfile(os.path.join(tmp.name, "y.bin"), dtype=np.int64) == y).all(), "kernel stores reached y.bin"
+
+    golden = IsaSimulator(WAVE_SIZE, LANE_WIDTH, ADDR_WIDTH).run(program, NUM_THREADS, BLOCK_DIM, initial_mem)
+    mismatch = data_mem.mem.diff(golden, limit=1)
+    assert not mismatch, f"M[{mismatch[0]}] differs from ISA model: {data_mem.mem[mismatch[0]]} vs {golden[mismatch[0]]}"
+
+    # a plain array is copied in, not shared: a store leaves the caller's array as it was
+    page = np.arange(data_mem.mem.page_words, dtype=np.int64)
+    HostBuffers(data_mem.mem).stage("page", 0, page)
+    data_mem.mem[5] = 999
+    assert page[5] == 5 and data_mem.mem[5] == 999, "a store to data memory reached the staged array"
+
+    # arguments, X and Y each sit in their own page (or share the one page of a small memory)
+    assert len(data_mem.mem.pages) <= 3, f"{len(data_mem.mem.pages)} pages allocated"
+    dut._log.info(f"saxpy over a 2**{ADDR_WIDTH} word address space used {data_mem.mem.nbytes // 2**10} KiB of pages")
+
+async def count_slot_paths(dut, paths):
+    """
+    Count, every clock, the SimdController's multi-wave paths into `paths`:
+    "blocked" -- a wave in REQUEST with a load/store while the LSUs hold another
+    wave's; "release" -- a parked wave's load/store written back in the
+    background; "deferred" -- that release held back by the running wave's UPDATE.
+    """
+    ctl = Signals(dut.simdController)
+    while True:
+        await RisingEdge(dut.clk)
+        await ReadOnly()
+        state = ctl.simd_state.read()
+        owned = ctl.lsu_owned.read()
+        owner = ctl.lsu_owner.read()
+        if state == SIMD_State.REQUEST.value and ctl.mem_op.read() and owned and owner != ctl.curr_slot.read():
+            paths["blocked"] += 1
+        if ctl.lsu_release.read():
+            paths["release"] += 1
+        if state == SIMD_State.UPDATE.value and owned and ctl.slot_parked.bit(owner) and not ctl.lane_waiting.read():
+            paths["deferred"] += 1
+
+# A[i] = (A[i] & mask) + i*i + 1 -- the ALU chain after the second load keeps one wave going
+# through UPDATE while another wave's load finishes in the background
+RELEASE_KERNEL = """
+MUL R4, %blockIdx, %blockDim
+ADD R4, R4, %threadIdx
+CONST R1, #1
+LDUR R5, %zero
+LDUR R6, R1
+ADD R8, R5, R4
+LDUR R9, R8
+AND R9, R9, R6
+MUL R10, R4, R4
+ADD R10, R10, R1
+SUB R11, R10, R4
+ADD R11, R11, R4
+MUL R12, R11, R1
+ADD R9, R9, R12
+STUR R9, R8
+RET
+"""
+
+async def run_waves(dut, name, concurrent, program, latency):
+    """
+    `program` over one wave per slot (WAVE_SLOTS * WAVE_SIZE threads, one
+    block, mask.s's memory layout) against a memory with `latency`, wave i
+    in slot i all together or one after the other in slot 0; returns
+    (cycles, wave switches, clocks on each count_slot_paths path).
+    """
+    sig = Signals(dut)
+    paths = {"blocked": 0, "release": 0, "deferred": 0}
+    num_threads = WAVE_SLOTS * WAVE_SIZE
+    init = mask_mem(num_threads)
+    prog_mem = ProgramMemoryModel(dut)
+    prog_mem.load(program)
+    data_mem = DataMemoryModel(dut, ADDR_WIDTH, latency=latency, issue_width=4)
+    data_mem.mem[:len(init)] = init
+    trace = TraceRecorder(dut, TRACE_SIGNALS, name=name)
+    tasks = [cocotb.start_soon(t.run()) for t in (prog_mem, data_mem, trace)]
+
+    dut.rst.value = 1
+    dut.enable.value = 1
+    dut.perf_addr.value = 0
+    dut.simd_start.value = 0
+    await Timer(20, units="ns")
+    dut.rst.value = 0
+    await RisingEdge(dut.clk)
+    tasks.append(cocotb.start_soon(count_slot_paths(dut, paths)))
+    dut.num_threads.value = num_threads
+    dut.block_dim.value = num_threads
+    dut.block_id.value = 0
+    dut.num_block_threads.value = sum(num_threads << 32 * slot for slot in range(WAVE_SLOTS)) # every wave is block 0's
+    dut.simd_ready.value = 0
+    dut.simd_working.value = 0
+
+    async def run(waves):
+        """Start {slot: wave_id} and wait until every one of them is done."""
+        sig.wave_id.write(sum(wave << 32 * slot for slot, wave in waves.items()))
+        sig.simd_start.write(sum(1 << slot for slot in waves))
+        await RisingEdge(dut.clk)
+        sig.simd_start.write(0)
+        while True:
+            await RisingEdge(dut.clk)
+            await ReadOnly()
+            if all(sig.simd_done.bit(slot) for slot in waves):
+                break
+        await RisingEdge(dut.clk)
+
+    cycles = 0
+    waves = range(WAVE_SLOTS)
+    for waves in ([{slot: slot for slot in waves}] if concurrent else [{0: wave} for wave in waves]):
+        start = get_sim_time("ns")
+        await run(waves)
+        cycles += int(get_sim_time("ns") - start) // 10
+
+    golden = IsaSimulator(WAVE_SIZE, LANE_WIDTH, ADDR_WIDTH).run(program, num_threads, num_threads, init)
+    mismatch = data_mem.mem.diff(golden, limit=1)
+    assert not mismatch, f"{name}: M[{mismatch[0]}] differs from ISA model: {data_mem.mem[mismatch[0]]} vs {golden[mismatch[0]]}"
+    perf = await read_perf_counters(dut, LANE_WIDTH)
+    perf.report(dut._log, program)
+    for t in tasks:
+        t.kill()
+    return cycles, perf.wave_switches, paths
+
+@cocotb.test(skip=WAVE_SLOTS < 2)
+@dump_on_failure
+async def test_simd_wave_slots(dut):
+    """
+    Resident waves (PARAMS="WAVE_SLOTS=2", or more) hide each other's memory
+    latency: while one waits on its load, another runs.
+    """
+    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+    program = assemble_file(os.path.join(KERNEL_DIR, "mask.s"))
+    latency = lambda: uniform_latency(20, 40, seed=1)
+    serial, _, _ = await run_waves(dut, "simd_wave_slots_serial", False, program, latency())
+    overlapped, switches, paths = await run_waves(dut, "simd_wave_slots_overlapped", True, program, latency())
+    dut._log.info(f"mask.s, {WAVE_SLOTS} waves, 20-40 cycle memory: {serial} cycles one after the other, "
+                  f"{overlapped} cycles resident together ({switches} wave switches, clocks per path {paths})")
+    assert switches > 0, "waves stalled on memory should have been switched"
+    assert overlapped < serial, f"resident waves should hide latency ({overlapped} vs {serial} cycles)"
+    assert paths["blocked"] > 0, "a wave should have waited in REQUEST on another wave's load/store"
+    assert paths["release"] > 0, "a parked wave's load should have been written back in the background"
+
+@cocotb.test(skip=WAVE_SLOTS < 2)
+@dump_on_failure
+async def test_simd_wave_slots_release(dut):
+    """
+    Background writeback held back by the running wave's UPDATE
+    (PARAMS="WAVE_SLOTS=2", or more): over a range of fixed memory
+    latencies, a parked wave's load finishes on an UPDATE clock of another
+    wave's ALU chain at least once, and every run still matches the ISA model.
+    """
+    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+    program = assemble(RELEASE_KERNEL)
+    total = {"blocked": 0, "release": 0, "deferred": 0}
+    for latency in range(20, 28):
+        _, _, paths = await run_waves(dut, f"simd_wave_slots_release_{latency}", True, program, latency)
+        for path, clocks in paths.items():
+            total[path] += clocks
+    dut._log.info(f"{WAVE_SLOTS} waves, 20-27 cycle memory: clocks per path {total}")
+    assert total["deferred"] > 0, "no parked wave's load finished on an UPDATE clock"
+    assert total["blocked"] > 0 and total["release"] > 0, f"multi-wave paths not taken: {total}"
 
-    for i in range(NUM_THREADS):
-        actual = data_mem.mem[NUM_THREADS*2 + i]
-        expected = i + i  # A[i] + B[i]
-        assert actual == expected, f"Mismatch at {i}: {actual} vs {expected}"
+async def run_partial_wave(dut, num_threads):
+    """mask.s over one wave of which only `num_threads` threads exist; returns (cycles, perf, data memory stats)."""
+    program = assemble_file(os.path.join(KERNEL_DIR, "mask.s"))
+    init = mask_mem(num_threads)
+    prog_mem = ProgramMemoryModel(dut)
+    prog_mem.load(program)
+    data_mem = DataMemoryModel(dut, ADDR_WIDTH)
+    data_mem.mem[:len(init)] = init
+    trace = TraceRecorder(dut, TRACE_SIGNALS, name=f"simd_partial_wave_{num_threads}")
+    tasks = [cocotb.start_soon(t.run()) for t in (prog_mem, data_mem, trace)]
 
-    dut._log.info("SIMD vector addition kernel test passed for all lanes.")
+    dut.rst.value = 1
+    dut.enable.value = 1
+    dut.perf_addr.value = 0
+    dut.simd_start.value = 0
+    await Timer(20, units="ns")
+    dut.rst.value = 0
+    await RisingEdge(dut.clk)
+    dut.num_threads.value = num_threads
+    dut.block_dim.value = WAVE_SIZE
+    dut.block_id.value = 0
+    dut.wave_id.value = 0
+    dut.num_block_threads.value = num_threads
+    dut.simd_ready.value = 0
+    dut.simd_working.value = 1
+    dut.simd_start.value = 1
+    await RisingEdge(dut.clk)
+    dut.simd_start.value = 0
+    start = get_sim_time("ns")
+    while dut.simd_done.value != 1:
+        await RisingEdge(dut.clk)
+    cycles = int(get_sim_time("ns") - start) // 10
+
+    isa = IsaSimulator(WAVE_SIZE, LANE_WIDTH, ADDR_WIDTH)
+    golden = isa.run(program, num_threads, WAVE_SIZE, init)
+    mismatch = data_mem.mem.diff(golden, limit=1)
+    assert not mismatch, f"{num_threads} threads: M[{mismatch[0]}] differs from ISA model: {data_mem.mem[mismatch[0]]} vs {golden[mismatch[0]]}"
+
+    # masked lanes neither retire work nor touch memory; empty wave cycles don't run at all
+    perf = await read_perf_counters(dut, LANE_WIDTH)
+    mem_instructions = sum(1 for word in program if word >> 26 in (OpCode.LOAD.value, OpCode.STORE.value))
+    wave_cycles = (num_threads + LANE_WIDTH - 1) // LANE_WIDTH
+    lane_cycles = [sum(1 for c in range(wave_cycles) if c * LANE_WIDTH + lane < num_threads) for lane in range(LANE_WIDTH)]
+    assert perf.retired == isa.retired * wave_cycles, f"{num_threads} threads: retired {perf.retired}, expected {isa.retired * wave_cycles}"
+    assert perf.lane_active == isa.retired * num_threads, f"{num_threads} threads: {perf.lane_active} active lane-instructions"
+    assert perf.mem_requests == [mem_instructions * c for c in lane_cycles], f"{num_threads} threads: per-lane requests {perf.mem_requests}"
+    stats = data_mem.stats()
+    assert stats["requests"] == mem_instructions * num_threads, f"{num_threads} threads made {stats['requests']} memory requests"
+    for t in tasks:
+        t.kill()
+    return cycles, perf, stats
+
+@cocotb.test()
+@dump_on_failure
+async def test_simd_partial_wave(dut):
+    """
+    Lanes past the block's last thread are masked (no register writes, no
+    memory requests) and wave cycles with no active lane are skipped.
+    """
+    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+    results = {}
+    for num_threads in sorted({WAVE_SIZE, WAVE_SIZE - LANE_WIDTH + LANE_WIDTH // 4, LANE_WIDTH // 4}, reverse=True):
+        cycles, perf, stats = await run_partial_wave(dut, num_threads)
+        results[num_threads] = cycles
+        dut._log.info(f"mask.s, {num_threads}/{WAVE_SIZE} threads: {cycles} cycles, {perf.retired} retired, "
+                      f"{stats['requests']} memory requests, lane utilization {perf.lane_utilization:.1%}")
+    counts = sorted(results)
+    if TOTAL_WAVE_CYCLES > 1:
+        assert results[counts[0]] < results[counts[-1]], f"a wave of {counts[0]} threads should skip wave cycles ({results})"
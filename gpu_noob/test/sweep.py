@@ -0,0 +1,166 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from regression import ROOT, parse_results
+
+'''
+Architecture parameter sweep.
+
+Runs one benchmark kernel (see benchmarks.py) over the Cartesian product of
+parameter values, one `make DUT=SIMD TESTBENCH=bench_tb PARAMS=...` per
+configuration, in parallel. PARAMS goes both to the simulator (parameter
+overrides on the toplevel) and to the bench (common.bench_param), and every
+configuration gets its own cached image (sim_cache.py), so re-running a
+sweep only pays for simulation.
+
+    python test/sweep.py --bench mask_64x32 --grid LANE_WIDTH=4,8,16,32 --grid WAVE_SIZE=32,64
+    python test/sweep.py --bench saxpy_32x32 --grid LANE_WIDTH=8,16 -j 4 SIM=verilator
+
+Writes sweep.csv / sweep.json (and sweep.png when matplotlib is installed)
+to --out, and prints a throughput/latency table. Throughput is threads
+finished per 1000 cycles, latency is cycles from the first wave start to
+the last wave done.
+
+Every wave runs WAVE_SIZE threads, so keep block_dim a multiple of every
+WAVE_SIZE in the grid (--block-dim) or the extra threads spill over the
+kernel's arrays.
+'''
+
+OUT_DIR = os.path.join(ROOT, "sim_build", "sweep")
+
+def parse_grid(items):
+    """['LANE_WIDTH=4,8', 'WAVE_SIZE=32'] -> {'LANE_WIDTH': [4, 8], 'WAVE_SIZE': [32]}"""
+    grid = {}
+    for item in items:
+        name, _, values = item.partition("=")
+        if not values:
+            raise SystemExit(f"--grid {item}: expected NAME=v1,v2,...")
+        grid[name] = [int(v, 0) for v in values.split(",")]
+    return grid
+
+def configs(grid):
+    names = list(grid)
+    for values in itertools.product(*(grid[n] for n in names)):
+        yield dict(zip(names, values))
+
+def config_name(config):
+    return "_".join(f"{k}{v}" for k, v in config.items()) or "default"
+
+def run_config(config, args, make_args):
+    out = os.path.join(args.out, config_name(config))
+    os.makedirs(out, exist_ok=True)
+    results_file = os.path.join(out, "bench_results.json")
+    junit = os.path.join(out, "results.xml")
+    for f in (results_file, junit):
+        if os.path.exists(f):
+            os.remove(f)
+
+    params = " ".join(f"{k}={v}" for k, v in config.items())
+    cmd = ["make", "DUT=SIMD", "TESTBENCH=bench_tb", f"PARAMS={params}", f"COCOTB_RESULTS_FILE={junit}"] + make_args
+    env = dict(os.environ, PWD=ROOT, BENCH=args.bench, BENCH_OUT=results_file)
+    if args.threads:
+        env["BENCH_THREADS"] = str(args.threads)
+    if args.block_dim:
+        env["BENCH_BLOCK_DIM"] = str(args.block_dim)
+
+    start = time.perf_counter()
+    with open(os.path.join(out, "run.log"), "w") as log:
+        subprocess.run(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    row = dict(config, status="ERROR", wall_time_s=time.perf_counter() - start)
+
+    tests = parse_results(junit) if os.path.exists(junit) else []
+    if tests and os.path.exists(results_file):
+        row["status"] = "PASS" if all(t[1] == "PASS" for t in tests) else "FAIL"
+        with open(results_file) as f:
+            (res,) = json.load(f)["benchmarks"].values()
+        row.update(
+            num_threads=res["num_threads"],
+            block_dim=res["block_dim"],
+            cycles=res["cycles"],
+            throughput=1000 * res["num_threads"] / res["cycles"],
+            ipc=res["ipc"],
+            thread_ipc=res["thread_ipc"],
+            stall_cycles=res["stall_cycles"],
+            mem_requests=res["mem_requests"],
+        )
+    return row
+
+def format_table(rows, names):
+    cols = names + ["status", "cycles", "throughput", "ipc", "thread_ipc", "stall_cycles"]
+    lines = ["  ".join(f"{c:>12}" for c in cols)]
+    for r in rows:
+        cells = []
+        for c in cols:
+            v = r.get(c, "")
+            cells.append(f"{v:>12.3f}" if isinstance(v, float) else f"{v!s:>12}")
+        lines.append("  ".join(cells))
+    return "\n".join(lines)
+
+def plot(rows, names, path):
+    """One panel per metric: x = first swept parameter, one line per combination of the others."""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib not installed, skipping plots", file=sys.stderr)
+        return False
+
+    x_name, others = names[0], names[1:]
+    ok = [r for r in rows if r["status"] == "PASS"]
+    fig, axes = plt.subplots(1, 2, figsize=(11, 4))
+    for ax, metric, label in ((axes[0], "throughput", "threads / 1000 cycles"), (axes[1], "cycles", "latency (cycles)")):
+        for key, group in itertools.groupby(sorted(ok, key=lambda r: [r[o] for o in others]), key=lambda r: [r[o] for o in others]):
+            group = sorted(group, key=lambda r: r[x_name])
+            ax.plot([r[x_name] for r in group], [r[metric] for r in group], marker="o",
+                    label=", ".join(f"{o}={v}" for o, v in zip(others, key)) or None)
+        ax.set_xlabel(x_name)
+        ax.set_ylabel(label)
+        ax.set_xscale("log", base=2)
+        if others:
+            ax.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a benchmark kernel over a grid of architecture parameters")
+    parser.add_argument("--bench", default="mask_64x32", help="benchmark from benchmarks.py (default mask_64x32)")
+    parser.add_argument("--grid", action="append", default=[], help="NAME=v1,v2,... (repeatable; Cartesian product)")
+    parser.add_argument("--threads", type=int, help="override the benchmark's num_threads")
+    parser.add_argument("--block-dim", type=int, help="override the benchmark's block_dim")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="configurations run at once (default: cores)")
+    parser.add_argument("--out", default=OUT_DIR, help="output directory")
+    parser.add_argument("make_args", nargs="*", help="extra VAR=value arguments passed to make")
+    args = parser.parse_args()
+
+    grid = parse_grid(args.grid)
+    names = list(grid)
+    all_configs = list(configs(grid))
+    os.makedirs(args.out, exist_ok=True)
+
+    rows = []
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = [pool.submit(run_config, c, args, args.make_args) for c in all_configs]
+        for f in as_completed(futures):
+            row = f.result()
+            print(f"{row['status']:<6} {config_name({n: row[n] for n in names})} ({row['wall_time_s']:.1f} s)", flush=True)
+            rows.append(row)
+    rows.sort(key=lambda r: [r[n] for n in names])
+
+    print(format_table(rows, names))
+    with open(os.path.join(args.out, "sweep.json"), "w") as f:
+        json.dump({"bench": args.bench, "grid": grid, "results": rows}, f, indent=2)
+    with open(os.path.join(args.out, "sweep.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=sorted({k for r in rows for k in r}, key=lambda k: (k not in names, k)))
+        writer.writeheader()
+        writer.writerows(rows)
+    if names and plot(rows, names, os.path.join(args.out, "sweep.png")):
+        print(f"plots in {os.path.join(args.out, 'sweep.png')}")
+    sys.exit(0 if all(r["status"] == "PASS" for r in rows) else 1)
@@ -0,0 +1,162 @@
+import argparse
+import functools
+import os
+import numpy as np
+from cocotb.triggers import RisingEdge
+from signals import Signal, SignalArray, SignalWords, NAME_TABLES, to_signed
+
+'''
+Columnar trace recorder for the benches.
+
+Instead of formatting every signal into a log line every cycle, a
+TraceRecorder samples a declared list of signals into preallocated NumPy
+columns. It keeps the last `depth` cycles in a ring buffer and only writes
+them out (as .npz) when a test fails or when asked to:
+
+    trace = TraceRecorder(dut, ["simd_state", "curr_pc", "alu_out[]"], name="vector_add")
+    cocotb.start_soon(trace.run())
+    ...
+    trace.dump()
+
+`name[]` records every element of an unpacked array (one column per element).
+A packed signal wider than 64 bits (the SIMD's per-slot wave_id, block_id and
+num_block_threads with WAVE_SLOTS >= 3) is recorded as 64-bit words, least
+significant first, one column each.
+Tests decorated with @dump_on_failure dump all of their recorders when they
+fail, and TRACE_DUMP=1 dumps them even when the test passes.
+
+Pretty-print a window of a dump with:
+    python trace_recorder.py traces/vector_add.npz --start 100 --end 120 [--signals simd_state,alu_out]
+'''
+
+DEFAULT_DEPTH = 4096
+TRACE_DIR = os.environ.get("TRACE_DIR", "traces")
+
+# how the CLI renders known signals (state/opcode names come from signals.NAME_TABLES)
+SIGNED = {"block_id", "wave_id", "core_block_id", "simd_wave_id"}
+HEX = {"instruction", "prog_mem_read_data"}
+
+_recorders = []
+
+class TraceRecorder:
+    def __init__(self, dut, signals, depth=DEFAULT_DEPTH, name="trace"):
+        self.dut = dut
+        self.depth = depth
+        self.name = name
+
+        # resolve every handle once (a scalar is a one-element array)
+        self.handles = {}
+        self.widths = {}
+        for sig in signals:
+            if sig.endswith("[]"):
+                self.handles[sig[:-2]] = SignalArray(getattr(dut, sig[:-2]))
+            else:
+                handle = getattr(dut, sig)
+                self.handles[sig] = SignalWords(handle) if Signal(handle).width > 64 else SignalArray([handle])
+
+        self.values = {name: np.zeros((depth, len(hs)), dtype=np.uint64) for name, hs in self.handles.items()}
+        self.xmask = {name: np.zeros((depth, len(hs)), dtype=bool) for name, hs in self.handles.items()}
+        self.cycles = np.full(depth, -1, dtype=np.int64)
+        self.count = 0 # cycles sampled so far
+
+        _recorders.append(self)
+
+    def sample(self, cycle):
+        row = self.count % self.depth
+        self.cycles[row] = cycle
+        for name, arr in self.handles.items():
+            arr.read(self.values[name][row], self.xmask[name][row])
+            if name not in self.widths:
+                self.widths[name] = arr.width
+        self.count += 1
+
+    async def run(self):
+        cycle = 0
+        while True:
+            await RisingEdge(self.dut.clk)
+            self.sample(cycle)
+            cycle += 1
+
+    def columns(self):
+        """Recorded columns in cycle order (oldest first)."""
+        n = min(self.count, self.depth)
+        order = (np.arange(n) + self.count - n) % self.depth
+        cols = {"cycle": self.cycles[order]}
+        for name in self.handles:
+            cols[name] = self.values[name][order]
+            cols[name + ".x"] = self.xmask[name][order]
+        return cols
+
+    def dump(self, path=None):
+        """Write the ring buffer to `path` (default traces/<name>.npz) and return the path."""
+        if path is None:
+            path = os.path.join(TRACE_DIR, f"{self.name}.npz")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        cols = self.columns()
+        np.savez_compressed(path,
+                            signals=np.array(list(self.handles)),
+                            widths=np.array([self.widths.get(n, 64) for n in self.handles]),
+                            **cols)
+        self.dut._log.info(f"Trace of the last {len(cols['cycle'])} cycles written to {path}")
+        return path
+
+def dump_on_failure(test):
+    """Dump every TraceRecorder created by `test` if it fails (or always with TRACE_DUMP=1)."""
+    @functools.wraps(test)
+    async def wrapper(dut, *args, **kwargs):
+        _recorders.clear()
+        try:
+            result = await test(dut, *args, **kwargs)
+        except Exception:
+            for rec in _recorders:
+                rec.dump()
+            raise
+        if os.environ.get("TRACE_DUMP") == "1":
+            for rec in _recorders:
+                rec.dump()
+        return result
+    return wrapper
+
+def render(name, value, x, width):
+    if x:
+        return "X"
+    if name in NAME_TABLES and value < len(NAME_TABLES[name]) - 1:
+        return str(NAME_TABLES[name][value])
+    if name in HEX or width > 64: # words of a wide packed signal
+        return hex(int(value))
+    if name in SIGNED:
+        return str(to_signed(int(value), width))
+    return str(int(value))
+
+def print_window(path, start=None, end=None, signals=None):
+    with np.load(path) as npz:
+        names = [str(n) for n in npz["signals"]]
+        widths = dict(zip(names, (int(w) for w in npz["widths"])))
+        if signals:
+            names = [n for n in names if n in signals]
+        cycles = npz["cycle"]
+        keep = np.ones(len(cycles), dtype=bool)
+        if start is not None:
+            keep &= cycles >= start
+        if end is not None:
+            keep &= cycles <= end
+        cols = {n: (npz[n][keep], npz[n + ".x"][keep]) for n in names}
+        cycles = cycles[keep]
+
+    scalars = [n for n in names if cols[n][0].shape[1] == 1]
+    arrays = [n for n in names if cols[n][0].shape[1] > 1]
+    for row, cycle in enumerate(cycles):
+        line = " ".join(f"{n}={render(n, cols[n][0][row][0], cols[n][1][row][0], widths[n])}" for n in scalars)
+        print(f"Cycle {cycle:5} | {line}")
+        for n in arrays:
+            vals, xs = cols[n][0][row], cols[n][1][row]
+            print(f"    {n}: " + " ".join(render(n, v, x, widths[n]) for v, x in zip(vals, xs)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pretty-print a window of a trace dump")
+    parser.add_argument("trace", help=".npz written by TraceRecorder.dump()")
+    parser.add_argument("--start", type=int, help="first cycle to print")
+    parser.add_argument("--end", type=int, help="last cycle to print")
+    parser.add_argument("--signals", help="comma separated signals to print (default: all)")
+    args = parser.parse_args()
+    print_window(args.trace, args.start, args.end, args.signals.split(",") if args.signals else None)
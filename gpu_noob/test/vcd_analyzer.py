@@ -0,0 +1,317 @@
+import argparse
+import csv
+import gzip
+import json
+import os
+import re
+from common import SIMD_State, LSU_State
+
+'''
+Streaming VCD analyzer.
+
+Reads a (possibly huge, possibly .gz) VCD line by line and keeps only the
+current value of the signals it watches plus running totals, so memory is
+bounded by the number of watched signals, not the length of the trace:
+
+    SIMD state residency    time in each simd_state (IDLE, FETCH, ... DONE)
+    occupancy               per-bit busy time of simd_working / core_start
+                            (dispatcher outputs) and the average number busy
+    LSU stalls              intervals a lane's lsu_state sits in WAITING
+
+    python vcd_analyzer.py simd_tb.vcd
+    python vcd_analyzer.py wave.vcd.gz --clock-period 10 --csv-dir sim_build/vcd --json summary.json
+
+With --csv-dir the timelines are streamed to CSV as they are read:
+states.csv (interval per state), occupancy.csv (busy count after every
+change) and lsu_stalls.csv (one row per stall). Times are in ns; cycles use
+--clock-period.
+
+The default patterns pick the instance driving each signal (simdController,
+waveDispatch/blockDispatch or the toplevel's own ports, each lane's lsu);
+a signal the simulator dumps under one id for several scopes is analyzed
+once, under its shortest name.
+'''
+
+# match the instance that drives each signal, not every port it is wired to
+STATE_PATTERN = r"(^|\.)simdController\.simd_state$"
+OCCUPANCY_PATTERN = r"(^|\.)(waveDispatch\.simd_working|blockDispatch\.core_start)$|^\w+\.(simd_working|core_start)$"
+STALL_PATTERN = r"(^|\.)lsu\.lsu_state$"
+
+TIMESCALE_NS = {"s": 1e9, "ms": 1e6, "us": 1e3, "ns": 1.0, "ps": 1e-3, "fs": 1e-6}
+
+class Var:
+    __slots__ = ("code", "name", "width")
+
+    def __init__(self, code, name, width):
+        self.code = code
+        self.name = name
+        self.width = width
+
+def open_vcd(path):
+    return gzip.open(path, "rt") if path.endswith(".gz") else open(path)
+
+class VcdReader:
+    """Incremental VCD parser: header() reads the declarations, changes() yields (time, code, value)."""
+    def __init__(self, f):
+        self.f = f
+        self.timescale_ns = 1.0
+        self.vars = {} # id code -> [(full name, width)]
+        self.end_time = 0
+
+    def header(self):
+        scopes = []
+        pending = ""
+        for line in self.f:
+            pending += line
+            if "$end" not in line:
+                continue
+            tokens = pending.split()
+            pending = ""
+            if not tokens:
+                continue
+            keyword = tokens[0]
+            if keyword == "$scope":
+                scopes.append(tokens[2])
+            elif keyword == "$upscope":
+                scopes.pop()
+            elif keyword == "$var":
+                # $var wire 3 % simd_state [2:0] $end
+                width, code, ref = int(tokens[2]), tokens[3], tokens[4]
+                if len(tokens) > 6 and tokens[5].startswith("[") and ":" not in tokens[5]:
+                    ref += tokens[5] # array element, not a bit range
+                self.vars.setdefault(code, []).append((".".join(scopes + [ref]), width))
+            elif keyword == "$timescale":
+                m = re.match(r"(\d+)\s*([a-z]+)", " ".join(tokens[1:-1]))
+                if m:
+                    self.timescale_ns = int(m.group(1)) * TIMESCALE_NS[m.group(2)]
+            elif keyword == "$enddefinitions":
+                return
+        raise ValueError("VCD has no $enddefinitions")
+
+    def changes(self, codes):
+        """(time in VCD units, id code, value string) for every change of a code in `codes`."""
+        time = 0
+        for line in self.f:
+            c = line[:1]
+            if c == "#":
+                time = int(line[1:])
+            elif c in "bB":
+                value, code = line[1:].split()
+                if code in codes:
+                    yield time, code, value
+            elif c in "01xXzZ":
+                code = line[1:].strip()
+                if code in codes:
+                    yield time, code, c
+        self.end_time = time
+
+def to_int(value):
+    """VCD binary string -> int, or None if any bit is x/z."""
+    try:
+        return int(value, 2)
+    except ValueError:
+        return None
+
+class Residency:
+    """Time a signal spends at each value."""
+    def __init__(self, var, names=None, writer=None):
+        self.var = var
+        self.names = names or {}
+        self.writer = writer
+        self.totals = {}
+        self.visits = {}
+        self.value = None
+        self.since = 0
+
+    def label(self, value):
+        return "X" if value is None else self.names.get(value, str(value))
+
+    def update(self, time, value):
+        value = to_int(value)
+        if value == self.value:
+            return
+        self.close(time)
+        self.value = value
+        self.visits[self.label(value)] = self.visits.get(self.label(value), 0) + 1
+
+    def close(self, time):
+        if time > self.since:
+            key = self.label(self.value)
+            self.totals[key] = self.totals.get(key, 0) + time - self.since
+            if self.writer:
+                self.writer(self.var.name, self.since, time, key)
+        self.since = time
+
+class Occupancy:
+    """Per-bit busy time of a bitmask, plus the time integral of the number of bits set."""
+    def __init__(self, var, writer=None):
+        self.var = var
+        self.writer = writer
+        self.bit_time = [0] * var.width
+        self.busy_area = 0 # sum of popcount * time
+        self.peak = 0
+        self.bits = 0
+        self.since = 0
+
+    def update(self, time, value):
+        bits = to_int(value) or 0 # X (reset, dump off) counts as idle
+        self.close(time)
+        if bits != self.bits and self.writer:
+            self.writer(self.var.name, time, bin(bits).count("1"))
+        self.bits = bits
+        self.peak = max(self.peak, bin(bits).count("1"))
+
+    def close(self, time):
+        dt = time - self.since
+        if dt > 0 and self.bits:
+            self.busy_area += bin(self.bits).count("1") * dt
+            for i in range(self.var.width):
+                if self.bits >> i & 1:
+                    self.bit_time[i] += dt
+        self.since = time
+
+class Stalls:
+    """Intervals a lane's LSU is WAITING on memory; only running totals are kept."""
+    WAITING = LSU_State.WAITING.value
+
+    def __init__(self, var, writer=None):
+        self.var = var
+        self.writer = writer
+        self.start = None
+        self.count = 0
+        self.total = 0
+        self.longest = 0
+
+    def update(self, time, value):
+        waiting = to_int(value) == self.WAITING
+        if waiting and self.start is None:
+            self.start = time
+        elif not waiting and self.start is not None:
+            self.close(time)
+
+    def close(self, time):
+        if self.start is None:
+            return
+        length = time - self.start
+        self.count += 1
+        self.total += length
+        self.longest = max(self.longest, length)
+        if self.writer:
+            self.writer(self.var.name, self.start, time)
+        self.start = None
+
+def select(reader, pattern):
+    """Vars (one per id code, named by their shortest alias) whose name matches `pattern`."""
+    rx = re.compile(pattern)
+    out = []
+    for code, aliases in reader.vars.items():
+        names = [n for n, _ in aliases if rx.search(n)]
+        if names:
+            out.append(Var(code, min(names, key=lambda n: (n.count("."), n)), aliases[0][1]))
+    return sorted(out, key=lambda v: v.name)
+
+def analyze(path, clock_period=None, csv_dir=None, state_pattern=STATE_PATTERN,
+            occupancy_pattern=OCCUPANCY_PATTERN, stall_pattern=STALL_PATTERN):
+    """Stream `path` once; returns the summary dict."""
+    files = []
+    writers = {}
+    if csv_dir:
+        os.makedirs(csv_dir, exist_ok=True)
+        for name, header in (("states", ["signal", "start_ns", "end_ns", "state"]),
+                             ("occupancy", ["signal", "time_ns", "busy"]),
+                             ("lsu_stalls", ["signal", "start_ns", "end_ns", "ns"])):
+            f = open(os.path.join(csv_dir, f"{name}.csv"), "w", newline="")
+            files.append(f)
+            writers[name] = csv.writer(f)
+            writers[name].writerow(header)
+
+    with open_vcd(path) as f:
+        reader = VcdReader(f)
+        reader.header()
+        ns = reader.timescale_ns
+
+        def state_row(signal, start, end, state):
+            writers["states"].writerow([signal, start * ns, end * ns, state])
+        def occupancy_row(signal, time, busy):
+            writers["occupancy"].writerow([signal, time * ns, busy])
+        def stall_row(signal, start, end):
+            writers["lsu_stalls"].writerow([signal, start * ns, end * ns, (end - start) * ns])
+
+        names = {s.value: s.name for s in SIMD_State}
+        trackers = {}
+        for var in select(reader, state_pattern):
+            trackers.setdefault(var.code, []).append(Residency(var, names, csv_dir and state_row))
+        for var in select(reader, occupancy_pattern):
+            trackers.setdefault(var.code, []).append(Occupancy(var, csv_dir and occupancy_row))
+        for var in select(reader, stall_pattern):
+            trackers.setdefault(var.code, []).append(Stalls(var, csv_dir and stall_row))
+
+        for time, code, value in reader.changes(trackers):
+            for t in trackers[code]:
+                t.update(time, value)
+        end = reader.end_time
+        for ts in trackers.values():
+            for t in ts:
+                t.close(end)
+
+    for f in files:
+        f.close()
+
+    def scaled(t):
+        return t * ns / clock_period if clock_period else t * ns
+    unit = "cycles" if clock_period else "ns"
+    all_trackers = [t for ts in trackers.values() for t in ts]
+    summary = {"file": path, "unit": unit, "duration": scaled(end), "states": {}, "occupancy": {}, "lsu_stalls": {}}
+    for t in all_trackers:
+        if isinstance(t, Residency):
+            summary["states"][t.var.name] = {k: {"time": scaled(v), "share": v / end if end else 0.0, "visits": t.visits.get(k, 0)}
+                                             for k, v in sorted(t.totals.items(), key=lambda kv: -kv[1])}
+        elif isinstance(t, Occupancy):
+            summary["occupancy"][t.var.name] = {
+                "bit_busy": [b / end if end else 0.0 for b in t.bit_time],
+                "avg_busy": t.busy_area / end if end else 0.0,
+                "peak_busy": t.peak,
+            }
+        else:
+            summary["lsu_stalls"][t.var.name] = {
+                "count": t.count,
+                "total": scaled(t.total),
+                "mean": scaled(t.total / t.count) if t.count else 0.0,
+                "max": scaled(t.longest),
+            }
+    return summary
+
+def format_summary(s):
+    u = s["unit"]
+    lines = [f"{s['file']}: {s['duration']:.0f} {u}"]
+    for name, states in s["states"].items():
+        lines.append(f"  {name} residency:")
+        for state, r in states.items():
+            lines.append(f"    {state:<8} {r['time']:>12.0f} {u}  {r['share']:>6.1%}  ({r['visits']} visits)")
+    for name, o in s["occupancy"].items():
+        bits = " ".join(f"{b:.1%}" for b in o["bit_busy"])
+        lines.append(f"  {name} occupancy: avg {o['avg_busy']:.2f} busy (peak {o['peak_busy']}), per bit {bits}")
+    if s["lsu_stalls"]:
+        count = sum(l["count"] for l in s["lsu_stalls"].values())
+        total = sum(l["total"] for l in s["lsu_stalls"].values())
+        longest = max(l["max"] for l in s["lsu_stalls"].values())
+        lines.append(f"  LSU stalls: {count} over {len(s['lsu_stalls'])} lanes, {total:.0f} {u} total, "
+                     f"mean {total / count if count else 0:.1f}, max {longest:.0f} {u}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a VCD into state residency, occupancy and LSU stall timelines")
+    parser.add_argument("vcd", help="VCD file (.vcd or .vcd.gz)")
+    parser.add_argument("--clock-period", type=float, help="clock period in ns; report cycles instead of ns")
+    parser.add_argument("--csv-dir", help="write states.csv, occupancy.csv and lsu_stalls.csv here")
+    parser.add_argument("--json", help="write the summary as JSON")
+    parser.add_argument("--state", default=STATE_PATTERN, help="regex for state signals")
+    parser.add_argument("--occupancy", default=OCCUPANCY_PATTERN, help="regex for busy bitmask signals")
+    parser.add_argument("--stall", default=STALL_PATTERN, help="regex for LSU state signals")
+    args = parser.parse_args()
+
+    summary = analyze(args.vcd, args.clock_period, args.csv_dir, args.state, args.occupancy, args.stall)
+    print(format_summary(summary))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
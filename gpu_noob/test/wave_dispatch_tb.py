@@ -1,11 +1,17 @@
 import cocotb
 from cocotb.clock import Clock
 from cocotb.triggers import RisingEdge, Timer
-from cocotb.utils import get_sim_time
-from common import safe_int, signed_int
+from common import bench_param
+from signals import Signals
+from trace_recorder import TraceRecorder, dump_on_failure
+
+TOPLEVEL = "WaveDispatch" # module this bench drives (DUT=...)
 
 BLOCK_DIM = 64
-WAVE_SIZE = 32
+WAVE_SIZE = bench_param("WAVE_SIZE", 32)
+WAVE_SLOTS = bench_param("WAVE_SLOTS", 1)
+NUM_SIMDS = bench_param("NUM_SIMDS", 2)
+BLOCK_SLOTS = bench_param("BLOCK_SLOTS", 1) # resident blocks
 THREADS_FULL = BLOCK_DIM # block is full
 
 '''
@@ -17,48 +23,27 @@ there is only one warp that can be dispatched from this block.
 '''
 THREADS_HALF_FULL = BLOCK_DIM - WAVE_SIZE
 
-async def log_signals(dut):
-    cycle = 0
+# signals kept in the trace ring buffer (dumped to traces/ on failure)
+TRACE_SIGNALS = [
+    "enable", "rst",
+    "core_start", "core_block_id", "block_dim", "num_blocks", "num_threads", "num_actual_block_threads",
+    "num_waves", "waves_dispatched", "waves_done", "block_done",
+    "simd_wave_id[]", "simd_block_id[]", "simd_start", "simd_ready", "simd_working", "simd_done",
+]
+
+def slot(simd):
+    """Dispatch index of a SIMD's first slot (slots are numbered simd * WAVE_SLOTS + slot)."""
+    return simd * WAVE_SLOTS
+
+def start_trace(dut, name):
     dut._log.info(f"NUM_SIMDS = {int(dut.NUM_SIMDS.value)}")
     dut._log.info(f"WAVE_SIZE = {int(dut.WAVE_SIZE.value)}")
-
-    while True:
-        await RisingEdge(dut.clk)
-        curr_ns = get_sim_time(units="ns")
-        enable = safe_int(dut.enable.value)
-        rst = safe_int(dut.rst.value)
-        
-        block_id = safe_int(dut.core_block_id.value)
-        block_dim = safe_int(dut.block_dim.value)
-        num_blocks = safe_int(dut.num_blocks)
-        num_threads = safe_int(dut.num_threads.value)
-        num_threads_in_block = safe_int(dut.num_actual_block_threads.value)
-        num_waves = safe_int(dut.num_waves.value)
-
-        dispatched = safe_int(dut.waves_dispatched.value)
-        waves_done = safe_int(dut.waves_done.value)
-        block_done = safe_int(dut.block_done.value)
-
-        dut._log.info(
-            f"\n---- CLOCK CYCLE: {cycle} @ {curr_ns} ns ----\n"
-            f"enable={enable} rst={rst}\n"
-            f"block_id={block_id}, block_dim={block_dim}, num_blocks={num_blocks}\n"
-            f"total_threads={num_threads}, threads_in_block={num_threads_in_block}\n"
-            f"waves dispatched={dispatched}, num_waves={num_waves}\n"
-            f"waves_done={waves_done} block_done?={block_done}\n"
-        )
-
-        for i in range(int(dut.NUM_SIMDS.value)):
-            dut._log.info(
-                f"  SIMD {i}: wave_id={signed_int(dut.simd_wave_id[i].value)} "
-                f"start={safe_int(dut.simd_start[i].value)} "
-                f"simd_ready={safe_int(dut.simd_ready[i].value)} "
-                f"simd_working={safe_int(dut.simd_working[i].value)} "
-                f"done={safe_int(dut.simd_done[i].value)}"
-            )
-        cycle += 1
+    trace = TraceRecorder(dut, TRACE_SIGNALS, name=name)
+    cocotb.start_soon(trace.run())
+    return trace
 
 @cocotb.test()
+@dump_on_failure
 async def test_full_block_wave_dispatch(dut):
     """
     Test wave dispatch module when the block is full
@@ -67,13 +52,15 @@ async def test_full_block_wave_dispatch(dut):
     # start 100MHz clock
     clock = Clock(dut.clk, 10, units="ns")
     cocotb.start_soon(clock.start())
-    cocotb.start_soon(log_signals(dut))
+    start_trace(dut, "full_block_wave_dispatch")
+    sig = Signals(dut)
 
     # reset
     dut.rst.value = 1
     dut.num_threads.value = THREADS_FULL
     dut.block_dim.value = BLOCK_DIM
     dut.core_block_id.value = 0
+    dut.core_start.value = 1 # block slot 0 holds block 0
     dut.simd_done.value = 0 # none of simds are done (nothing processed yet)
     await Timer(20, units="ns") # hold rst to let signals propogate
     dut.rst.value = 0
@@ -82,8 +69,8 @@ async def test_full_block_wave_dispatch(dut):
 
     # test -- after rst, wave_IDs for each SIMD should be default invalid values (no waves assigned yet)
     for i in range(dut.NUM_SIMDS.value):
-        expected = signed_int(dut.INVALID_WAVE_ID.value)
-        actual = signed_int(dut.simd_wave_id[i].value)
+        expected = sig.INVALID_WAVE_ID.signed()
+        actual = sig.simd_wave_id[slot(i)].signed()
         assert actual == expected, f"After reset, wave_ID for SIMD {i} should be {expected}, got {actual}"
     # test waves dispatched, waves done, block done -- all should be 0 
     assert dut.waves_dispatched.value == 0, "After rst, waves dispatched should be 0"
@@ -94,13 +81,13 @@ async def test_full_block_wave_dispatch(dut):
     # test -- all SIMDs have correct warp_id
     for i in range(int(dut.NUM_SIMDS.value)):
         exp_wave_id = i
-        act_warp_id = signed_int(dut.simd_wave_id[i].value)
+        act_warp_id = sig.simd_wave_id[slot(i)].signed()
         assert act_warp_id == exp_wave_id, f"After enable=1, SIMD {i} should have warp_id {exp_wave_id}, got {act_warp_id}"
-        act_working_state = safe_int(dut.simd_working[i].value)
+        act_working_state = sig.simd_working.bit(slot(i))
         assert act_working_state == 1, f"For SIMD {i}: With warp_id {act_warp_id}, working_state should be 1, got {act_working_state}"
         # SIMD start states should be HIGH as they were just given new waves
         expected = 1
-        actual = safe_int(dut.simd_start[i].value)
+        actual = sig.simd_start.bit(slot(i))
         assert expected == actual, f"For SIMD {i}: With warp_id {act_warp_id}, start_state should be 1, got {actual}"
     
     # let SIMDs work for a while
@@ -109,41 +96,42 @@ async def test_full_block_wave_dispatch(dut):
         dut._log.info(f"SIMDs are working, STEP={i}")
 
     # test -- SIMD0 finishes its wave
-    dut.simd_done[0].value = 1
+    dut.simd_done[slot(0)].value = 1
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
-    dut.simd_done[0].value = 0
+    dut.simd_done[slot(0)].value = 0
     # waves_done test
-    actual = safe_int(dut.waves_done.value)
+    actual = sig.waves_done.read()
     assert actual == 1, f"SIMD0 is done, waves done should be 1, got {actual}"
     # simd0 is ready for new wave
-    actual = safe_int(dut.simd_ready[0].value)
+    actual = sig.simd_ready.bit(slot(0))
     assert actual == 1, f"SIMD0 finished a wave and should be in ready state (1), got {actual}"
 
     # test -- SIMD0 looking for a wave, but there are none to give out
     await RisingEdge(dut.clk)
     # wave id should be default (invalid) value
-    expected = dut.INVALID_WAVE_ID
-    actual = signed_int(dut.simd_wave_id[0].value)
+    expected = sig.INVALID_WAVE_ID.signed()
+    actual = sig.simd_wave_id[slot(0)].signed()
     assert actual == expected, f"SIMD0 is ready but with no more waves to dispatch, SIMD0's wave_id should be {expected}, got {actual}"
 
     # test -- SIMD1 finishes its wave
-    dut.simd_done[1].value = 1
+    dut.simd_done[slot(1)].value = 1
     await RisingEdge(dut.clk) # simd_done set
     await RisingEdge(dut.clk) # simd_done processed
-    dut.simd_done[1].value = 0
+    dut.simd_done[slot(1)].value = 0
     # waves_done test
-    actual = safe_int(dut.waves_done.value)
+    actual = sig.waves_done.read()
     assert actual == 2, f"SIMD1 is done, waves done should be 2, got {actual}"
     # simd1 is ready for new wave
-    actual = safe_int(dut.simd_ready[1].value)
+    actual = sig.simd_ready.bit(slot(1))
     assert actual == 1, f"SIMD1 finished a wave, should be in ready state (1), got {actual}"
     await RisingEdge(dut.clk)
     # block is done
-    actual = safe_int(dut.block_done.value)
+    actual = sig.block_done.read()
     assert actual == 1, f"All waves done, block_done should be 1, got {actual}"
 
 @cocotb.test()
+@dump_on_failure
 async def test_half_full_block_wave_dispatch(dut):
     """
     Test wave dispatch module when the block is only half-filled
@@ -151,13 +139,15 @@ async def test_half_full_block_wave_dispatch(dut):
     # start 100MHz clock
     clock = Clock(dut.clk, 10, units="ns")
     cocotb.start_soon(clock.start())
-    cocotb.start_soon(log_signals(dut))
+    start_trace(dut, "half_full_block_wave_dispatch")
+    sig = Signals(dut)
 
     # reset
     dut.rst.value = 1
     dut.num_threads.value = THREADS_HALF_FULL
     dut.block_dim.value = BLOCK_DIM
     dut.core_block_id.value = 0
+    dut.core_start.value = 1 # block slot 0 holds block 0
     dut.simd_done.value = 0 # none of simds are done (nothing processed yet)
     await Timer(20, units="ns") # hold rst to let signals propogate
     dut.rst.value = 0
@@ -166,8 +156,8 @@ async def test_half_full_block_wave_dispatch(dut):
 
     # test -- after rst, wave_IDs for each SIMD should be default invalid values (no waves assigned yet)
     for i in range(dut.NUM_SIMDS.value):
-        expected = signed_int(dut.INVALID_WAVE_ID.value)
-        actual = signed_int(dut.simd_wave_id[i].value)
+        expected = sig.INVALID_WAVE_ID.signed()
+        actual = sig.simd_wave_id[slot(i)].signed()
         assert actual == expected, f"After reset, wave_ID for SIMD {i} should be {expected}, got {actual}"
     # test waves dispatched, waves done, block done -- all should be 0 
     assert dut.waves_dispatched.value == 0, "After rst, waves dispatched should be 0"
@@ -176,20 +166,20 @@ async def test_half_full_block_wave_dispatch(dut):
 
     await RisingEdge(dut.clk) # enable propogated
     # test -- all SIMDs have correct wave_id
-    act_wave_id = signed_int(dut.simd_wave_id[0].value) # SIMD0 wave id
+    act_wave_id = sig.simd_wave_id[slot(0)].signed() # SIMD0 wave id
     assert act_wave_id == 0, f"After enable=1, SIMD 0 should have warp_id 0, got {act_wave_id}"
-    exp_wave_id = signed_int(dut.INVALID_WAVE_ID.value)
-    act_wave_id = signed_int(dut.simd_wave_id[1].value) # SIMD1 wave id
+    exp_wave_id = sig.INVALID_WAVE_ID.signed()
+    act_wave_id = sig.simd_wave_id[slot(1)].signed() # SIMD1 wave id
     assert act_wave_id == exp_wave_id, f"After enable=1, SIMD 1 should have warp_id {exp_wave_id}, got {act_wave_id}"
     # test -- SIMD0 was assigned a new wave, SIMD1 wasn't.
         # check start_states
     # SIMD0
     expected = 1
-    actual = safe_int(dut.simd_start[0].value)
+    actual = sig.simd_start.bit(slot(0))
     assert expected == actual, f"SIMD0 was given new wave, start_state should be 1, got {actual}"
     # SIMD1
     expected = 0
-    actual = safe_int(dut.simd_start[1].value)
+    actual = sig.simd_start.bit(slot(1))
     assert expected == actual, f"SIMD1 wasn't given a wave, start_state should be 0, got {actual}"
     
     # let SIMDs work for a while
@@ -198,28 +188,106 @@ async def test_half_full_block_wave_dispatch(dut):
         dut._log.info(f"SIMDs are working, STEP={i}")
 
     # test -- SIMD0 finishes its wave
-    dut.simd_done[0].value = 1
+    dut.simd_done[slot(0)].value = 1
     await RisingEdge(dut.clk)
     await RisingEdge(dut.clk)
-    dut.simd_done[0].value = 0
+    dut.simd_done[slot(0)].value = 0
     # waves_done test
-    actual = safe_int(dut.waves_done.value)
+    actual = sig.waves_done.read()
     assert actual == 1, f"SIMD0 is done, waves done should be 1, got {actual}"
     # simd0 is ready for new wave
-    actual = safe_int(dut.simd_ready[0].value)
+    actual = sig.simd_ready.bit(slot(0))
     assert actual == 1, f"SIMD0 finished a wave and should be in ready state (1), got {actual}"
     # block_done test 
     await RisingEdge(dut.clk)
-    actual = safe_int(dut.block_done.value)
-    assert actual == 1, f"All waves ({safe_int(dut.num_waves.value)} are done, block_done should be 1, got {actual})"
+    actual = sig.block_done.read()
+    assert actual == 1, f"All waves ({sig.num_waves.read()} are done, block_done should be 1, got {actual})"
 
     # test -- simd0 is looking for wave, but none to give out
     await RisingEdge(dut.clk)
     # wave id should be default value for wave 0 now
-    expected = signed_int(dut.INVALID_WAVE_ID)
-    actual = signed_int(dut.simd_wave_id[0].value)
+    expected = sig.INVALID_WAVE_ID.signed()
+    actual = sig.simd_wave_id[slot(0)].signed()
     assert actual == expected, f"SIMD0 is ready but with no more waves to dispatch, SIMD0's wave_id should be {expected}, got {actual}"
     # final check for simd1 to still have default wave_id
-    expected = signed_int(dut.INVALID_WAVE_ID)
-    actual = signed_int(dut.simd_wave_id[0].value)
-    assert actual == expected, f"SIMD1 should still have default wave_id {expected} from start, got {actual}"
\ No newline at end of file
+    expected = sig.INVALID_WAVE_ID.signed()
+    actual = sig.simd_wave_id[slot(0)].signed()
+    assert actual == expected, f"SIMD1 should still have default wave_id {expected} from start, got {actual}"
+
+@cocotb.test()
+@dump_on_failure
+async def test_ragged_last_block(dut):
+    """
+    The last block of a ragged grid holds the remainder: 80 threads in blocks
+    of 64 leave 16 threads (one wave) for block 1, and the SIMDs mask lanes
+    past num_actual_block_threads.
+    """
+    clock = Clock(dut.clk, 10, units="ns")
+    cocotb.start_soon(clock.start())
+    start_trace(dut, "ragged_last_block")
+    sig = Signals(dut)
+
+    dut.rst.value = 1
+    dut.num_threads.value = BLOCK_DIM + WAVE_SIZE // 2
+    dut.block_dim.value = BLOCK_DIM
+    dut.simd_done.value = 0
+    for block_id, threads in ((0, BLOCK_DIM), (1, WAVE_SIZE // 2)):
+        dut.core_block_id.value = block_id
+        await Timer(20, units="ns")
+        actual = sig.num_actual_block_threads.read() & 0xFFFFFFFF # block slot 0
+        assert actual == threads, f"block {block_id} of {BLOCK_DIM + WAVE_SIZE // 2} threads should hold {threads} threads, got {actual}"
+        expected = (threads + WAVE_SIZE - 1) // WAVE_SIZE
+        actual = sig.num_waves.read() & 0xFFFFFFFF
+        assert actual == expected, f"block {block_id} should have {expected} waves, got {actual}"
+
+@cocotb.test(skip=BLOCK_SLOTS < 2)
+@dump_on_failure
+async def test_resident_blocks(dut):
+    """
+    Two resident blocks (PARAMS="BLOCK_SLOTS=2"), each with a wave for every
+    SIMD slot: the older block (in block slot 1) fills the SIMDs first, and a
+    SIMD slot it frees takes the younger block's first wave.
+    """
+    clock = Clock(dut.clk, 10, units="ns")
+    cocotb.start_soon(clock.start())
+    start_trace(dut, "resident_blocks")
+    sig = Signals(dut)
+    num_slots = NUM_SIMDS * WAVE_SLOTS
+    block_dim = num_slots * WAVE_SIZE
+
+    dut.rst.value = 1
+    dut.num_threads.value = 2 * block_dim
+    dut.block_dim.value = block_dim
+    dut.core_block_id.value = 0 << 32 | 1 # block slot 1 holds block 0, block slot 0 holds block 1
+    dut.core_start.value = 0b11
+    dut.simd_done.value = 0
+    await Timer(20, units="ns")
+    dut.rst.value = 0
+    dut.enable.value = 1
+    await RisingEdge(dut.clk)
+    await RisingEdge(dut.clk)
+
+    # test -- every SIMD slot runs a wave of the oldest block
+    for i in range(num_slots):
+        actual = sig.simd_block_id[i].signed()
+        assert actual == 0, f"slot {i} should run a wave of block 0 first, got block {actual}"
+
+    # test -- a freed slot draws from the other resident block
+    dut.simd_done[slot(0)].value = 1
+    await RisingEdge(dut.clk) # simd_done set
+    await RisingEdge(dut.clk) # slot redispatched
+    dut.simd_done[slot(0)].value = 0
+    await RisingEdge(dut.clk)
+    actual = (sig.simd_block_id[slot(0)].signed(), sig.simd_wave_id[slot(0)].signed())
+    assert actual == (1, 0), f"SIMD0 should have taken wave 0 of block 1, got (block, wave) {actual}"
+
+    # test -- block 0 is done once its other waves are, block 1 is not
+    for i in range(num_slots):
+        if i != slot(0):
+            dut.simd_done[i].value = 1
+    await RisingEdge(dut.clk)
+    await RisingEdge(dut.clk)
+    dut.simd_done.value = 0
+    await RisingEdge(dut.clk)
+    actual = sig.block_done.read()
+    assert actual == 0b10, f"only block slot 1 (block 0) should be done, block_done = {actual:#04b}"
@@ -0,0 +1,135 @@
+import argparse
+import hashlib
+import os
+import re
+
+'''
+Scoped, windowed and triggered waveform dumping (used by the makefile).
+
+A full dump of every signal for the whole run is far more I/O than a debug
+session needs. With WAVE=1 the makefile asks this script for a dump
+configuration built from:
+
+    WAVE_SCOPE="simdController pc"   instances (below the toplevel) to dump; default: everything
+    WAVE_DEPTH=1                     levels below each scope (0 = all)
+    WAVE_START=1000 WAVE_END=5000    time window in ns
+    WAVE_TRIGGER="curr_pc == 5"      Verilog condition on toplevel signals; each clock it holds
+                                     keeps dumping on for WAVE_TRIGGER_CYCLES more cycles
+    WAVE_FORMAT=vcd|fst|lxt2         fst and lxt2 are compressed
+
+icarus: `module` writes a wave_dump root module ($dumpfile/$dumpvars on the
+scopes, $dumpon/$dumpoff driven by the window and trigger). The window and
+file name are plusargs, so changing them doesn't rebuild the image.
+
+verilator: the cocotb main traces from the start of the run to the end, so
+only scope/depth (`vlt` writes a tracing_on/tracing_off config) and the
+format are supported.
+
+    python wave_dump.py module --toplevel SIMD --scope simdController --trigger "simd_state == 4" --out-dir .cache/wave
+    python wave_dump.py vlt --toplevel SIMD --scope simdController --out-dir .cache/wave
+'''
+
+FORMATS = ("vcd", "fst", "lxt2")
+VERILOG_KEYWORDS = {"posedge", "negedge", "or", "and", "not"}
+
+def scoped(expr, toplevel):
+    """Prefix the identifiers in a Verilog expression with the toplevel ('curr_pc == 5' -> 'SIMD.curr_pc == 5')."""
+    # skip sized literal bases (4'd3), macros (`SIMD_WAIT), system functions ($time) and member selects
+    return re.sub(r"(?<![\w.$'`])([A-Za-z_]\w*)",
+                  lambda m: m.group(1) if m.group(1) in VERILOG_KEYWORDS else f"{toplevel}.{m.group(1)}", expr)
+
+def dump_module(toplevel, scopes=(), depth=0, trigger=None, trigger_cycles=100, clock="clk"):
+    """Source of the icarus wave_dump root module."""
+    targets = [f"{toplevel}.{s}" for s in scopes] or [toplevel]
+    gated = trigger is not None
+    lines = [
+        "// generated by test/wave_dump.py",
+        "`timescale 1ns/1ps",
+        '`include "common_defs.v"',
+        "",
+        "module wave_dump();",
+        "reg [8*256-1:0] wave_file;",
+        "reg [63:0] wave_start, wave_end; // ns, end 0 = run to the end",
+        "reg dumping, want;",
+        "",
+        "initial begin",
+        '    if (!$value$plusargs("wave_file=%s", wave_file)) wave_file = "wave.vcd";',
+        '    if (!$value$plusargs("wave_start=%d", wave_start)) wave_start = 0;',
+        '    if (!$value$plusargs("wave_end=%d", wave_end)) wave_end = 0;',
+        "    $dumpfile(wave_file);",
+    ]
+    lines += [f"    $dumpvars({depth}, {t});" for t in targets]
+    if gated:
+        # off until the trigger first holds
+        lines += ["    $dumpoff;", "    dumping = 0;"]
+    else:
+        lines += ["    dumping = 1;", "    if (wave_start > 0) begin", "        $dumpoff;", "        dumping = 0;", "    end"]
+    lines += ["end", ""]
+    want = "$time >= wave_start && (wave_end == 0 || $time < wave_end)"
+    if gated:
+        lines += [
+            "reg [31:0] hold = 0; // cycles left after the trigger last held",
+            f"always @(posedge {toplevel}.{clock}) begin",
+            f"    if ({scoped(trigger, toplevel)})",
+            f"        hold <= {trigger_cycles};",
+            "    else if (hold > 0)",
+            "        hold <= hold - 1;",
+            "end",
+            "",
+        ]
+        want = f"{want} && (hold > 0 || ({scoped(trigger, toplevel)}))"
+    lines += [
+        f"always @(posedge {toplevel}.{clock}) begin",
+        f"    want = {want};",
+        "    if (want && !dumping) begin",
+        "        $dumpon;",
+        "        dumping = 1;",
+        "    end else if (!want && dumping) begin",
+        "        $dumpoff;",
+        "        dumping = 0;",
+        "    end",
+        "end",
+        "",
+        "endmodule",
+        "",
+    ]
+    return "\n".join(lines)
+
+def vlt_config(toplevel, scopes=(), depth=0):
+    """Verilator config that traces only the given scopes."""
+    lines = ["`verilator_config", "// generated by test/wave_dump.py", 'tracing_off -scope "*"']
+    levels = f" -levels {depth}" if depth else ""
+    for s in scopes:
+        lines.append(f'tracing_on -scope "{toplevel}.{s}"{levels}')
+        lines.append(f'tracing_on -scope "{toplevel}.{s}.*"{levels}')
+    return "\n".join(lines) + "\n"
+
+def write(out_dir, name, ext, text):
+    """Content-addressed file, so parallel runs with different settings never clash."""
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(os.path.abspath(out_dir), f"{name}_{hashlib.sha256(text.encode()).hexdigest()[:16]}{ext}")
+    if not os.path.exists(path):
+        tmp = f"{path}.{os.getpid()}"
+        with open(tmp, "w") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate waveform dump configuration")
+    parser.add_argument("kind", choices=("module", "vlt"), help="icarus dump module or Verilator tracing config")
+    parser.add_argument("--toplevel", required=True)
+    parser.add_argument("--scope", action="append", default=[], help="instance below the toplevel (repeatable, or space separated)")
+    parser.add_argument("--depth", type=int, default=0, help="levels below each scope (0 = all)")
+    parser.add_argument("--trigger", help="Verilog condition on toplevel signals")
+    parser.add_argument("--trigger-cycles", type=int, default=100)
+    parser.add_argument("--clock", default="clk")
+    parser.add_argument("--out-dir", required=True)
+    args = parser.parse_args()
+
+    scopes = [s for item in args.scope for s in item.split()]
+    if args.kind == "module":
+        print(write(args.out_dir, "wave_dump", ".v",
+                    dump_module(args.toplevel, scopes, args.depth, args.trigger or None, args.trigger_cycles, args.clock)))
+    else:
+        print(write(args.out_dir, "wave_trace", ".vlt", vlt_config(args.toplevel, scopes, args.depth)))